@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -11,7 +11,37 @@ class Settings(BaseSettings):
     PORT: int = 8000
 
     LLM_BASE_URL: str = "http://127.0.0.1:8080"
-    LLM_TIMEOUT_SECONDS: int = 300
+    # Mehrere llama.cpp-Server (kommagetrennt); leer → nur LLM_BASE_URL
+    LLM_BASE_URLS: str = ""
+    LLM_EJECT_AFTER_FAILURES: int = 3  # aufeinanderfolgende Fehler bis zum Auswerfen
+    LLM_EJECT_SECONDS: float = 30.0
+    LLM_HEALTH_INTERVAL_SECONDS: float = 10.0  # 0 = kein aktiver Health-Check
+    LLM_MODEL_ID_TTL_SECONDS: float = 60.0  # Modell-Identität (/props, Briefing-Cache-Schlüssel) so lange gültig
+    LLM_HEDGE_AFTER_MS: int = 0  # 0 = kein Hedging (nur completion, nicht Stream)
+    # llama.cpp Prompt-Cache: cache_prompt senden; Slots pro Server (--parallel) für Slot-Affinität
+    LLM_CACHE_PROMPT: bool = True
+    LLM_SLOTS_PER_BACKEND: int = 1
+    # Admission Control: gleichzeitige Generierungen = Slots des llama.cpp-Servers (--parallel, Summe aller Backends)
+    LLM_MAX_CONCURRENCY: int = 1
+    LLM_QUEUE_MAX: int = 32  # volle Warteschlange → 429
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 60.0  # länger gewartet → 503
+    LLM_TIMEOUT_SECONDS: int = 300  # Gesamtdauer einer Generierung
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_READ_TIMEOUT_SECONDS: float = 120.0  # max. Pause zwischen zwei Stream-Chunks
+    # Keep-Alive-Pool (ein AsyncClient pro Prozess)
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 16
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    # Circuit Breaker für LLM und Chroma: bei Ausfall sofort 503 + Retry-After statt hängender Requests
+    BREAKER_ENABLED: bool = True
+    BREAKER_WINDOW_SECONDS: float = 30.0  # rollierendes Fenster für Fehler-/Latenzquote
+    BREAKER_MIN_CALLS: int = 10  # Mindestanzahl Aufrufe im Fenster vor einer Bewertung
+    BREAKER_ERROR_RATE: float = 0.5
+    BREAKER_SLOW_RATE: float = 0.8
+    BREAKER_OPEN_SECONDS: float = 15.0  # danach ein Probe-Aufruf (half-open)
+    LLM_BREAKER_SLOW_SECONDS: float = 0.0  # Zeit bis zum ersten Byte; 0 = Latenz nicht bewerten
+    CHROMA_BREAKER_SLOW_SECONDS: float = 2.0
+    CHROMA_CHECK_TIMEOUT_SECONDS: float = 5.0  # Erreichbarkeits-Check vor Chroma-Zugriffen
 
     CORS_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
 
@@ -19,6 +49,29 @@ class Settings(BaseSettings):
     CHROMA_HOST: str = "127.0.0.1"
     CHROMA_PORT: int = 8001
     CHROMA_COLLECTION: str = "pdf_chatbot"
+    # http = Chroma-Server (Docker); persistent = eingebettet unter CHROMA_PATH; ephemeral = nur im RAM (Tests/Benchmarks)
+    CHROMA_MODE: Literal["http", "persistent", "ephemeral"] = "http"
+    CHROMA_PATH: str = "storage/chroma_local"
+    # HNSW-Index neuer Collections (bestehende: python -m app.tools.migrate_collection)
+    CHROMA_SPACE: Literal["cosine", "l2", "ip"] = "cosine"  # Embeddings sind normalisiert → cosine
+    CHROMA_HNSW_M: int = 16  # Nachbarn pro Knoten: mehr = besserer Recall, mehr RAM
+    CHROMA_HNSW_CONSTRUCTION_EF: int = 100  # Kandidatenliste beim Aufbau: mehr = besserer Graph, langsamerer Ingest
+    CHROMA_HNSW_SEARCH_EF: int = 100  # Kandidatenliste bei der Suche: mehr = besserer Recall, langsamere Query
+    # Dokumentkatalog (SQLite): Liste/Stats ohne Chroma-Scan, Löschen per Chunk-ID
+    DOC_CATALOG_PATH: str = "storage/doc_catalog.sqlite3"
+    DOC_DELETE_BATCH: int = 500  # Chunk-IDs pro Chroma-Delete
+    # Extraktions-Artefakte (Seitentexte + Chunk-Grenzen je Dokument) → Reindex ohne erneutes PDF-Parsen
+    ARTIFACTS_ENABLED: bool = True
+    ARTIFACT_DIR: str = "storage/artifacts"
+    # Reindex bei geändertem EMBEDDING_MODEL: neue Collection im Hintergrund, danach Umschalten
+    REINDEX_ON_MODEL_CHANGE: bool = True  # beim Start automatisch, wenn EMBEDDING_MODEL ≠ Modell des aktiven Index
+    REINDEX_BATCH_CHUNKS: int = 256  # Chunks pro Embedding-/Upsert-Batch
+    REINDEX_KEEP_OLD: bool = False  # alte Collection nach dem Umschalten behalten (sonst gelöscht)
+    # Grob-Routing ohne doc_id: erst Dokumente über ihre Zentroide wählen, dann nur deren Chunks abfragen
+    ROUTING_ENABLED: bool = False  # Zentroide werden immer gepflegt; lohnt bei vielen ähnlichen Dokumenten (bench_routing)
+    ROUTING_FANOUT: int = 8  # Dokumente aus Stufe 1; deutlich kleiner → gefilterte HNSW-Suche in Chroma wird langsam
+    ROUTING_MIN_DOCS: int = 50  # darunter immer flache Suche
+    ROUTING_MAX_DISTANCE: float = 0.0  # bester Zentroid weiter entfernt → flache Suche (0 = aus)
 
     # RAG (Central Source of Truth – Limits gegen riesige PDFs / RAM)
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
@@ -29,10 +82,64 @@ class Settings(BaseSettings):
     RAG_TOP_K: int = 4
     RAG_MAX_CONTEXT_CHARS: int = 12000
     RAG_MAX_CHUNKS_PER_INGEST: int = 2000  # Alias
+    # Kontext-Kompression (Chat ohne Session): nur die zur Frage passenden Sätze der Treffer in den Prompt
+    CONTEXT_COMPRESSION_ENABLED: bool = False  # pro Request über ChatRequest.compress übersteuerbar
+    CONTEXT_COMPRESSION_MAX_TOKENS: int = 600  # Budget für den Kontext (~4 Zeichen/Token)
+    CONTEXT_COMPRESSION_NEIGHBOURS: int = 1  # Nachbarsätze je ausgewähltem Satz (Zusammenhang)
+    # Reranking mit lokalem Cross-Encoder (CPU): RERANK_CANDIDATES holen, die besten top_k in den Prompt
+    RERANK_ENABLED: bool = False  # pro Request über ChatRequest.rerank übersteuerbar
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # Over-Fetch aus Chroma
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_BUDGET_MS: int = 1000  # darüber Dense-Reihenfolge (0 = ohne Budget)
+    RERANK_CACHE_MAX_ENTRIES: int = 20000  # Scores je (Frage, Chunk)
+
+    # Token-Streaming (/chat/stream): Tokens bündeln; 0 = je Netzwerk-Read vom LLM ein Write
+    STREAM_FLUSH_INTERVAL_MS: int = 0
+    STREAM_FLUSH_MAX_CHARS: int = 256
+
+    # Batch-Chat (/chat/batch): max. Fragen pro Request, parallele Generierungen (0 = LLM_MAX_CONCURRENCY)
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_CONCURRENCY: int = 0
+
+    # Briefing: längere Texte per Map-Reduce (Chunks parallel zusammenfassen, dann zusammenführen)
+    BRIEFING_SINGLE_MAX_CHARS: int = 8000  # darüber (mode=auto) Map-Reduce; ~4 Zeichen/Token, Kontext 4096
+    BRIEFING_CHUNK_CHARS: int = 6000
+    BRIEFING_CHUNK_OVERLAP: int = 300
+    BRIEFING_MAP_CONCURRENCY: int = 0  # 0 = LLM_MAX_CONCURRENCY
+    BRIEFING_JSON_SCHEMA: bool = True  # Ausgabe per llama.cpp json_schema (Grammatik) auf gültiges JSON beschränken
+    # Briefing-Ergebnis-Cache (Schlüssel: Text + Optionen + Prompt-Version + Modell)
+    BRIEFING_CACHE_ENABLED: bool = True
+    BRIEFING_CACHE_DIR: str = "storage/briefing_cache"
+    BRIEFING_CACHE_MEMORY_ENTRIES: int = 256
+    BRIEFING_CACHE_DISK_MAX_MB: float = 256.0  # 0 = nur In-Memory
+
+    # Chat-Sessions (serverseitiger Verlauf, Retrieval-Cache pro Session)
+    SESSION_MAX: int = 1000
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_TURNS: int = 20  # mind. 1 (letzte Frage dient dem Retrieval der Folgefrage)
+    SESSION_HISTORY_MAX_CHARS: int = 2000  # Budget für den Verlauf im Prompt
+    SESSION_MAX_CHUNKS: int = 12  # Chunk-Pool pro Session
+    SESSION_REUSE_THRESHOLD: float = 0.9  # Cosinus zur letzten Abfrage → Chroma-Abfrage sparen
+
+    # Semantischer Antwort-Cache (umformulierte Fragen → gespeicherte Antwort)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Cosinus-Ähnlichkeit der Fragen
+    SEMANTIC_CACHE_MIN_OVERLAP: float = 0.5  # Jaccard der abgerufenen Chunk-IDs
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
 
     # Optional: wenn gesetzt, wird X-API-Key Header verlangt
     API_KEY: Optional[str] = None
 
+    # Debug: Server-Timing / Profil pro Request (Header X-Debug-Timing: 1 | profile, Berechtigung über X-API-Key)
+    DEBUG_TIMING_WITHOUT_API_KEY: bool = False  # ohne API_KEY nur, wenn explizit erlaubt (lokal)
+    DEBUG_PROFILE_DIR: str = "storage/profiles"  # leer = kein Profiling
+    DEBUG_PROFILE_INTERVAL_MS: float = 1.0  # Sampling-Intervall (pyinstrument)
+
+    def llm_base_urls(self) -> List[str]:
+        urls = [x.strip().rstrip("/") for x in self.LLM_BASE_URLS.split(",") if x.strip()]
+        return urls or [self.LLM_BASE_URL.rstrip("/")]
+
     def cors_origins_list(self) -> List[str]:
         return [x.strip() for x in self.CORS_ORIGINS.split(",") if x.strip()]
 
@@ -0,0 +1,124 @@
+"""
+Debug-Zeitaufschlüsselung und Profiling einzelner Requests (reine ASGI-Middleware).
+Opt-in per Header `X-Debug-Timing: 1` (nur Server-Timing) bzw. `X-Debug-Timing: profile`
+(zusätzlich Sampling-Profil nach DEBUG_PROFILE_DIR, nur mit installiertem pyinstrument – sonst 501;
+pyinstrument verfolgt nur den Kontext dieses Requests, andere Requests laufen ohne Profiler-Aufwand).
+Berechtigung wie require_api_key
+(X-API-Key); ohne API_KEY nur mit DEBUG_TIMING_WITHOUT_API_KEY=true.
+Requests ohne Header laufen unverändert durch (nur ein Blick in die Header-Liste).
+"""
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.deps import require_api_key
+from app.utils import timing
+
+logger = logging.getLogger(__name__)
+
+DEBUG_HEADER = b"x-debug-timing"
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers") or ():
+        if key == name:
+            return value
+    return None
+
+
+def profiler_available() -> bool:
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Profiler:
+    """Sampling-Profiler (pyinstrument) im asyncio-Modus "enabled": erfasst nur den Task dieses
+    Requests. Kein Fallback auf cProfile – das misst deterministisch und prozessweit, parallele
+    Requests zahlen den Aufwand mit und erscheinen im Profil."""
+
+    def __init__(self) -> None:
+        from pyinstrument import Profiler
+
+        self._profiler = Profiler(interval=settings.DEBUG_PROFILE_INTERVAL_MS / 1000.0, async_mode="enabled")
+
+    def start(self) -> None:
+        self._profiler.start()
+
+    def stop_and_save(self, path_base: str) -> str:
+        self._profiler.stop()
+        path = path_base + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self._profiler.output_html())
+        return path
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        flag = _header(scope, DEBUG_HEADER)
+        if not flag:
+            return await self.app(scope, receive, send)
+
+        if not settings.API_KEY and not settings.DEBUG_TIMING_WITHOUT_API_KEY:
+            return await self.app(scope, receive, send)
+        api_key = _header(scope, b"x-api-key")
+        try:
+            await require_api_key(api_key.decode("latin-1") if api_key else None)
+        except HTTPException as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+            return await response(scope, receive, send)
+
+        profiler = None
+        if flag.strip().lower() == b"profile" and settings.DEBUG_PROFILE_DIR:
+            if not profiler_available():
+                response = JSONResponse(
+                    {"detail": "X-Debug-Timing: profile braucht pyinstrument (pip install pyinstrument)"},
+                    status_code=501,
+                )
+                return await response(scope, receive, send)
+            profiler = _Profiler()
+        timer, token = timing.start()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                # Streams: hier nur die Stufen bis Antwortbeginn, Rest im NDJSON-Event "timing"
+                headers.append((b"server-timing", timer.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profiler is not None:
+            try:
+                profiler.start()
+            except (RuntimeError, ValueError) as e:  # z. B. schon ein Profiler aktiv
+                logger.warning("Request-Profil nicht gestartet: %s", e)
+                profiler = None
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timing.reset(token)
+            if profiler is not None:
+                self._save_profile(profiler, scope)
+
+    def _save_profile(self, profiler: _Profiler, scope) -> None:
+        path_slug = re.sub(r"[^a-zA-Z0-9]+", "_", scope.get("path", "")).strip("_") or "root"
+        base = os.path.join(settings.DEBUG_PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{path_slug}")
+        try:
+            os.makedirs(settings.DEBUG_PROFILE_DIR, exist_ok=True)
+            path = profiler.stop_and_save(base)
+            logger.info("Request-Profil gespeichert: %s", path)
+        except Exception:
+            logger.exception("Request-Profil konnte nicht gespeichert werden")
@@ -1,10 +1,15 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
-from fastapi.responses import Response
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.server_timing import ServerTimingMiddleware
+from app.services.admission import AdmissionRejected
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.llm_client import close_http_client, get_http_client, get_llm_client
 from app.routers.health import router as health_router
 from app.routers.deps import router as deps_router
 from app.routers.text import router as text_router
@@ -18,22 +23,70 @@ except (ImportError, RuntimeError):
     _rag_available = False
 
 
+def _sync_doc_catalog() -> None:
+    import logging
+
+    try:
+        from app.services.doc_catalog import sync_from_vector_store
+        sync_from_vector_store()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Dokumentkatalog nicht mit Chroma abgeglichen: %s", e)
+        return
+    try:
+        from app.services.doc_centroids import sync_centroids
+        from app.services.index_state import active_collection
+        sync_centroids(active_collection())
+    except Exception as e:
+        logging.getLogger(__name__).warning("Dokument-Zentroide nicht nachgerechnet: %s", e)
+    try:
+        from app.services.reindex import reindex_on_model_change
+        reindex_on_model_change()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Reindex nach Modellwechsel nicht gestartet: %s", e)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup: Embedding-Modell laden (einmalig), nur wenn RAG verfügbar."""
+    """Startup: HTTP-Pool zum LLM anlegen, Backend-Health-Check starten, Embedding-Modell des aktiven
+    Index laden (einmalig, nur wenn RAG verfügbar), fehlenden Dokumentkatalog und fehlende Dokument-Zentroide
+    im Hintergrund aus Chroma aufbauen und bei geändertem EMBEDDING_MODEL den Reindex starten. Shutdown: Health-Check stoppen,
+    HTTP-Pool schließen."""
+    get_http_client()
+    health_task = None
+    if settings.LLM_HEALTH_INTERVAL_SECONDS > 0:
+        health_task = asyncio.create_task(get_llm_client().health_loop(settings.LLM_HEALTH_INTERVAL_SECONDS))
+    get_llm_client().model_id()  # Modell-Identität im Hintergrund ermitteln (Briefing-Cache-Schlüssel)
     if _rag_available:
         try:
             from app.services import embeddings as emb
+            from app.services.index_state import active_index
+            active_index()  # setzt das Embedding-Modell des aktiven Index
             emb.get_embeddings()
         except Exception as e:
             import logging
             logging.getLogger(__name__).warning("Embeddings beim Start nicht geladen: %s", e)
+        catalog_task = asyncio.create_task(asyncio.to_thread(_sync_doc_catalog))  # noqa: F841 (Referenz halten)
     yield
+    if health_task is not None:
+        health_task.cancel()
+    await close_http_client()
 
 
 app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 
+@app.exception_handler(CircuitOpenError)
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """LLM ausgelastet: 429 (Warteschlange voll) bzw. 503 (Wartezeit überschritten) mit Retry-After;
+    ebenso 503 + Retry-After bei offenem Circuit Breaker (LLM/Chroma ausgefallen)."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/favicon.ico", include_in_schema=False)
 def favicon():
     return Response(status_code=204)
@@ -55,12 +108,15 @@ def root():
         info["rag_delete"] = "DELETE /api/rag/docs/{doc_id}"
     return info
 
+# Innen: Debug-Timing (nur mit Header aktiv); außen: CORS
+app.add_middleware(ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache", "X-Cache-Tier"],
 )
 
 app.include_router(health_router)
@@ -4,8 +4,15 @@ Ermöglicht schnelles Debuggen ohne Raten.
 """
 import httpx
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 
 from app.core.config import get_settings
+from app.services import circuit_breaker, metrics, reranker
+from app.services.admission import get_admission
+from app.services.llm_client import get_http_client, get_llm_client
+from app.services.index_state import active_index
+from app.services.reindex import get_reindex_job
+from app.services.vector_store import get_chroma_breaker
 
 router = APIRouter(tags=["deps"])
 
@@ -13,19 +20,27 @@ router = APIRouter(tags=["deps"])
 @router.get("/health/deps")
 async def health_deps():
     settings = get_settings()
+    get_chroma_breaker()
 
-    # 1) LLM prüfen (llama.cpp server: GET / oder /health, je nach Version)
-    llm_status = {"status": "down"}
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            url = settings.LLM_BASE_URL.rstrip("/")
-            r = await client.get(f"{url}/")
-            if r.status_code in (200, 404):
-                llm_status = {"status": "ok", "code": r.status_code}
-            else:
-                llm_status = {"status": "down", "code": r.status_code}
-    except Exception as e:
-        llm_status = {"status": "down", "error": str(e)}
+    # 1) LLM prüfen (llama.cpp server: GET / oder /health, je nach Version) – alle Backends im Pool
+    llm = get_llm_client()
+    # Gleicher Keep-Alive-Pool wie die Generierung (kein eigener Client pro Check)
+    client = get_http_client()
+    backends = []
+    for backend in llm.pool.backends:
+        entry = backend.stats()
+        try:
+            r = await client.get(f"{backend.url}/", timeout=5.0)
+            entry["status"] = "ok" if r.status_code in (200, 404) else "down"
+            entry["code"] = r.status_code
+        except Exception as e:
+            entry["status"] = "down"
+            entry["error"] = str(e)
+        backends.append(entry)
+    llm_status = {k: v for k, v in backends[0].items() if k in ("status", "code", "error")}
+    if any(b["status"] == "ok" for b in backends):
+        llm_status["status"] = "ok"
+    llm_status["backends"] = backends
 
     # 2) Chroma prüfen (Heartbeat-Pfad variiert je nach Chroma-Version)
     chroma_status = {"status": "down"}
@@ -50,5 +65,45 @@ async def health_deps():
         "llm": llm_status,
         "chroma": chroma_status,
         "embeddings": {"status": "todo"},
-        "collection": settings.CHROMA_COLLECTION,
+        "llm_admission": get_admission().stats(),
+        # closed = normal, open = Requests scheitern sofort mit 503 + Retry-After, half_open = Probe läuft
+        "circuit_breakers": circuit_breaker.all_stats(),
+        "reranker": reranker.status(),
+        **_index_status(),
+    }
+
+
+def _index_status() -> dict:
+    """Aktiver Index (nach einem Reindex ≠ CHROMA_COLLECTION) und Reindex-Fortschritt."""
+    active = active_index()
+    job = get_reindex_job()
+    return {
+        "collection": active.collection,
+        "embedding_model": active.embedding_model,
+        "reindex": job.status() if job else None,
     }
+
+
+@router.get("/health/metrics")
+def health_metrics():
+    """Prozessinterne Counter (Cache-Treffer usw.) und Stufen-Latenzen (p50/p95/p99) als JSON."""
+    counters = metrics.snapshot()
+    prompt_tokens = counters.get("llm_prompt_tokens_total", 0.0)
+    return {
+        "counters": counters,
+        "histograms": metrics.histogram_snapshot(),
+        # Anteil der Prompt-Tokens, die llama.cpp aus dem KV-Cache übernommen hat (laut `timings`)
+        "llm_prompt_cache_hit_rate": (
+            round(counters.get("llm_prompt_cached_tokens_total", 0.0) / prompt_tokens, 4) if prompt_tokens else None
+        ),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Alle Metriken im Prometheus-Textformat (Scrape-Target)."""
+    # Gauges registrieren sich beim ersten Zugriff auf die Singletons
+    get_llm_client()
+    get_admission()
+    get_chroma_breaker()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,39 +2,67 @@
 RAG: Ingest (PDF → Chroma), Chat (Frage mit Kontext + Citations), Docs-Verwaltung.
 Schutzmaßnahmen: Limits, Logging, klare Fehlercodes (400/413/503/500).
 """
+import asyncio
+import hashlib
 import io
 import logging
 import re
 import time
 import uuid
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import numpy as np
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from fastapi.responses import StreamingResponse
 
 from app.core.deps import require_api_key
 from app.core.config import get_settings, settings
 from app.schemas.rag import (
+    BatchChatRequest,
+    BatchChatResult,
     ChatRequest,
     ChatResponse,
     Citation,
+    DocInfo,
+    DocListResponse,
     IngestResponse,
+    ReindexRequest,
+    SessionChatRequest,
+    SessionChatResponse,
+    SessionCreateRequest,
+    SessionInfo,
 )
+from app.services import metrics
+from app.services.admission import AdmissionRejected, get_admission
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.context_compression import compress as compress_context, observe_prompt
 from app.services.embeddings import embed_documents, embed_query, is_loaded
-from app.services.llm_client import LLMClient
+from app.services.llm_client import get_llm_client
+from app.services.reranker import rerank as rerank_hits
+from app.services.semantic_cache import get_semantic_cache
+from app.services.sessions import Session, Turn, condense_history, get_session_store
 from app.services.chroma_store import upsert_chunks as chroma_upsert_chunks, ChromaUnavailableError
+from app.services.artifact_store import build_artifact, get_artifact_store
+from app.services.doc_catalog import get_doc_catalog, sync_from_vector_store
+from app.services.doc_centroids import delete_centroid, upsert_centroid
+from app.services.index_state import active_collection, active_index, write_lock
+from app.services.reindex import ReindexError, get_reindex_job, start_reindex
 from app.services.vector_store import (
     chroma_reachable,
-    collection_count,
     delete_by_doc_id,
+    delete_ids,
     query_chunks,
+    query_chunks_batch,
 )
 from app.utils.chunking import chunk_text
+from app.utils import timing
+from app.utils.streaming import coalesce, ndjson_line, ndjson_token
 
 logger = logging.getLogger(__name__)
 log = logging.getLogger("uvicorn.error")
 
 router = APIRouter(prefix="/api/rag", tags=["rag"], dependencies=[Depends(require_api_key)])
-llm_client = LLMClient()
+llm_client = get_llm_client()
 
 def _sanitize_filename(name: str) -> str:
     """Dateiname für Anzeige sanitizen (nur sichere Zeichen, max 200 Zeichen)."""
@@ -44,6 +72,10 @@ def _sanitize_filename(name: str) -> str:
 
 
 MAX_BYTES = (settings.MAX_UPLOAD_MB or 50) * 1024 * 1024
+# Histogramme (Sekunden) je Stufe, label stage=…
+INGEST_STAGE = "rag_ingest_stage_seconds"
+CHAT_STAGE = "rag_chat_stage_seconds"
+
 RAG_TOP_K = settings.RAG_TOP_K
 RAG_MAX_CONTEXT_CHARS = settings.RAG_MAX_CONTEXT_CHARS
 RAG_MAX_CHUNKS = getattr(settings, "RAG_MAX_CHUNKS", None) or getattr(settings, "RAG_MAX_CHUNKS_PER_INGEST", 5000)
@@ -103,6 +135,62 @@ def _chunk_pages_with_metadata(
     return all_ids, all_docs, all_metadatas
 
 
+def _store_chunks(
+    collection: str,
+    doc_id: str,
+    filename: str,
+    ids: list,
+    documents: list,
+    metadatas: list,
+    embeddings: list,
+    pages: int,
+    size_bytes: int,
+    content_hash: str,
+    ingested_at: float,
+) -> None:
+    """Upsert in die Collection + Katalogeintrag + Dokument-Zentroid fürs Routing; scheitert der Katalog,
+    werden die Chunks zurückgerollt."""
+    try:
+        with metrics.timer(INGEST_STAGE, stage="upsert"):
+            chroma_upsert_chunks(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, collection_name=collection)
+    except ChromaUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Chroma unavailable: {e}") from e
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        err_msg = str(e).lower()
+        if "dimension" in err_msg or ("embedding" in err_msg and "size" in err_msg):
+            raise HTTPException(status_code=500, detail="Dimension mismatch (Embedding-Modell oder Collection geändert?).") from e
+        logger.exception("Chroma upsert fehlgeschlagen")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    try:
+        get_doc_catalog().add_document(
+            collection,
+            doc_id,
+            filename,
+            chunk_ids=ids,
+            pages=pages,
+            size_bytes=size_bytes,
+            content_hash=content_hash,
+            ingested_at=ingested_at,
+        )
+    except Exception as e:
+        # Ohne Katalogeintrag wäre das Dokument unsichtbar: Chunks wieder entfernen
+        logger.exception("Katalogeintrag doc_id=%s fehlgeschlagen", doc_id)
+        try:
+            delete_ids(ids, settings.DOC_DELETE_BATCH, collection=collection)
+        except Exception:
+            logger.exception("Rollback der Chunks doc_id=%s fehlgeschlagen", doc_id)
+        raise HTTPException(status_code=500, detail=f"Document catalog update failed: {e}") from e
+
+    try:
+        upsert_centroid(collection, doc_id, embeddings, filename=filename)
+    except Exception:
+        # Ohne Zentroid fehlt die volle Abdeckung → Abfragen laufen flach, bis sync_centroids nachzieht
+        logger.exception("Zentroid doc_id=%s nicht gespeichert", doc_id)
+
+
 @router.post("/ingest", response_model=IngestResponse)
 async def ingest(file: UploadFile = File(...)):
     """PDF hochladen → Text extrahieren, chunken, embedden, in Chroma speichern. Limits + Logging."""
@@ -118,15 +206,17 @@ async def ingest(file: UploadFile = File(...)):
     if size_bytes > max_bytes:
         raise HTTPException(status_code=413, detail=f"File too large. Max {settings.MAX_UPLOAD_MB} MB.")
 
-    if not chroma_reachable():
+    if not chroma_reachable(raise_if_open=True):
         raise HTTPException(status_code=503, detail="Chroma unreachable")
     if not is_loaded():
         raise HTTPException(status_code=500, detail="Embedding-Modell noch nicht geladen.")
 
     doc_id = uuid.uuid4().hex
+    active = active_index()
 
     try:
-        page_texts, warnings = _extract_text_from_pdf(content)
+        with metrics.timer(INGEST_STAGE, stage="extract"):
+            page_texts, warnings = _extract_text_from_pdf(content)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"PDF could not be parsed: {e}")
 
@@ -142,15 +232,16 @@ async def ingest(file: UploadFile = File(...)):
             bytes=size_bytes,
             pages=0,
             chunks=0,
-            collection=settings.CHROMA_COLLECTION,
+            collection=active.collection,
             status="skipped",
             warnings=["No text extracted (likely a scanned PDF). OCR is not implemented yet."] + warnings,
             elapsed_ms=elapsed_ms,
         )
 
-    ids, documents, metadatas = _chunk_pages_with_metadata(
-        page_texts, doc_id, filename, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
-    )
+    with metrics.timer(INGEST_STAGE, stage="chunk"):
+        ids, documents, metadatas = _chunk_pages_with_metadata(
+            page_texts, doc_id, filename, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        )
     if not ids:
         elapsed_ms = _elapsed()
         log.info(f"[ingest] skipped doc_id={doc_id} file={filename} bytes={size_bytes} pages={len(page_texts)} chunks=0 elapsed_ms={elapsed_ms}")
@@ -160,7 +251,7 @@ async def ingest(file: UploadFile = File(...)):
             bytes=size_bytes,
             pages=len(page_texts),
             chunks=0,
-            collection=settings.CHROMA_COLLECTION,
+            collection=active.collection,
             status="skipped",
             warnings=warnings,
             elapsed_ms=elapsed_ms,
@@ -172,24 +263,57 @@ async def ingest(file: UploadFile = File(...)):
             detail=f"Too many chunks (>{RAG_MAX_CHUNKS}). Reduce PDF size or adjust chunking.",
         )
 
+    # Dokumentdaten auch an jedem Chunk: daraus lässt sich der Katalog bei Verlust neu aufbauen
+    content_hash = hashlib.sha256(content).hexdigest()
+    ingested_at = time.time()
+    for meta in metadatas:
+        meta.update({
+            "content_hash": content_hash,
+            "ingested_at": ingested_at,
+            "doc_pages": len(page_texts),
+            "doc_bytes": size_bytes,
+        })
+
     try:
-        embeddings = embed_documents(documents, batch_size=32)
+        with metrics.timer(INGEST_STAGE, stage="embed"):
+            embeddings = embed_documents(documents, batch_size=32)
     except Exception as e:
         logger.exception("Embedding fehlgeschlagen")
         raise HTTPException(status_code=500, detail=f"Embedding failed: {e}") from e
 
+    # Seitentexte + Chunk-Grenzen sichern: Reindex (z. B. neues Embedding-Modell) ohne erneutes PDF-Parsen
+    artifacts = get_artifact_store()
+    if artifacts is not None:
+        try:
+            artifacts.save(build_artifact(
+                doc_id, filename, page_texts, CHUNK_SIZE, CHUNK_OVERLAP,
+                doc_meta={k: metadatas[0][k] for k in ("content_hash", "ingested_at", "doc_pages", "doc_bytes")},
+            ))
+        except OSError as e:
+            logger.warning("Artefakt doc_id=%s nicht gespeichert (Reindex nutzt dann die Chunk-Texte aus Chroma): %s", doc_id, e)
+
+    def _store_locked(embedded_for, vectors):
+        # Unter dem Schreib-Lock: ein Reindex schaltet nicht zwischen Upsert und Katalogeintrag um
+        with write_lock():
+            current = active_index()
+            if current != embedded_for:
+                # Während des Embeddings auf einen neuen Index umgeschaltet → mit dessen Modell neu embedden
+                vectors = embed_documents(documents, batch_size=32)
+            _store_chunks(current.collection, doc_id, filename, ids, documents, metadatas, vectors,
+                          pages=len(page_texts), size_bytes=size_bytes, content_hash=content_hash, ingested_at=ingested_at)
+            return current
+
+    # Lock (wartet ggf. auf das Umschalten eines Reindex), Embedding und Upsert blockieren → im Thread
     try:
-        chroma_upsert_chunks(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-    except ChromaUnavailableError as e:
-        raise HTTPException(status_code=503, detail=f"Chroma unavailable: {e}") from e
-    except Exception as e:
-        err_msg = str(e).lower()
-        if "dimension" in err_msg or ("embedding" in err_msg and "size" in err_msg):
-            raise HTTPException(status_code=500, detail="Dimension mismatch (Embedding-Modell oder Collection geändert?).") from e
-        logger.exception("Chroma upsert fehlgeschlagen")
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        active = await asyncio.to_thread(_store_locked, active, embeddings)
+    except Exception:
+        if artifacts is not None:
+            artifacts.delete(doc_id)
+        raise
 
+    get_semantic_cache().invalidate()
     elapsed_ms = _elapsed()
+    metrics.observe(INGEST_STAGE, elapsed_ms / 1000.0, stage="total")
     log.info(f"[ingest] indexed doc_id={doc_id} file={filename} bytes={size_bytes} pages={len(page_texts)} chunks={len(ids)} elapsed_ms={elapsed_ms}")
     return IngestResponse(
         doc_id=doc_id,
@@ -197,50 +321,146 @@ async def ingest(file: UploadFile = File(...)):
         bytes=size_bytes,
         pages=len(page_texts),
         chunks=len(ids),
-        collection=settings.CHROMA_COLLECTION,
+        collection=active.collection,
         status="indexed",
         warnings=warnings,
         elapsed_ms=elapsed_ms,
     )
 
 
-def _build_rag_prompt(context: str, question: str, language: str) -> str:
+def _build_rag_prompt(context: str, question: str, language: str, history: str = "") -> str:
+    """Aufbau für den llama.cpp-Prompt-Cache: stabiler Präfix zuerst (Anweisungen, dann Kontext,
+    bei Sessions der Verlauf), Variables (Sprache, Frage) ans Ende – Folgefragen zum selben
+    Dokument teilen so den Präfix."""
     lang_instruction = "Antworte auf Deutsch." if language == "de" else "Answer in English."
-    return f"""Antworte ausschließlich auf Basis des folgenden Kontexts. {lang_instruction}
+    history_block = f"Bisheriger Verlauf:\n{history}\n\n" if history else ""
+    return f"""Antworte ausschließlich auf Basis des folgenden Kontexts.
 Wenn die Antwort nicht im Kontext steht, antworte nur: "Nicht im Dokument."
 
 Kontext:
 {context}
 
+{history_block}{lang_instruction}
 Frage: {question}
 
 Kurze, sachliche Antwort (nur aus dem Kontext):"""
 
 
+def _build_context(documents: list, metadatas: Optional[list] = None, max_chars: Optional[int] = None) -> str:
+    """Kontext bis RAG_MAX_CONTEXT_CHARS (bzw. max_chars) bauen. Auswahl nach Relevanz (Reihenfolge der
+    Treffer), Anordnung nach Position im Dokument (doc_id, Seite, Chunk) – gleiche Chunks ergeben so
+    unabhängig vom Ranking denselben Text und damit einen wiederverwendbaren Prompt-Präfix."""
+    limit = max_chars or RAG_MAX_CONTEXT_CHARS
+    selected = []
+    total_len = 0
+    for i, doc in enumerate(documents):
+        if total_len >= limit:
+            break
+        part = doc if isinstance(doc, str) else str(doc)
+        if total_len + len(part) > limit:
+            part = part[: limit - total_len]
+        meta = (metadatas[i] if metadatas and i < len(metadatas) else None) or {}
+        selected.append(((str(meta.get("doc_id", "")), meta.get("page") or 0, meta.get("chunk_index") or 0, i), part))
+        total_len += len(part)
+    selected.sort(key=lambda item: item[0])
+    return "\n\n---\n\n".join(part for _, part in selected)
+
+
+def _build_citations(
+    ids: list, metadatas: list, distances: list, documents: list, rerank_scores: Optional[list] = None
+) -> list[dict]:
+    """Citations aus Treffern (Chroma distances: kleiner = ähnlicher; rerank_scores vom Cross-Encoder)."""
+    citations = []
+    for i, (cid, meta, dist, doc_text) in enumerate(zip(ids, metadatas or [], distances or [], documents)):
+        meta = meta or {}
+        excerpt = (doc_text or "")[:400] + ("..." if len(doc_text or "") > 400 else "")
+        score = 1.0 / (1.0 + float(dist)) if dist is not None else 0.0
+        citations.append({
+            "chunk_id": cid,
+            "filename": meta.get("filename", ""),
+            "page": meta.get("page"),
+            "score": round(score, 4),
+            "excerpt": excerpt,
+            "rerank_score": rerank_scores[i] if rerank_scores else None,
+        })
+    return citations
+
+
+def _rerank_on(flag: Optional[bool]) -> bool:
+    return settings.RERANK_ENABLED if flag is None else flag
+
+
+def _candidates(flag: Optional[bool], top_k: int) -> int:
+    """Anzahl Treffer aus Chroma: mit Reranking RERANK_CANDIDATES (Over-Fetch), sonst top_k."""
+    return max(top_k, settings.RERANK_CANDIDATES) if _rerank_on(flag) else top_k
+
+
+async def _maybe_rerank(flag: Optional[bool], question: str, result: dict, top_k: int) -> dict:
+    """Kandidaten per Cross-Encoder neu ordnen und auf top_k kürzen (Budget → sonst Dense-Reihenfolge)."""
+    if not _rerank_on(flag) or len(result["ids"]) <= 1:
+        return result
+    with metrics.timer(CHAT_STAGE, stage="rerank"):
+        return await rerank_hits(question, result, top_k)
+
+
+async def _rag_context(req: ChatRequest, query_emb: list, ids: list, documents: list, metadatas: list) -> Tuple[str, bool]:
+    """Kontext für den Prompt, mit Kompression (req.compress bzw. CONTEXT_COMPRESSION_ENABLED) nur aus
+    den zur Frage passenden Sätzen. Liefert (Kontext, komprimiert?); bei Fehlern voller Kontext."""
+    if settings.CONTEXT_COMPRESSION_ENABLED if req.compress is None else req.compress:
+        try:
+            with metrics.timer(CHAT_STAGE, stage="compress"):
+                packed = await asyncio.to_thread(compress_context, query_emb, ids, documents, metadatas)
+                return _build_context(packed.documents, packed.metadatas), True
+        except Exception:
+            logger.exception("Kontext-Kompression fehlgeschlagen, voller Kontext")
+            metrics.inc("rag_compression_errors_total")
+    with metrics.timer(CHAT_STAGE, stage="context"):
+        return _build_context(documents, metadatas), False
+
+
+def _cache_lookup(req: ChatRequest, query_emb: list, ids: list):
+    """Semantischer Cache: nur wenn global aktiv und nicht per Request abgeschaltet."""
+    if not (settings.SEMANTIC_CACHE_ENABLED and req.use_cache):
+        return None
+    return get_semantic_cache().lookup(query_emb, ids, req.doc_id, req.language)
+
+
+def _cache_store(req: ChatRequest, query_emb: list, ids: list, answer: str) -> None:
+    if not (settings.SEMANTIC_CACHE_ENABLED and req.use_cache) or not answer:
+        return
+    get_semantic_cache().store(query_emb, ids, req.doc_id, req.language, req.question, answer)
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     """Frage an die indexierten Dokumente; Antwort nur aus Kontext + Citations."""
-    if not chroma_reachable():
+    if not chroma_reachable(raise_if_open=True):
         raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
     if not is_loaded():
         raise HTTPException(status_code=500, detail="Embedding-Modell noch nicht geladen.")
 
+    t_start = time.perf_counter()
     top_k = req.top_k or RAG_TOP_K
     try:
-        query_emb = embed_query(req.question)
+        with metrics.timer(CHAT_STAGE, stage="query_embed"):
+            query_emb = embed_query(req.question)
     except Exception as e:
         logger.exception("embed_query failed")
         raise HTTPException(status_code=500, detail=f"Embedding fehlgeschlagen: {e}") from e
 
     try:
-        result = query_chunks(
-            query_embedding=query_emb,
-            n_results=top_k,
-            doc_id=req.doc_id,
-        )
+        with metrics.timer(CHAT_STAGE, stage="retrieve"):
+            result = query_chunks(
+                query_embedding=query_emb,
+                n_results=_candidates(req.rerank, top_k),
+                doc_id=req.doc_id,
+            )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.exception("Chroma query failed")
         raise HTTPException(status_code=503, detail=f"Chroma-Anfrage fehlgeschlagen: {e}") from e
+    result = await _maybe_rerank(req.rerank, req.question, result, top_k)
 
     ids = result["ids"]
     documents = result["documents"]
@@ -253,162 +473,606 @@ async def chat(req: ChatRequest):
             citations=[],
             used_chunks=0,
             doc_id=req.doc_id,
-            collection=settings.CHROMA_COLLECTION,
+            collection=active_collection(),
             context_preview=None if not req.return_context else "(kein Kontext)",
         )
 
-    # Kontext bis RAG_MAX_CONTEXT_CHARS bauen
-    context_parts = []
-    total_len = 0
-    for i, doc in enumerate(documents):
-        if total_len >= RAG_MAX_CONTEXT_CHARS:
-            break
-        part = doc if isinstance(doc, str) else str(doc)
-        if total_len + len(part) > RAG_MAX_CONTEXT_CHARS:
-            part = part[: RAG_MAX_CONTEXT_CHARS - total_len]
-        context_parts.append(part)
-        total_len += len(part)
-    context = "\n\n---\n\n".join(context_parts)
+    citations = [Citation(**c) for c in _build_citations(ids, metadatas, distances, documents, result.get("rerank_scores"))]
+
+    hit = _cache_lookup(req, query_emb, ids)
+    if hit is not None:
+        context = _build_context(documents, metadatas) if req.return_context else ""
+        return ChatResponse(
+            answer=hit.answer,
+            citations=citations,
+            used_chunks=len(documents),
+            doc_id=req.doc_id,
+            collection=active_collection(),
+            context_preview=context[:500] + "..." if req.return_context and context else None,
+            cached=True,
+            cache_similarity=round(hit.similarity, 4),
+        )
 
+    context, compressed = await _rag_context(req, query_emb, ids, documents, metadatas)
     prompt = _build_rag_prompt(context, req.question, req.language)
-    try:
-        answer = await llm_client.completion(prompt, n_predict=800, temperature=0.2)
-        answer = (answer or "").strip()
-        if not answer:
-            answer = "Nicht im Dokument."
-    except Exception as e:
-        logger.exception("LLM call failed")
-        raise HTTPException(status_code=502, detail=f"LLM nicht erreichbar: {e}") from e
+    observe_prompt(prompt, compressed)
+    async with get_admission().slot("interactive"):
+        try:
+            with metrics.timer(CHAT_STAGE, stage="generate"):
+                answer = await llm_client.completion(prompt, n_predict=800, temperature=0.2, cache_key=req.doc_id)
+            answer = (answer or "").strip()
+            if not answer:
+                answer = "Nicht im Dokument."
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.exception("LLM call failed")
+            raise HTTPException(status_code=502, detail=f"LLM nicht erreichbar: {e}") from e
 
-    # Citations aus Treffern (Chroma distances: kleiner = ähnlicher)
-    citations = []
-    for i, (cid, meta, dist, doc_text) in enumerate(zip(ids, metadatas or [], distances or [], documents)):
-        meta = meta or {}
-        excerpt = (doc_text or "")[:400] + ("..." if len(doc_text or "") > 400 else "")
-        score = 1.0 / (1.0 + float(dist)) if dist is not None else 0.0
-        citations.append(Citation(
-            chunk_id=cid,
-            filename=meta.get("filename", ""),
-            page=meta.get("page"),
-            score=round(score, 4),
-            excerpt=excerpt,
-        ))
+    _cache_store(req, query_emb, ids, answer)
+    metrics.observe(CHAT_STAGE, time.perf_counter() - t_start, stage="total")
 
     return ChatResponse(
         answer=answer,
         citations=citations,
         used_chunks=len(documents),
         doc_id=req.doc_id,
-        collection=settings.CHROMA_COLLECTION,
+        collection=active_collection(),
         context_preview=context[:500] + "..." if req.return_context and context else None,
     )
 
 
-async def _stream_rag_chat(req: ChatRequest):
-    """Generator: NDJSON lines. First 'meta' (citations, used_chunks), then 'token' lines, then 'done'."""
-    import json
+# Wie oft (höchstens) pro Stream aktiv auf Client-Disconnect geprüft wird
+DISCONNECT_CHECK_INTERVAL_S = 0.25
+
+
+async def _stream_rag_chat(req: ChatRequest, request: Optional[Request] = None):
+    """Generator: NDJSON lines. First 'meta' (citations, used_chunks), then 'queued' (nur wenn das LLM
+    ausgelastet ist, mit Position), then 'token' lines, then 'done'. Der LLM-Slot wird erst mit fertigem
+    Prompt angefordert (Embedding, Retrieval, Rerank und Cache-Treffer belegen keinen) und immer freigegeben.
+    Client weg → Generator-Kette schließen: completion_stream beendet die Upstream-Verbindung,
+    llama.cpp bricht die Generierung ab (Cancel durch Starlette oder eigene Prüfung hier)."""
+    events = _stream_rag_events(req)
+    last_check = time.monotonic()
+    try:
+        async for line in events:
+            if request is not None and time.monotonic() - last_check >= DISCONNECT_CHECK_INTERVAL_S:
+                last_check = time.monotonic()
+                if await request.is_disconnected():
+                    log.info("[chat/stream] client disconnected, aborting generation")
+                    break
+            yield line
+    finally:
+        await events.aclose()
+
+
+async def _stream_rag_events(req: ChatRequest):
+    t_start = time.perf_counter()
     top_k = req.top_k or RAG_TOP_K
     try:
-        query_emb = embed_query(req.question)
+        with metrics.timer(CHAT_STAGE, stage="query_embed"):
+            query_emb = embed_query(req.question)
     except Exception as e:
         logger.exception("embed_query failed")
-        yield json.dumps({"type": "error", "detail": f"Embedding fehlgeschlagen: {e}"}) + "\n"
+        yield ndjson_line({"type": "error", "detail": f"Embedding fehlgeschlagen: {e}"})
         return
     try:
-        result = query_chunks(
-            query_embedding=query_emb,
-            n_results=top_k,
-            doc_id=req.doc_id,
-        )
+        with metrics.timer(CHAT_STAGE, stage="retrieve"):
+            result = query_chunks(
+                query_embedding=query_emb,
+                n_results=_candidates(req.rerank, top_k),
+                doc_id=req.doc_id,
+            )
+    except CircuitOpenError as e:
+        yield ndjson_line({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+        return
     except Exception as e:
         logger.exception("Chroma query failed")
-        yield json.dumps({"type": "error", "detail": f"Chroma-Anfrage fehlgeschlagen: {e}"}) + "\n"
+        yield ndjson_line({"type": "error", "detail": f"Chroma-Anfrage fehlgeschlagen: {e}"})
         return
+    result = await _maybe_rerank(req.rerank, req.question, result, top_k)
     ids = result["ids"]
     documents = result["documents"]
     metadatas = result["metadatas"]
     distances = result["distances"]
-    citations = []
-    if documents:
-        for cid, meta, dist, doc_text in zip(ids, metadatas or [], distances or [], documents):
-            meta = meta or {}
-            excerpt = (doc_text or "")[:400] + ("..." if len(doc_text or "") > 400 else "")
-            score = 1.0 / (1.0 + float(dist)) if dist is not None else 0.0
-            citations.append({
-                "chunk_id": cid,
-                "filename": meta.get("filename", ""),
-                "page": meta.get("page"),
-                "score": round(score, 4),
-                "excerpt": excerpt,
-            })
+    citations = _build_citations(ids, metadatas, distances, documents, result.get("rerank_scores")) if documents else []
+    hit = _cache_lookup(req, query_emb, ids) if documents else None
     meta_line = {
         "type": "meta",
         "citations": citations,
         "used_chunks": len(documents),
         "doc_id": req.doc_id,
-        "collection": settings.CHROMA_COLLECTION,
+        "collection": active_collection(),
+        "cached": hit is not None,
     }
-    yield json.dumps(meta_line) + "\n"
+    if hit is not None:
+        meta_line["cache_similarity"] = round(hit.similarity, 4)
+    yield ndjson_line(meta_line)
     if not documents:
-        yield json.dumps({"type": "token", "content": "Nicht im Dokument."}) + "\n"
-        yield json.dumps({"type": "done"}) + "\n"
+        yield ndjson_token("Nicht im Dokument.")
+        yield ndjson_line({"type": "done"})
         return
-    context_parts = []
-    total_len = 0
-    for doc in documents:
-        if total_len >= RAG_MAX_CONTEXT_CHARS:
-            break
-        part = doc if isinstance(doc, str) else str(doc)
-        if total_len + len(part) > RAG_MAX_CONTEXT_CHARS:
-            part = part[: RAG_MAX_CONTEXT_CHARS - total_len]
-        context_parts.append(part)
-        total_len += len(part)
-    context = "\n\n---\n\n".join(context_parts)
+    if hit is not None:
+        yield ndjson_token(hit.answer)
+        yield ndjson_line({"type": "done"})
+        return
+    context, compressed = await _rag_context(req, query_emb, ids, documents, metadatas)
     prompt = _build_rag_prompt(context, req.question, req.language)
+    observe_prompt(prompt, compressed)
     try:
-        async for content in llm_client.completion_stream(prompt, n_predict=800, temperature=0.2):
-            if content:
-                yield json.dumps({"type": "token", "content": content}) + "\n"
-    except Exception as e:
-        logger.exception("LLM stream failed")
-        yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        ticket = get_admission().enqueue("interactive")
+    except AdmissionRejected as e:
+        yield ndjson_line({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
         return
-    yield json.dumps({"type": "done"}) + "\n"
+    try:
+        # Auf freien LLM-Slot warten; Position melden, solange sie sich ändert
+        last_position = 0
+        while not ticket.admitted:
+            position = ticket.position
+            if position != last_position:
+                yield ndjson_line({"type": "queued", "position": position})
+                last_position = position
+            try:
+                await ticket.wait(poll_seconds=1.0)
+            except asyncio.TimeoutError:
+                continue
+            except AdmissionRejected as e:
+                yield ndjson_line({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+                return
+        answer_parts = []
+        tokens = coalesce(
+            llm_client.completion_stream(prompt, n_predict=800, temperature=0.2, cache_key=req.doc_id),
+            flush_interval_s=settings.STREAM_FLUSH_INTERVAL_MS / 1000.0,
+            max_chars=settings.STREAM_FLUSH_MAX_CHARS,
+        )
+        t_llm = time.perf_counter()
+        try:
+            async for content in tokens:
+                if content:
+                    if not answer_parts:
+                        ttft = time.perf_counter() - t_llm
+                        metrics.observe(CHAT_STAGE, ttft, stage="ttft")
+                        metrics.observe("rag_chat_ttft_seconds", ttft, compressed="1" if compressed else "0")
+                    answer_parts.append(content)
+                    yield ndjson_token(content)
+        except CircuitOpenError as e:
+            yield ndjson_line({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logger.exception("LLM stream failed")
+            yield ndjson_line({"type": "error", "detail": str(e)})
+            return
+        finally:
+            await tokens.aclose()
+        t_end = time.perf_counter()
+        metrics.observe(CHAT_STAGE, t_end - t_llm, stage="generate")
+        metrics.observe(CHAT_STAGE, t_end - t_start, stage="total")
+        _cache_store(req, query_emb, ids, "".join(answer_parts).strip())
+        request_timer = timing.current()
+        if request_timer is not None:
+            # Nur mit Debug-Header: gleiche Aufschlüsselung wie Server-Timing, aber inkl. Generierung
+            yield ndjson_line({"type": "timing", "stages_ms": request_timer.as_dict(), "server_timing": request_timer.header()})
+        yield ndjson_line({"type": "done"})
+    finally:
+        ticket.release()
 
 
 @router.post("/chat/stream")
-async def chat_stream(req: ChatRequest):
+async def chat_stream(req: ChatRequest, request: Request):
     """RAG-Chat mit Echtzeit-Streaming: zuerst Meta (Citations), dann Token für die Antwort."""
-    if not chroma_reachable():
+    if not chroma_reachable(raise_if_open=True):
         raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
     if not is_loaded():
         raise HTTPException(status_code=500, detail="Embedding-Modell noch nicht geladen.")
+    # Volle Warteschlange → sofort 429 mit Retry-After; der Slot selbst erst mit fertigem Prompt
+    get_admission().check()
     return StreamingResponse(
-        _stream_rag_chat(req),
+        _stream_rag_chat(req, request),
         media_type="application/x-ndjson",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
-@router.get("/docs")
-async def list_docs():
-    """Collection-Info: Name und Anzahl Chunks (für Tests/Debug)."""
-    if not chroma_reachable():
+async def _batch_answer(index: int, item: ChatRequest, query_emb: list, result: dict, lanes: asyncio.Queue) -> BatchChatResult:
+    """Eine Frage des Batches: Reranking, Cache, sonst Generierung auf einer freien Lane (Lane = Cache-Key,
+    damit sich die Fragen über alle llama.cpp-Slots verteilen statt auf den Slot des Dokuments)."""
+    result = await _maybe_rerank(item.rerank, item.question, result, item.top_k or RAG_TOP_K)
+    ids = result["ids"]
+    documents = result["documents"]
+    metadatas = result["metadatas"]
+    citations = [
+        Citation(**c) for c in _build_citations(ids, metadatas, result["distances"], documents, result.get("rerank_scores"))
+    ] if documents else []
+    out = BatchChatResult(index=index, question=item.question, citations=citations, used_chunks=len(documents))
+    if not documents:
+        out.answer = "Nicht im Dokument."
+        return out
+    hit = _cache_lookup(item, query_emb, ids)
+    if hit is not None:
+        out.answer = hit.answer
+        out.cached = True
+        return out
+
+    context, compressed = await _rag_context(item, query_emb, ids, documents, metadatas)
+    prompt = _build_rag_prompt(context, item.question, item.language)
+    observe_prompt(prompt, compressed)
+    lane = await lanes.get()
+    try:
+        async with get_admission().slot("batch"):
+            answer = await llm_client.completion(
+                prompt, n_predict=800, temperature=0.2, cache_key=f"batch:{item.doc_id}:{lane}"
+            )
+    except (AdmissionRejected, CircuitOpenError) as e:
+        out.error = e.detail
+        return out
+    except Exception as e:
+        logger.exception("LLM call failed (batch index=%d)", index)
+        out.error = f"LLM nicht erreichbar: {e}"
+        return out
+    finally:
+        lanes.put_nowait(lane)
+    out.answer = (answer or "").strip() or "Nicht im Dokument."
+    _cache_store(item, query_emb, ids, out.answer)
+    return out
+
+
+async def _stream_batch(items: list, embeddings: list, results: list, request: Optional[Request] = None):
+    t0 = time.perf_counter()
+    concurrency = max(1, settings.BATCH_CONCURRENCY or settings.LLM_MAX_CONCURRENCY)
+    lanes: asyncio.Queue = asyncio.Queue()
+    for lane in range(concurrency):
+        lanes.put_nowait(lane)
+    yield ndjson_line({
+        "type": "meta",
+        "count": len(items),
+        "concurrency": concurrency,
+        "collection": active_collection(),
+    })
+    tasks = [
+        asyncio.create_task(_batch_answer(i, item, emb, result, lanes))
+        for i, (item, emb, result) in enumerate(zip(items, embeddings, results))
+    ]
+    errors = 0
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=DISCONNECT_CHECK_INTERVAL_S, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Ohne Ausgabe merkt der Server den Disconnect erst beim nächsten Schreiben
+                if request is not None and await request.is_disconnected():
+                    log.info("[chat/batch] client disconnected, cancelling %d generations", len(pending))
+                    return
+                continue
+            for task in done:
+                res = task.result()
+                errors += res.error is not None
+                metrics.inc("batch_questions_total")
+                yield ndjson_line(res.model_dump())
+    finally:
+        # Client weg → offene Generierungen abbrechen (gibt Lanes und LLM-Slots frei)
+        for task in tasks:
+            task.cancel()
+    yield ndjson_line({
+        "type": "done",
+        "count": len(items),
+        "errors": errors,
+        "elapsed_ms": int(round((time.perf_counter() - t0) * 1000)),
+    })
+
+
+@router.post("/chat/batch")
+async def chat_batch(req: BatchChatRequest, request: Request):
+    """Viele Fragen in einem Request: ein Embedding-Batch, eine Chroma-Abfrage für alle Fragen,
+    Generierungen parallel (BATCH_CONCURRENCY, Priorität "batch"). Antwort als NDJSON:
+    meta, dann je Frage ein result (Reihenfolge = Fertigstellung, Zuordnung über index), dann done."""
+    if len(req.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413, detail=f"Zu viele Fragen (max. {settings.BATCH_MAX_QUESTIONS} pro Request)."
+        )
+    if not chroma_reachable(raise_if_open=True):
         raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
+    if not is_loaded():
+        raise HTTPException(status_code=500, detail="Embedding-Modell noch nicht geladen.")
+
+    items = [
+        ChatRequest(
+            question=q, doc_id=req.doc_id, top_k=req.top_k, language=req.language, use_cache=req.use_cache,
+            compress=req.compress, rerank=req.rerank,
+        )
+        for q in req.questions
+    ]
+    # Embedding und Chroma blockieren → im Thread, damit andere Requests weiterlaufen
+    try:
+        embeddings = await asyncio.to_thread(embed_documents, req.questions)
+    except Exception as e:
+        logger.exception("embed_documents failed")
+        raise HTTPException(status_code=500, detail=f"Embedding fehlgeschlagen: {e}") from e
+    try:
+        results = await asyncio.to_thread(
+            query_chunks_batch, embeddings, _candidates(req.rerank, req.top_k or RAG_TOP_K), req.doc_id
+        )
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.exception("Chroma batch query failed")
+        raise HTTPException(status_code=503, detail=f"Chroma-Anfrage fehlgeschlagen: {e}") from e
+    metrics.inc("batch_requests_total")
+
+    return StreamingResponse(
+        _stream_batch(items, embeddings, results, request),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _session_info(session: Session) -> SessionInfo:
+    return SessionInfo(
+        session_id=session.id,
+        doc_id=session.doc_id,
+        language=session.language,
+        turns=len(session.turns),
+        cached_chunks=len(session.chunks),
+        expires_in_s=get_session_store().expires_in(session),
+    )
+
+
+def _get_session_or_404(session_id: str) -> Session:
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session unbekannt oder abgelaufen.")
+    return session
+
+
+def _build_session_context(session: Session) -> str:
+    """Kontext aus dem Session-Pool in Aufnahme-Reihenfolge: neue Chunks kommen nur hinten dazu,
+    der bisherige Kontext bleibt als Prompt-Präfix im KV-Cache des Session-Slots gültig."""
+    parts = []
+    total_len = 0
+    for chunk in session.chunks.values():
+        if total_len >= RAG_MAX_CONTEXT_CHARS:
+            break
+        part = chunk.document[: RAG_MAX_CONTEXT_CHARS - total_len]
+        parts.append(part)
+        total_len += len(part)
+    return "\n\n---\n\n".join(parts)
+
+
+@router.post("/sessions", response_model=SessionInfo)
+async def create_session(req: SessionCreateRequest):
+    """Neue Chat-Session (Verlauf + Retrieval-Cache serverseitig, TTL SESSION_TTL_SECONDS)."""
+    return _session_info(get_session_store().create(req.doc_id, req.language))
+
+
+@router.get("/sessions/{session_id}", response_model=SessionInfo)
+async def get_session(session_id: str):
+    return _session_info(_get_session_or_404(session_id))
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Session unbekannt oder abgelaufen.")
+    return {"status": "deleted", "session_id": session_id}
+
+
+@router.post("/sessions/{session_id}/chat", response_model=SessionChatResponse)
+async def session_chat(session_id: str, req: SessionChatRequest):
+    """Turn in einer Session. Folgefragen: Retrieval mit der vorigen Frage als Kontext; ist die
+    Abfrage der letzten ähnlich genug, entfällt die Chroma-Abfrage ganz, sonst werden nur neue
+    Chunks in den Pool aufgenommen. Verlauf wird ins Prompt-Budget verdichtet, die Session ist
+    an einen festen llama.cpp-Slot gebunden."""
+    session = _get_session_or_404(session_id)
+    if not is_loaded():
+        raise HTTPException(status_code=500, detail="Embedding-Modell noch nicht geladen.")
+
+    async with session.lock:
+        retrieval_text = req.question
+        if session.turns:
+            retrieval_text = f"{session.turns[-1].question}\n{req.question}"
+        # Embedding und Chroma blockieren → im Thread (der Session-Lock hält sonst den Event-Loop mit an)
+        try:
+            query_emb = await asyncio.to_thread(embed_query, retrieval_text)
+        except Exception as e:
+            logger.exception("embed_query failed")
+            raise HTTPException(status_code=500, detail=f"Embedding fehlgeschlagen: {e}") from e
+
+        reused = False
+        new_chunks = 0
+        q = np.asarray(query_emb, dtype=np.float32)
+        # Nach einem Reindex-Umschalten kann die letzte Abfrage eine andere Dimension haben
+        if session.last_query_embedding is not None and session.chunks and session.last_query_embedding.shape == q.shape:
+            reused = float(session.last_query_embedding @ q) >= settings.SESSION_REUSE_THRESHOLD
+        if not reused:
+            if not chroma_reachable(raise_if_open=True):
+                raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
+            try:
+                result = await asyncio.to_thread(
+                    query_chunks,
+                    query_embedding=query_emb,
+                    n_results=_candidates(req.rerank, req.top_k or RAG_TOP_K),
+                    doc_id=session.doc_id,
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.exception("Chroma query failed")
+                raise HTTPException(status_code=503, detail=f"Chroma-Anfrage fehlgeschlagen: {e}") from e
+            result = await _maybe_rerank(req.rerank, retrieval_text, result, req.top_k or RAG_TOP_K)
+            new_chunks = session.add_chunks(
+                result["ids"], result["documents"], result["metadatas"], result["distances"],
+                max_chunks=settings.SESSION_MAX_CHUNKS,
+            )
+            session.last_query_embedding = q
+            session.last_hit_ids = list(result["ids"])
+            metrics.inc("session_chunks_topped_up_total", new_chunks)
+        else:
+            metrics.inc("session_retrieval_reused_total")
+        metrics.inc("session_turns_total")
+
+        hits = session.hits()
+        citations = [
+            Citation(**c) for c in _build_citations(
+                [h.chunk_id for h in hits], [h.metadata for h in hits], [h.distance for h in hits], [h.document for h in hits]
+            )
+        ]
+        context = _build_session_context(session)
+        if not context:
+            answer = "Nicht im Dokument."
+        else:
+            history = condense_history(session.turns, settings.SESSION_HISTORY_MAX_CHARS)
+            prompt = _build_rag_prompt(context, req.question, session.language, history)
+            observe_prompt(prompt, False)  # Session-Kontext bleibt voll (Präfix im KV-Cache des Slots)
+            async with get_admission().slot("interactive"):
+                try:
+                    answer = await llm_client.completion(
+                        prompt, n_predict=800, temperature=0.2, cache_key=f"session:{session.id}"
+                    )
+                    answer = (answer or "").strip() or "Nicht im Dokument."
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    logger.exception("LLM call failed")
+                    raise HTTPException(status_code=502, detail=f"LLM nicht erreichbar: {e}") from e
+
+        session.turns.append(Turn(question=req.question, answer=answer))
+        # Mindestens der letzte Turn bleibt (Retrieval der Folgefrage); [:-0] löschte nichts
+        del session.turns[: -max(1, settings.SESSION_MAX_TURNS)]
+
+    return SessionChatResponse(
+        answer=answer,
+        citations=citations,
+        used_chunks=len(session.chunks),
+        doc_id=session.doc_id,
+        collection=active_collection(),
+        context_preview=context[:500] + "..." if req.return_context and context else None,
+        session_id=session.id,
+        turn=len(session.turns),
+        retrieval_reused=reused,
+        new_chunks=new_chunks,
+    )
+
+
+@router.get("/docs", response_model=DocListResponse)
+async def list_docs(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Dokumente seitenweise aus dem Katalog (neueste zuerst) – ohne Chroma-Zugriff."""
+    catalog = get_doc_catalog()
+    collection = active_collection()
+    total_docs, total_chunks = catalog.stats(collection)
+    return DocListResponse(
+        collection=collection,
+        total_docs=total_docs,
+        total_chunks=total_chunks,
+        offset=offset,
+        limit=limit,
+        items=[DocInfo(**d) for d in catalog.list(collection, offset=offset, limit=limit)],
+    )
+
+
+@router.get("/docs/{doc_id}", response_model=DocInfo)
+async def get_doc(doc_id: str):
+    doc = get_doc_catalog().get(active_collection(), doc_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Dokument nicht im Katalog.")
+    return DocInfo(**doc)
+
+
+@router.post("/docs/catalog/rebuild")
+async def rebuild_doc_catalog():
+    """Katalog der aktuellen Collection aus den Chroma-Metadaten neu aufbauen (einmaliger Scan)."""
+    if not chroma_reachable(raise_if_open=True):
+        raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
+    try:
+        docs = await asyncio.to_thread(sync_from_vector_store, True)
+    except Exception as e:
+        logger.exception("Katalog-Rebuild fehlgeschlagen")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    collection = active_collection()
+    total_docs, total_chunks = get_doc_catalog().stats(collection)
+    return {"status": "rebuilt", "collection": collection, "total_docs": docs, "total_chunks": total_chunks}
+
+
+@router.post("/reindex", status_code=202)
+async def reindex(req: ReindexRequest):
+    """Alle Dokumente mit dem Zielmodell in eine neue Collection einbetten (Hintergrund, aus den
+    Extraktions-Artefakten), danach aktiven Index umschalten. Bis dahin bleibt der alte Index aktiv."""
+    if not chroma_reachable(raise_if_open=True):
+        raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
+    try:
+        job = await asyncio.to_thread(start_reindex, req.embedding_model, req.rechunk)
+    except ReindexError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return job.status()
+
+
+@router.get("/reindex")
+async def reindex_status():
+    """Fortschritt des laufenden bzw. letzten Reindex und aktiver Index."""
+    job = get_reindex_job()
+    active = active_index()
     return {
-        "collection": settings.CHROMA_COLLECTION,
-        "total_chunks": collection_count(),
+        "active": {"collection": active.collection, "embedding_model": active.embedding_model},
+        "configured_model": settings.EMBEDDING_MODEL,
+        "job": job.status() if job else None,
     }
 
 
+@router.delete("/reindex")
+async def cancel_reindex():
+    """Laufenden Reindex abbrechen (vor dem Umschalten; die Ziel-Collection wird verworfen)."""
+    job = get_reindex_job()
+    if job is None or not job.running:
+        raise HTTPException(status_code=404, detail="Kein Reindex aktiv.")
+    job.cancel()
+    return {"status": "cancelling", "target_collection": job.target_collection}
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Semantischer Antwort-Cache: Größe, Version, Treffer/Misses/False-Hits, mittlere Ähnlichkeit."""
+    counters = {k: v for k, v in metrics.snapshot().items() if k.startswith("semantic_cache_")}
+    sim_count = counters.get("semantic_cache_similarity_count", 0.0)
+    return {
+        "enabled": settings.SEMANTIC_CACHE_ENABLED,
+        **get_semantic_cache().stats(),
+        "counters": counters,
+        "avg_similarity": round(counters.get("semantic_cache_similarity_sum", 0.0) / sim_count, 4) if sim_count else None,
+    }
+
+
+def _delete_document(doc_id: str) -> Optional[list]:
+    """Chunks + Katalogeintrag + Zentroid + Artefakt löschen, unter dem Schreib-Lock im gerade aktiven Index
+    (ein laufender Reindex übernimmt die Löschung beim nächsten Abgleich). Rückgabe: Chunk-IDs
+    bzw. None für Dokumente ohne Katalogeintrag (Altbestand, per where-Filter auf doc_id)."""
+    with write_lock():
+        catalog = get_doc_catalog()
+        collection = active_collection()
+        chunk_ids = catalog.chunk_ids(collection, doc_id)
+        if chunk_ids is None:
+            delete_by_doc_id(doc_id)
+        else:
+            delete_ids(chunk_ids, settings.DOC_DELETE_BATCH, collection=collection)
+            catalog.remove_document(collection, doc_id)
+        delete_centroid(collection, doc_id)
+    artifacts = get_artifact_store()
+    if artifacts is not None:
+        artifacts.delete(doc_id)
+    return chunk_ids
+
+
 @router.delete("/docs/{doc_id}")
 async def delete_doc(doc_id: str):
-    """Alle Chunks mit doc_id löschen (für Tests / Reset)."""
-    if not chroma_reachable():
+    """Dokument löschen: Chunks per ID aus dem Katalog (Batches à DOC_DELETE_BATCH), dann Katalogeintrag
+    und Extraktions-Artefakt. Dokumente ohne Katalogeintrag (Altbestand) per where-Filter auf doc_id."""
+    if not chroma_reachable(raise_if_open=True):
         raise HTTPException(status_code=503, detail="Chroma nicht erreichbar.")
     try:
-        delete_by_doc_id(doc_id)
+        chunk_ids = await asyncio.to_thread(_delete_document, doc_id)
     except Exception as e:
+        # Katalogeintrag bleibt → erneutes DELETE möglich (bereits gelöschte IDs sind ein No-op)
         logger.exception("Delete doc_id=%s failed", doc_id)
         raise HTTPException(status_code=500, detail=str(e)) from e
-    return {"status": "deleted", "doc_id": doc_id}
+    get_semantic_cache().invalidate()
+    return {"status": "deleted", "doc_id": doc_id, "chunks": len(chunk_ids) if chunk_ids is not None else None}
@@ -1,10 +1,24 @@
+import asyncio
 import json
-from fastapi import APIRouter, HTTPException
-from app.schemas.briefing import BriefingRequest, BriefingResponse
-from app.services.llm_client import LLMClient
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.schemas.briefing import BriefingOptions, BriefingRequest, BriefingResponse
+from app.services import metrics
+from app.services.admission import AdmissionRejected, get_admission
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.briefing_cache import cache_key, get_briefing_cache
+from app.services.llm_client import get_llm_client
+from app.utils.chunking import chunk_text
+from app.utils.streaming import JSONFieldParser, ndjson_line
 
 router = APIRouter(prefix="/api/text", tags=["text"])
-llm = LLMClient()
+llm = get_llm_client()
+
+# Bei Änderungen an Prompts/Schema erhöhen → alte Einträge im Briefing-Cache gelten nicht mehr
+PROMPT_VERSION = "3"
 
 SYSTEM_RULES = """
 You are a strict JSON generator.
@@ -13,6 +27,25 @@ No markdown, no explanations, no extra keys.
 All strings must be plain text (no code fences).
 """
 
+# Vom LLM erzeugte Felder in Ausgabereihenfolge (rendered_md baut der Server)
+LLM_FIELDS = [name for name in BriefingResponse.model_fields if name != "rendered_md"]
+MAP_FIELDS = ["summary", "keypoints", "keywords", "risks", "todos"]
+
+# Map-Schritt: Teil-Briefing pro Chunk (ohne Headlines – die entstehen erst im Reduce)
+MAP_SCHEMA = {
+    "summary": "string (max 2 sentences)",
+    "keypoints": ["string (max 5 items)"],
+    "keywords": ["string (max 8 items)"],
+    "risks": ["string"],
+    "todos": ["string"],
+}
+# Obergrenzen für die zusammengeführten Listen im Reduce-Prompt
+REDUCE_MAX_ITEMS = 40
+
+
+def _options(req: BriefingRequest) -> BriefingOptions:
+    return req.options or BriefingOptions()
+
 
 def build_prompt(req: BriefingRequest) -> str:
     schema = {
@@ -50,36 +83,87 @@ Text input:
 """
 
 
-@router.post("/briefing", response_model=BriefingResponse)
-async def briefing(req: BriefingRequest):
-    try:
-        raw = await llm.completion(
-            build_prompt(req), n_predict=700, temperature=0.2
-        )
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+def build_map_prompt(chunk: str, index: int, total: int, opts: BriefingOptions) -> str:
+    return f"""{SYSTEM_RULES}
 
-    raw_str = raw.strip()
+Language: {opts.language}
+You see part {index + 1} of {total} of a longer text. Extract only what is in this part.
+
+JSON schema (informal):
+{json.dumps(MAP_SCHEMA, ensure_ascii=False, indent=2)}
+
+Text part:
+{chunk}
+"""
+
+
+def build_reduce_prompt(partials: List[dict], opts: BriefingOptions) -> str:
+    schema = {
+        "summary": "string (exactly 3 sentences in the requested language)",
+        "keypoints": ["string (max N items)"],
+        "headlines": ["string (max M items)"],
+        "keywords": ["string"],
+        "risks": ["string"],
+        "todos": ["string"],
+    }
+    merged = {
+        "part_summaries": [p.get("summary", "") for p in partials if p.get("summary")],
+        **{key: _merge_lists(partials, key)[:REDUCE_MAX_ITEMS] for key in ("keypoints", "keywords", "risks", "todos")},
+    }
+    return f"""{SYSTEM_RULES}
+
+Language: {opts.language}
+Tone: {opts.tone}
+Keypoints max: {opts.max_keypoints}
+Headlines max: {opts.max_headlines}
+
+The following notes were extracted from consecutive parts of one long text.
+Merge them into one briefing: remove duplicates, keep the most important items.
+
+JSON schema (informal):
+{json.dumps(schema, ensure_ascii=False, indent=2)}
+
+Notes:
+{json.dumps(merged, ensure_ascii=False, indent=2)}
+"""
+
+
+def _merge_lists(partials: List[dict], key: str) -> List[str]:
+    """Listen der Teil-Briefings in Text-Reihenfolge zusammenführen, Duplikate (ohne Groß/Klein) raus."""
+    seen = set()
+    out = []
+    for p in partials:
+        for item in p.get(key) or []:
+            if not isinstance(item, str):
+                continue
+            norm = item.strip().lower()
+            if norm and norm not in seen:
+                seen.add(norm)
+                out.append(item.strip())
+    return out
+
+
+def parse_json_output(raw: str) -> dict:
+    """LLM-Ausgabe → dict; toleriert Text vor/nach dem Objekt. ValueError wenn kein JSON."""
+    raw_str = (raw or "").strip()
     try:
         data = json.loads(raw_str)
     except Exception:
         start = raw_str.find("{")
         end = raw_str.rfind("}")
-        if start >= 0 and end > start:
-            try:
-                data = json.loads(raw_str[start : end + 1])
-            except Exception:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"LLM output is not valid JSON. Output starts with: {raw_str[:200]}",
-                )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"LLM output is not valid JSON. Output starts with: {raw_str[:200]}",
-            )
-
-    rendered_md = (
+        if start < 0 or end <= start:
+            raise ValueError(raw_str[:200])
+        try:
+            data = json.loads(raw_str[start : end + 1])
+        except Exception:
+            raise ValueError(raw_str[:200])
+    if not isinstance(data, dict):
+        raise ValueError(raw_str[:200])
+    return data
+
+
+def render_md(data: dict) -> str:
+    return (
         f"## Summary\n{data.get('summary', '')}\n\n"
         f"## Keypoints\n"
         + "\n".join([f"- {x}" for x in data.get("keypoints", [])])
@@ -97,6 +181,223 @@ async def briefing(req: BriefingRequest):
         + "\n".join([f"- {x}" for x in data.get("todos", [])])
     )
 
-    data["rendered_md"] = rendered_md
 
-    return BriefingResponse(**data)
+def briefing_json_schema(fields: List[str], max_items: dict) -> dict:
+    """JSON-Schema für constrained decoding (llama.cpp `json_schema`), abgeleitet aus
+    BriefingResponse: nur die angegebenen Felder, alle Pflicht, keine Zusatz-Keys, Listen begrenzt."""
+    properties = BriefingResponse.model_json_schema()["properties"]
+    props = {}
+    for name in fields:
+        prop = {k: v for k, v in properties[name].items() if k != "title"}
+        if prop.get("type") == "array" and name in max_items:
+            prop["maxItems"] = max_items[name]
+        props[name] = prop
+    return {"type": "object", "properties": props, "required": list(props), "additionalProperties": False}
+
+
+def _briefing_schema(opts: BriefingOptions) -> Optional[dict]:
+    if not settings.BRIEFING_JSON_SCHEMA:
+        return None
+    limits = {"keypoints": opts.max_keypoints, "headlines": opts.max_headlines, "keywords": 15, "risks": 10, "todos": 10}
+    return briefing_json_schema(LLM_FIELDS, limits)
+
+
+def _map_schema() -> Optional[dict]:
+    if not settings.BRIEFING_JSON_SCHEMA:
+        return None
+    return briefing_json_schema(MAP_FIELDS, {"keypoints": 5, "keywords": 8, "risks": 5, "todos": 5})
+
+
+def _use_map_reduce(req: BriefingRequest) -> bool:
+    mode = _options(req).mode
+    if mode == "auto":
+        return len(req.text) > settings.BRIEFING_SINGLE_MAX_CHARS
+    return mode == "map_reduce"
+
+
+def _invalid_json(e: ValueError) -> HTTPException:
+    metrics.inc("briefing_json_invalid_total")
+    return HTTPException(
+        status_code=500,
+        detail=f"LLM output is not valid JSON. Output starts with: {e}",
+    )
+
+
+async def _generate_json(prompt: str, n_predict: int, schema: Optional[dict] = None) -> dict:
+    async with get_admission().slot("briefing"):
+        try:
+            raw = await llm.completion(prompt, n_predict=n_predict, temperature=0.2, json_schema=schema)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+    try:
+        return parse_json_output(raw)
+    except ValueError as e:
+        raise _invalid_json(e)
+
+
+async def _generate_json_stream(prompt: str, n_predict: int, schema: Optional[dict] = None):
+    """Wie _generate_json, aber gestreamt: yield ("field", name, value) sobald ein Feld fertig ist,
+    zum Schluss ("data", dict). Sobald das Objekt geschlossen ist, wird der Upstream beendet."""
+    parser = JSONFieldParser()
+    data: dict = {}
+    parts: List[str] = []
+    async with get_admission().slot("briefing"):
+        # Objekt geschlossen → Stream regulär beenden (kein Abbruch in den Metriken, Timings werden erfasst)
+        tokens = llm.completion_stream(
+            prompt, n_predict=n_predict, temperature=0.2, json_schema=schema, stop_when=lambda: parser.complete
+        )
+        try:
+            async for content in tokens:
+                parts.append(content)
+                for name, value in parser.feed(content):
+                    data[name] = value
+                    yield ("field", name, value)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
+        finally:
+            await tokens.aclose()
+    if not parser.complete:
+        try:
+            data = parse_json_output("".join(parts))
+        except ValueError as e:
+            raise _invalid_json(e)
+    yield ("data", data)
+
+
+async def _map_chunk(chunk: str, index: int, total: int, opts: BriefingOptions) -> dict:
+    """Teil-Briefing für einen Chunk. Unbrauchbare Ausgabe → leeres Teil-Briefing statt Abbruch."""
+    try:
+        return await _generate_json(build_map_prompt(chunk, index, total, opts), n_predict=400, schema=_map_schema())
+    except HTTPException as e:
+        if e.status_code == 502:
+            raise
+        metrics.inc("briefing_map_invalid_total")
+        return {}
+
+
+async def briefing_events(req: BriefingRequest, stream_fields: bool = False):
+    """Briefing als Folge von Fortschritts-Events; letztes Event: {"type": "result", "briefing": {...}}.
+    Map-Reduce: Chunks parallel (BRIEFING_MAP_CONCURRENCY) zusammenfassen, dann ein Reduce-Schritt –
+    die Laufzeit wächst mit Chunks / Slots statt mit der Textlänge.
+    stream_fields: finale Generierung streamen, fertige Felder als {"type": "field", ...} melden."""
+    opts = _options(req)
+    if not _use_map_reduce(req):
+        yield {"type": "plan", "mode": "single", "chunks": 1}
+        prompt = build_prompt(req)
+    else:
+        chunks = chunk_text(req.text, settings.BRIEFING_CHUNK_CHARS, settings.BRIEFING_CHUNK_OVERLAP)
+        total = len(chunks)
+        yield {"type": "plan", "mode": "map_reduce", "chunks": total}
+        metrics.inc("briefing_map_reduce_total")
+        metrics.inc("briefing_map_chunks_total", total)
+        limit = asyncio.Semaphore(max(1, settings.BRIEFING_MAP_CONCURRENCY or settings.LLM_MAX_CONCURRENCY))
+
+        async def _bounded(i: int, chunk: str):
+            async with limit:
+                return i, await _map_chunk(chunk, i, total, opts)
+
+        tasks = [asyncio.create_task(_bounded(i, c)) for i, c in enumerate(chunks)]
+        partials: List[dict] = [{}] * total
+        try:
+            for done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                i, partial = await next_done
+                partials[i] = partial
+                yield {"type": "map", "done": done, "total": total}
+        finally:
+            # Abbruch (502 eines Chunks, Disconnect): übrige Chunks beenden; wartende geben dabei
+            # ihren Platz in der Admission-Warteschlange zurück. Fehler nicht erneut loggen.
+            for task in tasks:
+                task.cancel()
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        yield {"type": "reduce"}
+        prompt = build_reduce_prompt(partials, opts)
+
+    if stream_fields:
+        data = {}
+        async for kind, *rest in _generate_json_stream(prompt, n_predict=700, schema=_briefing_schema(opts)):
+            if kind == "field":
+                yield {"type": "field", "name": rest[0], "value": rest[1]}
+            else:
+                data = rest[0]
+    else:
+        data = await _generate_json(prompt, n_predict=700, schema=_briefing_schema(opts))
+    data["rendered_md"] = render_md(data)
+    yield {"type": "result", "briefing": BriefingResponse(**data).model_dump()}
+
+
+def _briefing_cache_key(req: BriefingRequest) -> Optional[str]:
+    """Cache-Schlüssel oder None (Cache aus bzw. per Request abgeschaltet)."""
+    if not (settings.BRIEFING_CACHE_ENABLED and req.use_cache):
+        return None
+    map_reduce = _use_map_reduce(req)
+    options = _options(req).model_dump()
+    options["mode"] = "map_reduce" if map_reduce else "single"
+    config = {"json_schema": settings.BRIEFING_JSON_SCHEMA}
+    if map_reduce:
+        config["chunk_chars"] = settings.BRIEFING_CHUNK_CHARS
+        config["chunk_overlap"] = settings.BRIEFING_CHUNK_OVERLAP
+    return cache_key(req.text, options, PROMPT_VERSION, llm.model_id(), config)
+
+
+def _cache_headers(key: Optional[str], tier: Optional[str]) -> dict:
+    if key is None:
+        return {"X-Cache": "BYPASS"}
+    headers = {"X-Cache": "HIT" if tier else "MISS", "X-Cache-Key": key[:16]}
+    if tier:
+        headers["X-Cache-Tier"] = tier
+    return headers
+
+
+@router.post("/briefing", response_model=BriefingResponse)
+async def briefing(req: BriefingRequest, response: Response):
+    key = _briefing_cache_key(req)
+    # Disk-Stufe (Datei lesen, Eviction per mtime-Scan) blockiert → im Thread
+    hit = await asyncio.to_thread(get_briefing_cache().get, key) if key else None
+    response.headers.update(_cache_headers(key, hit[1] if hit else None))
+    if hit is not None:
+        return BriefingResponse(**hit[0])
+
+    result = None
+    async for event in briefing_events(req):
+        if event["type"] == "result":
+            result = event["briefing"]
+    if key:
+        await asyncio.to_thread(get_briefing_cache().put, key, result)
+    return BriefingResponse(**result)
+
+
+async def _stream_briefing(req: BriefingRequest, key: Optional[str], cached: Optional[dict]):
+    if cached is not None:
+        yield ndjson_line({"type": "result", "briefing": cached, "cached": True})
+        return
+    try:
+        async for event in briefing_events(req, stream_fields=True):
+            if event["type"] == "result" and key:
+                await asyncio.to_thread(get_briefing_cache().put, key, event["briefing"])
+            yield ndjson_line(event)
+    except HTTPException as e:
+        yield ndjson_line({"type": "error", "status": e.status_code, "detail": e.detail})
+    except (AdmissionRejected, CircuitOpenError) as e:
+        yield ndjson_line({"type": "error", "status": e.status_code, "detail": e.detail, "retry_after": e.retry_after})
+
+
+@router.post("/briefing/stream")
+async def briefing_stream(req: BriefingRequest):
+    """Wie /briefing, aber NDJSON mit Fortschritt: plan, map (je fertigem Chunk), reduce,
+    field (je fertigem JSON-Feld der finalen Generierung), result. Cache-Treffer: nur result."""
+    key = _briefing_cache_key(req)
+    hit = await asyncio.to_thread(get_briefing_cache().get, key) if key else None
+    return StreamingResponse(
+        _stream_briefing(req, key, hit[0] if hit else None),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **_cache_headers(key, hit[1] if hit else None)},
+    )
+
+
+@router.get("/briefing/cache/stats")
+async def briefing_cache_stats():
+    return await asyncio.to_thread(get_briefing_cache().stats)
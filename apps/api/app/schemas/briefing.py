@@ -7,11 +7,14 @@ class BriefingOptions(BaseModel):
     tone: Literal["neutral", "formal", "friendly"] = "neutral"
     max_keypoints: int = Field(default=10, ge=3, le=20)
     max_headlines: int = Field(default=5, ge=3, le=10)
+    # auto: Map-Reduce ab BRIEFING_SINGLE_MAX_CHARS, sonst ein Prompt
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
 
 
 class BriefingRequest(BaseModel):
     text: str = Field(min_length=10, description="Freitext, z.B. Artikel/Notizen")
     options: Optional[BriefingOptions] = None
+    use_cache: bool = Field(default=True, description="Briefing-Cache nutzen (False = immer neu generieren)")
 
 
 class BriefingResponse(BaseModel):
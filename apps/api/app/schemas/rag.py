@@ -1,4 +1,6 @@
 """Pydantic-Schemas für RAG: Ingest, Chat, Citations."""
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 from typing import List, Optional, Literal
 
@@ -15,12 +17,33 @@ class IngestResponse(BaseModel):
     elapsed_ms: int
 
 
+class DocInfo(BaseModel):
+    """Eintrag im Dokumentkatalog."""
+    doc_id: str
+    filename: str
+    bytes: Optional[int] = None  # nach Katalog-Rebuild aus Altbeständen ggf. unbekannt
+    pages: int
+    chunks: int
+    content_hash: Optional[str] = None  # SHA-256 der hochgeladenen Datei
+    ingested_at: datetime
+
+
+class DocListResponse(BaseModel):
+    collection: str
+    total_docs: int
+    total_chunks: int
+    offset: int
+    limit: int
+    items: List[DocInfo] = Field(default_factory=list)
+
+
 class Citation(BaseModel):
     chunk_id: str
     filename: str
     page: Optional[int] = None
     score: float
     excerpt: str
+    rerank_score: Optional[float] = None  # Cross-Encoder (nur mit Reranking)
 
 
 class ChatRequest(BaseModel):
@@ -30,6 +53,9 @@ class ChatRequest(BaseModel):
     mode: Literal["docs_only", "hybrid"] = "docs_only"
     language: Literal["de", "en"] = "de"
     return_context: bool = False
+    use_cache: bool = Field(default=True, description="Semantischen Antwort-Cache nutzen (False = immer neu generieren)")
+    compress: Optional[bool] = Field(default=None, description="Kontext-Kompression (None = CONTEXT_COMPRESSION_ENABLED)")
+    rerank: Optional[bool] = Field(default=None, description="Cross-Encoder-Reranking (None = RERANK_ENABLED)")
 
 
 class ChatResponse(BaseModel):
@@ -39,3 +65,60 @@ class ChatResponse(BaseModel):
     doc_id: Optional[str] = None
     collection: str
     context_preview: Optional[str] = None  # nur wenn return_context=True
+    cached: bool = False
+    cache_similarity: Optional[float] = None  # Cosinus zur gecachten Frage (nur bei Cache-Treffer)
+
+
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, description="Fragen (alle zum selben Dokument bzw. zur ganzen Wissensbasis)")
+    doc_id: Optional[str] = None
+    top_k: Optional[int] = Field(default=None, ge=1, le=20)
+    language: Literal["de", "en"] = "de"
+    use_cache: bool = True
+    compress: Optional[bool] = None
+    rerank: Optional[bool] = None
+
+
+class BatchChatResult(BaseModel):
+    """Eine NDJSON-Zeile von /chat/batch (type="result"), Reihenfolge = Fertigstellung."""
+    type: Literal["result"] = "result"
+    index: int  # Position in BatchChatRequest.questions
+    question: str
+    answer: Optional[str] = None
+    citations: List[Citation] = Field(default_factory=list)
+    used_chunks: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class SessionCreateRequest(BaseModel):
+    doc_id: Optional[str] = None
+    language: Literal["de", "en"] = "de"
+
+
+class SessionInfo(BaseModel):
+    session_id: str
+    doc_id: Optional[str] = None
+    language: Literal["de", "en"] = "de"
+    turns: int = 0
+    cached_chunks: int = 0
+    expires_in_s: int
+
+
+class SessionChatRequest(BaseModel):
+    question: str = Field(min_length=1, description="Frage (Folgefragen dürfen sich auf den Verlauf beziehen)")
+    top_k: Optional[int] = Field(default=None, ge=1, le=20)
+    return_context: bool = False
+    rerank: Optional[bool] = None
+
+
+class SessionChatResponse(ChatResponse):
+    session_id: str
+    turn: int
+    retrieval_reused: bool = False  # True = keine neue Chroma-Abfrage nötig
+    new_chunks: int = 0  # neu in den Session-Pool aufgenommene Chunks
+
+
+class ReindexRequest(BaseModel):
+    embedding_model: Optional[str] = Field(default=None, description="Zielmodell (Default: EMBEDDING_MODEL)")
+    rechunk: bool = Field(default=False, description="Seitentexte mit aktuellem CHUNK_SIZE/CHUNK_OVERLAP neu zerlegen")
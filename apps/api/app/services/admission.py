@@ -0,0 +1,195 @@
+"""
+Admission Control vor dem LLM: begrenzt gleichzeitige Generierungen auf die Slot-Anzahl
+des llama.cpp-Servers (LLM_MAX_CONCURRENCY), Rest wartet in einer begrenzten Warteschlange
+mit Prioritäten (interactive vor briefing vor batch).
+Volle Warteschlange → sofort 429, zu lange gewartet → 503; jeweils mit Retry-After.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.services import metrics
+
+PRIORITIES = {"interactive": 0, "briefing": 1, "batch": 2}
+_PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+
+
+class AdmissionRejected(RuntimeError):
+    """Kein Platz für die Generierung → Router/Handler antwortet mit status_code + Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Platz in der Warteschlange bzw. belegter Slot. release() ist idempotent."""
+
+    def __init__(self, controller: "AdmissionController", priority: int, seq: int) -> None:
+        self._controller = controller
+        self.priority = priority
+        self.seq = seq
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.released = False
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def admitted(self) -> bool:
+        return self.admitted_at is not None
+
+    @property
+    def position(self) -> int:
+        """1-basierte Position in der Warteschlange (0 = bereits zugelassen)."""
+        return self._controller.position(self)
+
+    async def wait(self, poll_seconds: Optional[float] = None) -> None:
+        """Bis zur Zulassung warten (max. LLM_QUEUE_TIMEOUT_SECONDS).
+        Mit poll_seconds: spätestens dann asyncio.TimeoutError, um z. B. die Position zu melden."""
+        if self.admitted:
+            return
+        remaining = self._controller.queue_timeout - (time.monotonic() - self.enqueued_at)
+        timeout = remaining if poll_seconds is None else min(poll_seconds, remaining)
+        try:
+            # asyncio.wait statt wait_for: wait_for (3.11) verschluckt ein cancel(), das genau bei
+            # der Zuteilung eintrifft – der abgebrochene Task liefe dann mit belegtem Slot weiter
+            await asyncio.wait((self.future,), timeout=max(0.0, timeout))
+        except BaseException:
+            # Abbruch (CancelledError) beim Warten: aus der Warteschlange austragen bzw. einen
+            # inzwischen zugeteilten Slot zurückgeben – __aexit__ läuft hier nicht
+            self.release()
+            raise
+        if self.admitted:
+            return
+        if poll_seconds is not None and remaining > poll_seconds:
+            raise asyncio.TimeoutError
+        self.release()
+        metrics.inc("llm_admission_timeouts_total")
+        raise AdmissionRejected(
+            503, "LLM ausgelastet (Wartezeit überschritten).", self._controller.retry_after()
+        )
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._controller._release(self)
+
+    async def __aenter__(self) -> "Ticket":
+        await self.wait()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    # Glättungsfaktor für die mittlere Belegungsdauer eines Slots (für Retry-After)
+    _ALPHA = 0.2
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float) -> None:
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiting: List[Ticket] = []
+        self._seq = itertools.count()
+        self._service_ewma_s: Optional[float] = None
+
+    def enqueue(self, priority: str = "interactive") -> Ticket:
+        """Slot sofort belegen oder einreihen; volle Warteschlange → AdmissionRejected(429)."""
+        ticket = Ticket(self, PRIORITIES.get(priority, PRIORITIES["batch"]), next(self._seq))
+        if self.active < self.limit and not self._waiting:
+            self._admit(ticket)
+            return ticket
+        if len(self._waiting) >= self.max_queue:
+            metrics.inc("llm_admission_rejected_total")
+            raise AdmissionRejected(429, "LLM ausgelastet (Warteschlange voll).", self.retry_after())
+        heapq.heappush(self._waiting, ticket)
+        metrics.inc("llm_admission_queued_total")
+        return ticket
+
+    def check(self) -> None:
+        """Vorab-Prüfung ohne Slot/Platz zu belegen (z. B. vor Retrieval eines Streams):
+        Warteschlange voll → AdmissionRejected(429). enqueue() prüft später erneut."""
+        if self.active >= self.limit and len(self._waiting) >= self.max_queue:
+            metrics.inc("llm_admission_rejected_total")
+            raise AdmissionRejected(429, "LLM ausgelastet (Warteschlange voll).", self.retry_after())
+
+    def slot(self, priority: str = "interactive") -> Ticket:
+        """Für `async with get_admission().slot("briefing"): ...`."""
+        return self.enqueue(priority)
+
+    def position(self, ticket: Ticket) -> int:
+        if ticket.admitted or ticket.released:
+            return 0
+        return 1 + sum(1 for t in self._waiting if t < ticket)
+
+    def retry_after(self) -> int:
+        """Geschätzte Sekunden bis ein Platz frei wird (mind. 1)."""
+        service = self._service_ewma_s or 5.0
+        return max(1, math.ceil(service * (len(self._waiting) + 1) / self.limit))
+
+    def _admit(self, ticket: Ticket) -> None:
+        self.active += 1
+        ticket.admitted_at = time.monotonic()
+        wait = ticket.admitted_at - ticket.enqueued_at
+        metrics.inc("llm_admission_wait_seconds_sum", wait)
+        metrics.observe("llm_queue_wait_seconds", wait, priority=_PRIORITY_NAMES.get(ticket.priority, "batch"))
+        metrics.inc("llm_admission_admitted_total")
+        if not ticket.future.done():
+            ticket.future.set_result(None)
+
+    def _release(self, ticket: Ticket) -> None:
+        if not ticket.admitted:
+            # Noch in der Warteschlange (Abbruch/Timeout/Cache-Treffer) → nur austragen
+            try:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            except ValueError:
+                pass
+            return
+        self.active -= 1
+        duration = time.monotonic() - ticket.admitted_at
+        if self._service_ewma_s is None:
+            self._service_ewma_s = duration
+        else:
+            self._service_ewma_s += self._ALPHA * (duration - self._service_ewma_s)
+        while self._waiting and self.active < self.limit:
+            self._admit(heapq.heappop(self._waiting))
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiting),
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self._service_ewma_s, 2) if self._service_ewma_s is not None else None,
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    """Globaler Controller (ein Event-Loop pro Prozess)."""
+    global _controller
+    if _controller is None:
+        settings = get_settings()
+        _controller = AdmissionController(
+            limit=settings.LLM_MAX_CONCURRENCY,
+            max_queue=settings.LLM_QUEUE_MAX,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        )
+        controller = _controller
+        metrics.register_gauge("llm_admission_active", lambda: controller.active, "Belegte LLM-Slots")
+        metrics.register_gauge("llm_admission_queue_depth", lambda: len(controller._waiting), "Wartende Generierungen")
+    return _controller
@@ -0,0 +1,150 @@
+"""
+Extraktions-Artefakte pro Dokument (ARTIFACT_DIR): Seitentexte aus pypdf und die Chunk-Grenzen
+(Seite, Index, Start, Ende im Seitentext) statt Kopien der Chunk-Texte – gzip-komprimiertes JSON,
+eine Datei je doc_id. Daraus baut der Reindex (app.services.reindex) die Chunks ohne erneutes
+PDF-Parsen nach (gleiche Chunk-IDs, Zitate bleiben gültig) oder zerlegt sie mit neuem
+CHUNK_SIZE/CHUNK_OVERLAP neu. Schreiben atomar (Temp-Datei + os.replace).
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.utils.chunking import chunk_spans
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+
+
+def build_artifact(
+    doc_id: str,
+    filename: str,
+    page_texts: List[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    doc_meta: Optional[dict] = None,
+) -> dict:
+    """Artefakt inkl. Chunk-Grenzen (dieselbe Zerlegung wie beim Ingest, siehe chunk_spans)."""
+    spans = []
+    for page_no, text in enumerate(page_texts):
+        for idx, (start, end) in enumerate(chunk_spans(text, chunk_size=chunk_size, overlap=chunk_overlap)):
+            spans.append([page_no + 1, idx, start, end])
+    return {
+        "version": ARTIFACT_VERSION,
+        "doc_id": doc_id,
+        "filename": filename,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "doc_meta": doc_meta or {},
+        "pages": page_texts,
+        "spans": spans,
+    }
+
+
+def artifact_chunks(
+    artifact: dict,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> Tuple[List[str], List[str], List[dict]]:
+    """(ids, documents, metadatas) wie beim Ingest. Ohne chunk_size: gespeicherte Grenzen,
+    sonst Neuzerlegung der Seitentexte."""
+    doc_id = artifact["doc_id"]
+    pages = artifact["pages"]
+    if chunk_size is None:
+        spans = artifact["spans"]
+    else:
+        spans = [
+            [page_no + 1, idx, start, end]
+            for page_no, text in enumerate(pages)
+            for idx, (start, end) in enumerate(chunk_spans(text, chunk_size=chunk_size, overlap=chunk_overlap or 0))
+        ]
+    ids, documents, metadatas = [], [], []
+    for page, idx, start, end in spans:
+        ids.append(f"{doc_id}:{page}:{idx}")
+        documents.append(pages[page - 1][start:end])
+        metadatas.append({
+            "doc_id": doc_id,
+            "filename": artifact["filename"],
+            "page": page,
+            "chunk_index": idx,
+            **artifact.get("doc_meta", {}),
+        })
+    return ids, documents, metadatas
+
+
+class ArtifactStore:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, doc_id[:2], f"{doc_id}.json.gz")
+
+    def save(self, artifact: dict) -> int:
+        """Artefakt schreiben; liefert die Dateigröße in Bytes."""
+        path = self._path(artifact["doc_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        raw = gzip.compress(json.dumps(artifact, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return len(raw)
+
+    def load(self, doc_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(doc_id), "rb") as f:
+                artifact = json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Artefakt doc_id=%s unlesbar: %s", doc_id, e)
+            return None
+        if artifact.get("version") != ARTIFACT_VERSION:
+            logger.warning("Artefakt doc_id=%s: Version %s nicht unterstützt", doc_id, artifact.get("version"))
+            return None
+        return artifact
+
+    def delete(self, doc_id: str) -> bool:
+        try:
+            os.remove(self._path(doc_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def doc_ids(self) -> Iterator[str]:
+        if not os.path.isdir(self.directory):
+            return
+        for shard in sorted(os.listdir(self.directory)):
+            shard_dir = os.path.join(self.directory, shard)
+            if os.path.isdir(shard_dir):
+                for name in sorted(os.listdir(shard_dir)):
+                    if name.endswith(".json.gz"):
+                        yield name[: -len(".json.gz")]
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> Optional[ArtifactStore]:
+    """Globaler Store (Singleton); None, wenn ARTIFACTS_ENABLED aus ist."""
+    global _store
+    settings = get_settings()
+    if not settings.ARTIFACTS_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore(settings.ARTIFACT_DIR)
+    return _store
@@ -0,0 +1,182 @@
+"""
+Inhaltsadressierter Cache für Briefing-Ergebnisse.
+Schlüssel = SHA-256 über normalisierten Text, BriefingOptions, Prompt-Version, Modell-Identität
+und ausgabe-relevante Settings – gleicher Input liefert ohne Generierung dasselbe Ergebnis.
+Zwei Stufen:
+  1) In-Memory-LRU (BRIEFING_CACHE_MEMORY_ENTRIES)
+  2) Dateien unter BRIEFING_CACHE_DIR (übersteht Neustarts), begrenzt auf BRIEFING_CACHE_DISK_MAX_MB;
+     bei Überlauf fliegen die am längsten nicht genutzten Dateien (mtime) raus.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import get_settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-NFC, Whitespace zusammengefasst – Umbrüche/Einrückung ändern den Schlüssel nicht."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, options: dict, prompt_version: str, model_id: str, config: Optional[dict] = None) -> str:
+    material = json.dumps(
+        {
+            "text": normalize_text(text),
+            "options": options,
+            "prompt_version": prompt_version,
+            "model": model_id,
+            "config": config or {},
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class BriefingCache:
+    def __init__(self, directory: str, memory_entries: int, disk_max_bytes: int) -> None:
+        self.directory = directory
+        self.memory_entries = max(0, memory_entries)
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None  # lazy beim ersten Zugriff ermittelt
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, data: dict) -> None:
+        if not self.memory_entries:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[dict, str]]:
+        """(Ergebnis, Stufe "memory"|"disk") oder None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                metrics.inc("briefing_cache_memory_hits_total")
+                return data, "memory"
+        if self.disk_max_bytes:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                os.utime(path)  # mtime = letzte Nutzung (für die Eviction)
+            except FileNotFoundError:
+                data = None
+            except (OSError, ValueError) as e:
+                logger.warning("Briefing-Cache-Datei unlesbar (%s): %s", path, e)
+                data = None
+            if data is not None:
+                with self._lock:
+                    self._remember(key, data)
+                metrics.inc("briefing_cache_disk_hits_total")
+                return data, "disk"
+        metrics.inc("briefing_cache_misses_total")
+        return None
+
+    def put(self, key: str, data: dict) -> None:
+        with self._lock:
+            self._remember(key, data)
+        if not self.disk_max_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomar schreiben: parallele Leser sehen nie eine halbe Datei
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            size = os.path.getsize(tmp)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Briefing-Cache: Schreiben fehlgeschlagen (%s): %s", path, e)
+            return
+        metrics.inc("briefing_cache_stores_total")
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan()[1]
+            else:
+                self._disk_bytes += size - old_size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _scan(self) -> Tuple[list, int]:
+        """[(mtime, size, path)] aller Cache-Dateien + Gesamtgröße."""
+        files = []
+        total = 0
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return files, total
+
+    def _evict_disk(self) -> None:
+        """Älteste Dateien löschen, bis 90 % des Limits erreicht sind (nicht bei jedem put erneut)."""
+        files, total = self._scan()
+        target = int(self.disk_max_bytes * 0.9)
+        for _mtime, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            metrics.inc("briefing_cache_evictions_total")
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._disk_bytes is None and self.disk_max_bytes:
+                self._disk_bytes = self._scan()[1]
+            return {
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.memory_entries,
+                "disk_bytes": self._disk_bytes or 0,
+                "disk_max_bytes": self.disk_max_bytes,
+                "directory": self.directory,
+            }
+
+
+_cache: Optional[BriefingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_briefing_cache() -> BriefingCache:
+    """Globaler Cache (Singleton, Parameter aus Settings)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = BriefingCache(
+                    directory=settings.BRIEFING_CACHE_DIR,
+                    memory_entries=settings.BRIEFING_CACHE_MEMORY_ENTRIES,
+                    disk_max_bytes=int(settings.BRIEFING_CACHE_DISK_MAX_MB * 1024 * 1024),
+                )
+    return _cache
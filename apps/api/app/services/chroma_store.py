@@ -4,10 +4,10 @@ Single Source für Ingest; Router gibt bei Fehlern 503 (Chroma unreachable).
 """
 from typing import Any, Dict, List, Optional
 
-import chromadb
 from chromadb.api.models.Collection import Collection
 
-from app.core.config import get_settings
+from app.services.index_state import active_collection
+from app.services.vector_store import collection_metadata, get_chroma_breaker, get_chroma_client
 
 
 class ChromaUnavailableError(RuntimeError):
@@ -16,24 +16,19 @@ class ChromaUnavailableError(RuntimeError):
 
 
 def get_client():
-    """Chroma HTTP-Client (Host/Port aus Settings)."""
-    settings = get_settings()
+    """Chroma-Client (HTTP bzw. eingebettet je nach CHROMA_MODE, gemeinsam mit vector_store)."""
     try:
-        return chromadb.HttpClient(
-            host=settings.CHROMA_HOST,
-            port=settings.CHROMA_PORT,
-        )
+        return get_chroma_client()
     except Exception as e:
         raise ChromaUnavailableError(str(e)) from e
 
 
 def get_collection(name: Optional[str] = None) -> Collection:
-    """Collection holen oder anlegen (Default: CHROMA_COLLECTION aus Settings)."""
-    settings = get_settings()
-    coll_name = name or settings.CHROMA_COLLECTION
+    """Collection holen oder anlegen (Default: aktiver Index, anfangs CHROMA_COLLECTION aus Settings)."""
+    coll_name = name or active_collection()
     client = get_client()
     try:
-        return client.get_or_create_collection(name=coll_name, metadata={"description": "PDF chunks for RAG"})
+        return client.get_or_create_collection(name=coll_name, metadata=collection_metadata())
     except Exception as e:
         raise RuntimeError(f"Failed to get/create collection '{coll_name}': {e}") from e
 
@@ -46,17 +41,19 @@ def upsert_chunks(
     collection_name: Optional[str] = None,
 ) -> None:
     """Chunks in Chroma upserten (ids, embeddings, documents, metadatas – nur JSON-serializable)."""
-    col = get_collection(collection_name)
-    try:
-        col.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-    except Exception as e:
-        raise RuntimeError(f"Chroma upsert failed: {e}") from e
+    with get_chroma_breaker().guard(timed=False):
+        col = get_collection(collection_name)
+        try:
+            col.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        except Exception as e:
+            raise RuntimeError(f"Chroma upsert failed: {e}") from e
 
 
 def delete_by_doc_id(doc_id: str, collection_name: Optional[str] = None) -> None:
     """Alle Chunks mit doc_id löschen."""
-    col = get_collection(collection_name)
-    try:
-        col.delete(where={"doc_id": doc_id})
-    except Exception as e:
-        raise RuntimeError(f"Chroma delete failed: {e}") from e
+    with get_chroma_breaker().guard(timed=False):
+        col = get_collection(collection_name)
+        try:
+            col.delete(where={"doc_id": doc_id})
+        except Exception as e:
+            raise RuntimeError(f"Chroma delete failed: {e}") from e
@@ -0,0 +1,236 @@
+"""
+Circuit Breaker je Abhängigkeit (LLM, Chroma): schneller Abbruch statt hängender Requests.
+- closed:    Aufrufe laufen; Ergebnisse (Fehler, langsame Aufrufe) im rollierenden Fenster
+             BREAKER_WINDOW_SECONDS. Ab BREAKER_MIN_CALLS Aufrufen und Fehlerquote ≥ BREAKER_ERROR_RATE
+             bzw. Quote langsamer Aufrufe ≥ BREAKER_SLOW_RATE → open
+- open:      jeder Aufruf scheitert sofort mit CircuitOpenError (→ 503 + Retry-After),
+             nach BREAKER_OPEN_SECONDS → half_open
+- half_open: genau ein Probe-Aufruf; Erfolg → closed (Fenster geleert), Fehler → wieder open
+Thread-safe (Chroma-Aufrufe laufen teils in Threads).
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional, Tuple, Type
+
+from app.core.config import get_settings
+from app.services import metrics
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Abhängigkeit gilt als ausgefallen → Router/Handler antwortet mit 503 + Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, name: str, retry_after: int) -> None:
+        self.name = name
+        self.retry_after = retry_after
+        self.detail = f"{name} vorübergehend nicht verfügbar (Circuit Breaker offen), erneut in {retry_after}s"
+        super().__init__(self.detail)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_seconds: float = 0.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        enabled: bool = True,
+    ) -> None:
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds  # 0 = Latenz nicht bewerten
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (Zeitpunkt, Fehler, langsam)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.last_reason: Optional[str] = None
+
+    # --- Zustand ---
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str) -> None:
+        if self._state != OPEN:
+            metrics.inc(f"{self.name}_circuit_opened_total")
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self.last_reason = reason
+
+    def _retry_after(self, now: float) -> int:
+        return max(1, int(round(self._opened_at + self.open_seconds - now)))
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """Vor jedem Aufruf: offen → CircuitOpenError; half_open → nur ein Probe-Aufruf gleichzeitig."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    metrics.inc(f"{self.name}_circuit_rejected_total")
+                    raise CircuitOpenError(self.name, self._retry_after(now))
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    metrics.inc(f"{self.name}_circuit_rejected_total")
+                    raise CircuitOpenError(self.name, max(1, int(self.open_seconds)))
+                self._probe_in_flight = True
+
+    def record_success(self, seconds: float = 0.0) -> None:
+        if not self.enabled:
+            return
+        slow = bool(self.slow_seconds) and seconds >= self.slow_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                if slow:
+                    self._open(now, f"Probe langsam ({seconds:.1f}s)")
+                    return
+                self._state = CLOSED
+                self._probe_in_flight = False
+                self._calls.clear()
+                return
+            self._calls.append((now, False, slow))
+            self._evaluate(now)
+
+    def record_failure(self, reason: str = "error") -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._open(now, f"Probe fehlgeschlagen: {reason}")
+                return
+            self._calls.append((now, True, False))
+            self._evaluate(now)
+
+    def release_probe(self) -> None:
+        """Aufruf ohne Ergebnis beendet (z. B. Client-Abbruch): Probe-Platz wieder freigeben."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        """Zurück auf closed mit leerem Fenster (z. B. nach manuell behobener Störung, Tests)."""
+        with self._lock:
+            self._state = CLOSED
+            self._calls.clear()
+            self._probe_in_flight = False
+
+    def force_open(self, reason: str) -> None:
+        """Sofort öffnen (z. B. Health-Check aller Backends fehlgeschlagen)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._open(time.monotonic(), reason)
+
+    def _evaluate(self, now: float) -> None:
+        if self._state != CLOSED:
+            return
+        self._prune(now)
+        n = len(self._calls)
+        if n < self.min_calls:
+            return
+        errors = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        if errors / n >= self.error_rate:
+            self._open(now, f"Fehlerquote {errors}/{n}")
+        elif self.slow_seconds and slow / n >= self.slow_rate:
+            self._open(now, f"langsame Aufrufe {slow}/{n} (≥ {self.slow_seconds}s)")
+
+    # --- Aufrufe ---
+
+    @contextmanager
+    def guard(self, failure_types: Tuple[Type[BaseException], ...] = (Exception,), timed: bool = True):
+        """`with breaker.guard(): ...` – prüft vorher, wertet Dauer (nur timed) und Fehler aus. Nicht
+        aufgeführte Ausnahmen (und Abbrüche wie CancelledError) zählen weder als Erfolg noch als Fehler."""
+        self.before_call()
+        t0 = time.monotonic()
+        try:
+            yield
+        except failure_types as e:
+            self.record_failure(type(e).__name__)
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success(time.monotonic() - t0 if timed else 0.0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            n = len(self._calls)
+            errors = sum(1 for _, failed, _ in self._calls if failed)
+            slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+            state = self._state
+            if state == OPEN and now - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            return {
+                "state": state if self.enabled else "disabled",
+                "window_calls": n,
+                "error_rate": round(errors / n, 3) if n else 0.0,
+                "slow_rate": round(slow / n, 3) if n else 0.0,
+                "retry_after_s": self._retry_after(now) if state == OPEN else 0,
+                "last_reason": self.last_reason,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def register(breaker: CircuitBreaker) -> CircuitBreaker:
+    """Breaker in /health/deps und Metriken (Gauge <name>_circuit_state: 0 closed, 1 half_open, 2 open) aufnehmen."""
+    with _breakers_lock:
+        _breakers[breaker.name] = breaker
+    metrics.register_gauge(
+        f"{breaker.name}_circuit_state",
+        lambda: _STATE_VALUE.get(breaker.state, 0),
+        f"Circuit Breaker {breaker.name}: 0 closed, 1 half_open, 2 open",
+    )
+    return breaker
+
+
+def from_settings(name: str, slow_seconds: float) -> CircuitBreaker:
+    settings = get_settings()
+    return CircuitBreaker(
+        name,
+        window_seconds=settings.BREAKER_WINDOW_SECONDS,
+        min_calls=settings.BREAKER_MIN_CALLS,
+        error_rate=settings.BREAKER_ERROR_RATE,
+        slow_seconds=slow_seconds,
+        slow_rate=settings.BREAKER_SLOW_RATE,
+        open_seconds=settings.BREAKER_OPEN_SECONDS,
+        enabled=settings.BREAKER_ENABLED,
+    )
+
+
+def all_stats() -> Dict[str, dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
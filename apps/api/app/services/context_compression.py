@@ -0,0 +1,182 @@
+"""
+Extraktive Kontext-Kompression zwischen Retrieval und Prompt: die abgerufenen Chunks werden in Sätze
+zerlegt (app.utils.chunking.sentence_spans), gegen das Frage-Embedding bewertet (ein gebatchter
+embed_documents-Aufruf mit dem bereits geladenen Modell) und nur die besten Sätze samt
+CONTEXT_COMPRESSION_NEIGHBOURS Nachbarsätzen bleiben, in Dokumentreihenfolge, bis
+CONTEXT_COMPRESSION_MAX_TOKENS (~4 Zeichen/Token). Lücken im Chunk werden mit „…“ markiert.
+Citations bleiben unverändert (Original-Chunks); Satz-Embeddings werden pro Chunk gecacht
+(Schlüssel: Modell, Chunk-ID, Text-Hash), häufig abgerufene Chunks kosten so nur das Skalarprodukt.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.utils.chunking import sentence_spans
+
+CHARS_PER_TOKEN = 4
+GAP = " … "
+_CACHE_MAX_CHUNKS = 4096
+
+# Prompt-Größe in Tokens (geschätzt), Label compressed="0|1"
+PROMPT_TOKEN_BUCKETS = (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192)
+
+metrics.describe("rag_prompt_tokens", "Geschätzte Prompt-Tokens je Chat (compressed=1: mit Kontext-Kompression)")
+metrics.describe("rag_chat_ttft_seconds", "Zeit bis zum ersten Token (/chat/stream) nach Kompression (compressed)")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class Compressed:
+    documents: List[str]  # gekürzte Chunk-Texte (leere Chunks entfallen)
+    metadatas: List[dict]
+    chars_in: int
+    chars_out: int
+    sentences: int
+    kept: int
+
+
+class _SentenceCache:
+    """LRU: (Modell, Chunk-ID, Text-Hash) → (Satzgrenzen, Satz-Embeddings)."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[List[Tuple[int, int]], np.ndarray]]" = OrderedDict()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = _SentenceCache(_CACHE_MAX_CHUNKS)
+
+
+def _key(model: str, chunk_id: str, text: str) -> tuple:
+    return (model, chunk_id, hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest())
+
+
+def _sentence_embeddings(ids: Sequence[str], documents: Sequence[str]) -> List[Tuple[List[Tuple[int, int]], np.ndarray]]:
+    """Je Chunk (Satzgrenzen, Embeddings); fehlende Chunks in einem embed_documents-Aufruf."""
+    from app.services.embeddings import default_model, embed_documents
+
+    model = default_model()
+    out: List[Optional[tuple]] = [None] * len(documents)
+    todo: List[Tuple[int, List[Tuple[int, int]]]] = []
+    texts: List[str] = []
+    for i, (cid, doc) in enumerate(zip(ids, documents)):
+        cached = _cache.get(_key(model, cid, doc))
+        if cached is not None:
+            out[i] = cached
+            continue
+        spans = sentence_spans(doc)
+        todo.append((i, spans))
+        texts.extend(doc[s:e] for s, e in spans)
+    metrics.inc("rag_compression_cache_hits_total", len(documents) - len(todo))
+    vectors = np.asarray(embed_documents(texts, batch_size=64), dtype=np.float32) if texts else np.zeros((0, 0), np.float32)
+    pos = 0
+    for i, spans in todo:
+        entry = (spans, vectors[pos:pos + len(spans)])
+        pos += len(spans)
+        _cache.put(_key(model, ids[i], documents[i]), entry)
+        out[i] = entry
+    return out  # type: ignore[return-value]
+
+
+def compress(
+    query_embedding: Sequence[float],
+    ids: Sequence[str],
+    documents: Sequence[str],
+    metadatas: Sequence[dict],
+    max_tokens: Optional[int] = None,
+    neighbours: Optional[int] = None,
+) -> Compressed:
+    """Beste Sätze (+ Nachbarn) bis zum Token-Budget; Reihenfolge im Chunk bleibt erhalten.
+    Der beste Satz bleibt immer, auch wenn er allein das Budget übersteigt."""
+    settings = get_settings()
+    budget = (max_tokens or settings.CONTEXT_COMPRESSION_MAX_TOKENS) * CHARS_PER_TOKEN
+    radius = settings.CONTEXT_COMPRESSION_NEIGHBOURS if neighbours is None else neighbours
+    per_chunk = _sentence_embeddings(ids, documents)
+
+    # Sätze über alle Chunks; wörtlich doppelte (Chunk-Überlappung) nur einmal bewerten
+    units: List[Tuple[int, int]] = []  # (Chunk, Satz)
+    rows: List[np.ndarray] = []
+    seen = set()
+    for c, (spans, vecs) in enumerate(per_chunk):
+        for s, (start, end) in enumerate(spans):
+            text = " ".join(documents[c][start:end].split())
+            if text in seen:
+                continue
+            seen.add(text)
+            units.append((c, s))
+            rows.append(vecs[s])
+    chars_in = sum(len(d) for d in documents)
+    if not units:
+        return Compressed(list(documents), list(metadatas), chars_in, chars_in, 0, 0)
+    scores = np.stack(rows) @ np.asarray(query_embedding, dtype=np.float32)
+
+    keep = [set() for _ in documents]
+    used = 0
+    for u in np.argsort(-scores):
+        c, s = units[u]
+        spans = per_chunk[c][0]
+        group = [j for j in range(max(0, s - radius), min(len(spans), s + radius + 1)) if j not in keep[c]]
+        cost = sum(spans[j][1] - spans[j][0] for j in group)
+        if used + cost > budget:
+            # Nachbarn passen nicht mehr → nur der Satz selbst
+            if s in keep[c]:
+                continue
+            group, cost = [s], spans[s][1] - spans[s][0]
+            if used and used + cost > budget:
+                continue
+        keep[c].update(group)
+        used += cost
+        if used >= budget:
+            break
+
+    out_docs, out_metas = [], []
+    for c, kept in enumerate(keep):
+        if not kept:
+            continue
+        spans = per_chunk[c][0]
+        ordered = sorted(kept)
+        parts = [GAP.lstrip()] if ordered[0] > 0 else []
+        for n, j in enumerate(ordered):
+            if n:
+                parts.append(" " if j == ordered[n - 1] + 1 else GAP)
+            parts.append(documents[c][spans[j][0]:spans[j][1]])
+        if ordered[-1] < len(spans) - 1:
+            parts.append(GAP.rstrip())
+        text = "".join(parts)
+        out_docs.append(text)
+        out_metas.append(metadatas[c] if c < len(metadatas) else {})
+    sentences = sum(len(spans) for spans, _ in per_chunk)
+    kept_total = sum(len(k) for k in keep)
+    chars_out = sum(len(d) for d in out_docs)
+    metrics.inc("rag_compression_chars_in_total", chars_in)
+    metrics.inc("rag_compression_chars_out_total", chars_out)
+    metrics.inc("rag_compression_sentences_total", sentences)
+    metrics.inc("rag_compression_sentences_kept_total", kept_total)
+    return Compressed(out_docs, out_metas, chars_in, chars_out, sentences, kept_total)
+
+
+def observe_prompt(prompt: str, compressed: bool) -> None:
+    metrics.observe("rag_prompt_tokens", estimate_tokens(prompt), buckets=PROMPT_TOKEN_BUCKETS, compressed="1" if compressed else "0")
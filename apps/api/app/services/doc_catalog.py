@@ -0,0 +1,272 @@
+"""
+Dokumentkatalog (SQLite unter storage/): pro Dokument Dateiname, Größe, Seiten, Chunks,
+Content-Hash, Ingest-Zeit und die Liste seiner Chunk-IDs.
+- /docs listet seitenweise aus dem Katalog (kein Scan der Chroma-Metadaten)
+- Löschen entfernt die Chunks per expliziter ID statt per where-Filter über die ganze Collection
+- Ingest/Delete schreiben jeweils in einer Transaktion; geht der Katalog verloren, wird er aus
+  den Chunk-Metadaten der Collection neu aufgebaut (rebuild / sync_from_vector_store)
+Einträge sind pro Collection getrennt (CHROMA_COLLECTION bzw. aktiver Index nach Reindex kann wechseln);
+catalog_meta hält außerdem den aktiven Index (app.services.index_state).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    collection   TEXT NOT NULL,
+    doc_id       TEXT NOT NULL,
+    filename     TEXT NOT NULL,
+    bytes        INTEGER,
+    pages        INTEGER NOT NULL,
+    chunks       INTEGER NOT NULL,
+    content_hash TEXT,
+    ingested_at  REAL NOT NULL,
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS docs_by_time ON docs (collection, ingested_at DESC, doc_id);
+CREATE INDEX IF NOT EXISTS docs_by_hash ON docs (collection, content_hash);
+CREATE TABLE IF NOT EXISTS doc_chunks (
+    collection TEXT NOT NULL,
+    doc_id     TEXT NOT NULL,
+    chunk_id   TEXT NOT NULL,
+    PRIMARY KEY (collection, chunk_id)
+);
+CREATE INDEX IF NOT EXISTS doc_chunks_by_doc ON doc_chunks (collection, doc_id);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_DOC_COLUMNS = "doc_id, filename, bytes, pages, chunks, content_hash, ingested_at"
+
+
+def _row_to_dict(row: tuple) -> dict:
+    return dict(zip(("doc_id", "filename", "bytes", "pages", "chunks", "content_hash", "ingested_at"), row))
+
+
+class DocCatalog:
+    """Thread-safe (eine Verbindung + Lock); Aufrufe sind kurz, aus async-Code direkt nutzbar."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+        )
+
+    def _tx(self):
+        """BEGIN IMMEDIATE … COMMIT/ROLLBACK (Aufrufer hält den Lock)."""
+        conn = self._conn
+
+        class _Tx:
+            def __enter__(self_inner):
+                conn.execute("BEGIN IMMEDIATE")
+                return conn
+
+            def __exit__(self_inner, exc_type, exc, tb):
+                conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                return False
+
+        return _Tx()
+
+    def add_document(
+        self,
+        collection: str,
+        doc_id: str,
+        filename: str,
+        chunk_ids: List[str],
+        pages: int,
+        size_bytes: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        ingested_at: Optional[float] = None,
+    ) -> None:
+        """Dokument samt Chunk-IDs eintragen (ersetzt einen vorhandenen Eintrag gleicher doc_id)."""
+        with self._lock, self._tx() as conn:
+            self._delete_doc(conn, collection, doc_id)
+            conn.execute(
+                f"INSERT INTO docs (collection, {_DOC_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, doc_id, filename, size_bytes, pages, len(chunk_ids), content_hash, ingested_at or time.time()),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO doc_chunks (collection, doc_id, chunk_id) VALUES (?, ?, ?)",
+                ((collection, doc_id, cid) for cid in chunk_ids),
+            )
+
+    @staticmethod
+    def _delete_doc(conn: sqlite3.Connection, collection: str, doc_id: str) -> int:
+        conn.execute("DELETE FROM doc_chunks WHERE collection = ? AND doc_id = ?", (collection, doc_id))
+        return conn.execute("DELETE FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id)).rowcount
+
+    def remove_document(self, collection: str, doc_id: str) -> bool:
+        """Eintrag löschen; False, wenn das Dokument nicht im Katalog war."""
+        with self._lock, self._tx() as conn:
+            return self._delete_doc(conn, collection, doc_id) > 0
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_DOC_COLUMNS} FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def chunk_ids(self, collection: str, doc_id: str) -> Optional[List[str]]:
+        """Chunk-IDs des Dokuments (None = Dokument nicht im Katalog)."""
+        with self._lock:
+            known = self._conn.execute(
+                "SELECT 1 FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            ).fetchone()
+            if not known:
+                return None
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM doc_chunks WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def find_by_hash(self, collection: str, content_hash: str) -> List[dict]:
+        """Dokumente mit identischem Inhalt (gleicher SHA-256 der Datei)."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_DOC_COLUMNS} FROM docs WHERE collection = ? AND content_hash = ? ORDER BY ingested_at",
+                (collection, content_hash),
+            ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def list(self, collection: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """Neueste zuerst."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_DOC_COLUMNS} FROM docs WHERE collection = ? "
+                "ORDER BY ingested_at DESC, doc_id LIMIT ? OFFSET ?",
+                (collection, limit, offset),
+            ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def stats(self, collection: str) -> Tuple[int, int]:
+        """(Anzahl Dokumente, Summe Chunks)."""
+        with self._lock:
+            docs, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM docs WHERE collection = ?", (collection,)
+            ).fetchone()
+        return int(docs), int(chunks)
+
+    def doc_ids(self, collection: str) -> Set[str]:
+        """Alle doc_ids der Collection (Abgleich beim Reindex)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id FROM docs WHERE collection = ?", (collection,)).fetchall()
+        return {r[0] for r in rows}
+
+    def drop_collection(self, collection: str) -> int:
+        """Alle Einträge der Collection entfernen (z. B. nach Umschalten auf einen neuen Index)."""
+        with self._lock, self._tx() as conn:
+            conn.execute("DELETE FROM doc_chunks WHERE collection = ?", (collection,))
+            return conn.execute("DELETE FROM docs WHERE collection = ?", (collection,)).rowcount
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM catalog_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, values: dict) -> None:
+        """Mehrere Schlüssel in einer Transaktion setzen."""
+        with self._lock, self._tx() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()]
+            )
+
+    def rebuild(self, collection: str, records: Iterable[Tuple[str, dict]]) -> int:
+        """Katalog der Collection aus (chunk_id, Chunk-Metadaten) neu aufbauen; liefert die Anzahl Dokumente.
+        Bytes/Hash/Ingest-Zeit nur, soweit beim Ingest in den Metadaten abgelegt (ältere Chunks: leer bzw. jetzt)."""
+        docs: dict = {}
+        for chunk_id, meta in records:
+            meta = meta or {}
+            doc_id = meta.get("doc_id")
+            if not doc_id:
+                continue
+            entry = docs.get(doc_id)
+            if entry is None:
+                entry = docs[doc_id] = {
+                    "filename": meta.get("filename", ""),
+                    "bytes": meta.get("doc_bytes"),
+                    "pages": meta.get("doc_pages"),
+                    "content_hash": meta.get("content_hash"),
+                    "ingested_at": meta.get("ingested_at"),
+                    "max_page": 0,
+                    "chunk_ids": [],
+                }
+            entry["chunk_ids"].append(chunk_id)
+            entry["max_page"] = max(entry["max_page"], int(meta.get("page") or 0))
+        now = time.time()
+        with self._lock, self._tx() as conn:
+            conn.execute("DELETE FROM doc_chunks WHERE collection = ?", (collection,))
+            conn.execute("DELETE FROM docs WHERE collection = ?", (collection,))
+            for doc_id, e in docs.items():
+                conn.execute(
+                    f"INSERT INTO docs (collection, {_DOC_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        collection,
+                        doc_id,
+                        e["filename"],
+                        e["bytes"],
+                        e["pages"] or e["max_page"],
+                        len(e["chunk_ids"]),
+                        e["content_hash"],
+                        e["ingested_at"] or now,
+                    ),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO doc_chunks (collection, doc_id, chunk_id) VALUES (?, ?, ?)",
+                    ((collection, doc_id, cid) for cid in e["chunk_ids"]),
+                )
+        logger.info("Dokumentkatalog neu aufgebaut: collection=%s docs=%d", collection, len(docs))
+        return len(docs)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_catalog: Optional[DocCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_doc_catalog() -> DocCatalog:
+    """Globaler Katalog (Singleton, Pfad aus DOC_CATALOG_PATH)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = DocCatalog(get_settings().DOC_CATALOG_PATH)
+    return _catalog
+
+
+def sync_from_vector_store(force: bool = False) -> Optional[int]:
+    """Katalog aus Chroma neu aufbauen – nur wenn erzwungen oder der Katalog für die Collection leer ist,
+    Chroma aber Chunks enthält (Katalog verloren/neu). Rückgabe: Anzahl Dokumente oder None (nichts zu tun)."""
+    from app.services.index_state import active_index
+    from app.services.vector_store import collection_count, iter_chunk_metadata
+
+    collection = active_index().collection
+    catalog = get_doc_catalog()
+    if not force:
+        docs, _chunks = catalog.stats(collection)
+        if docs or not collection_count():
+            return None
+    return catalog.rebuild(collection, iter_chunk_metadata())
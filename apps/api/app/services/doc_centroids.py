@@ -0,0 +1,186 @@
+"""
+Grob-Routing für Abfragen ohne doc_id: pro Dokument ein Zentroid (normierter Mittelwert der
+Chunk-Embeddings) in der Collection <chunks>__docs. Stufe 1 sucht die ROUTING_FANOUT ähnlichsten
+Dokumente, Stufe 2 fragt die Chunks nur dieser Dokumente ab (chunk_filter).
+Fallback auf die volle Suche, wenn
+  - weniger als ROUTING_MIN_DOCS Dokumente (flache Suche ist dann ohnehin schnell),
+  - nicht alle Dokumente des Katalogs einen Zentroid haben (Abgleich: sync_centroids),
+  - der beste Zentroid weiter als ROUTING_MAX_DISTANCE entfernt ist (Frage passt zu keinem Dokument),
+  - die gefilterte Abfrage weniger als n_results Chunks liefert.
+Zentroide entstehen beim Ingest und Reindex, fehlende werden beim Start aus den gespeicherten
+Chunk-Embeddings nachgerechnet.
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = "__docs"
+_COVERAGE_TTL_SECONDS = 10.0
+
+_coverage: dict = {}  # chunk-Collection → (Zeitpunkt, Anzahl Zentroide bei voller Abdeckung sonst 0)
+_coverage_lock = threading.Lock()
+
+
+def centroid_collection_name(chunk_collection: str) -> str:
+    return f"{chunk_collection}{SUFFIX}"
+
+
+def get_centroid_collection(chunk_collection: str, embedding_model: Optional[str] = None):
+    from app.services.vector_store import collection_metadata, get_chroma_client
+
+    meta = {**collection_metadata(embedding_model), "description": "Dokument-Zentroide für Grob-Routing"}
+    return get_chroma_client().get_or_create_collection(name=centroid_collection_name(chunk_collection), metadata=meta)
+
+
+def centroid(embeddings: Sequence[Sequence[float]]) -> List[float]:
+    """Normierter Mittelwert (Embeddings sind normiert → Kosinus zum Zentroid ~ mittlere Ähnlichkeit)."""
+    mean = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    return (mean / norm if norm else mean).tolist()
+
+
+def upsert_centroid(
+    chunk_collection: str,
+    doc_id: str,
+    embeddings: Sequence[Sequence[float]],
+    filename: str = "",
+    embedding_model: Optional[str] = None,
+) -> None:
+    if not len(embeddings):
+        return
+    coll = get_centroid_collection(chunk_collection, embedding_model)
+    coll.upsert(
+        ids=[doc_id],
+        embeddings=[centroid(embeddings)],
+        metadatas=[{"doc_id": doc_id, "filename": filename, "chunks": len(embeddings)}],
+    )
+    _invalidate(chunk_collection)
+
+
+def delete_centroid(chunk_collection: str, doc_id: str) -> None:
+    get_centroid_collection(chunk_collection).delete(ids=[doc_id])
+    _invalidate(chunk_collection)
+
+
+def drop_centroids(chunk_collection: str) -> None:
+    from app.services.vector_store import get_chroma_client
+
+    try:
+        get_chroma_client().delete_collection(centroid_collection_name(chunk_collection))
+    except Exception as e:
+        logger.debug("Zentroid-Collection für %s nicht gelöscht: %s", chunk_collection, e)
+    _invalidate(chunk_collection)
+
+
+def _invalidate(chunk_collection: str) -> None:
+    with _coverage_lock:
+        _coverage.pop(chunk_collection, None)
+
+
+def _covered(chunk_collection: str, centroids) -> int:
+    """Anzahl Zentroide, wenn jedes Katalog-Dokument einen hat (sonst 0); kurz gecacht."""
+    from app.services.doc_catalog import get_doc_catalog
+
+    now = time.monotonic()
+    with _coverage_lock:
+        cached = _coverage.get(chunk_collection)
+    if cached and now - cached[0] < _COVERAGE_TTL_SECONDS:
+        return cached[1]
+    docs, _chunks = get_doc_catalog().stats(chunk_collection)
+    count = centroids.count()
+    covered = count if docs and count >= docs else 0
+    with _coverage_lock:
+        _coverage[chunk_collection] = (now, covered)
+    return covered
+
+
+def route(chunk_collection: str, query_embedding: Sequence[float], fanout: Optional[int] = None) -> Optional[List[str]]:
+    """Stufe 1: doc_ids der ähnlichsten Dokumente – None = volle Suche (siehe Moduldoc)."""
+    settings = get_settings()
+    if not settings.ROUTING_ENABLED:
+        return None
+    centroids = get_centroid_collection(chunk_collection)
+    count = _covered(chunk_collection, centroids)
+    fanout = fanout or settings.ROUTING_FANOUT
+    if count < max(settings.ROUTING_MIN_DOCS, fanout + 1):
+        return None
+    return route_in(centroids, query_embedding, fanout, settings.ROUTING_MAX_DISTANCE)
+
+
+def route_in(centroids, query_embedding: Sequence[float], fanout: int, max_distance: float = 0.0) -> Optional[List[str]]:
+    """Grob-Stufe gegen eine gegebene Zentroid-Collection (auch für den Benchmark)."""
+    res = centroids.query(query_embeddings=[query_embedding], n_results=fanout, include=["distances"])
+    ids = res["ids"][0] if res["ids"] else []
+    distances = res["distances"][0] if res.get("distances") else []
+    if not ids or (max_distance and distances and distances[0] > max_distance):
+        metrics.inc("rag_routing_fallback_total")
+        return None
+    return list(ids)
+
+
+@functools.lru_cache(maxsize=1)
+def _query_accepts_ids() -> bool:
+    from chromadb.api.models.Collection import Collection
+
+    return "ids" in inspect.signature(Collection.query).parameters
+
+
+def chunk_filter(chunk_collection: str, doc_ids: List[str]) -> dict:
+    """Stufe 2: Einschränkung auf die Chunks der gerouteten Dokumente als query-Argumente.
+    Bevorzugt ids=<Chunk-IDs aus dem Katalog> (Chroma sucht dann nur unter diesen Punkten, die als
+    Nachbarn der Frage im HNSW-Graph schnell gefunden werden); where doc_id $in muss dagegen erst die
+    Metadaten aller Chunks filtern. Fallback auf where bei Dokumenten ohne Katalogeintrag oder
+    Chroma-Versionen ohne query(ids=...)."""
+    from app.services.doc_catalog import get_doc_catalog
+
+    if _query_accepts_ids():
+        catalog = get_doc_catalog()
+        ids: List[str] = []
+        for doc_id in doc_ids:
+            chunk_ids = catalog.chunk_ids(chunk_collection, doc_id)
+            if chunk_ids is None:
+                break
+            ids.extend(chunk_ids)
+        else:
+            return {"ids": ids}
+    return {"where": {"doc_id": {"$in": list(doc_ids)}}}
+
+
+def sync_centroids(chunk_collection: str, batch_size: int = 500) -> int:
+    """Fehlende Zentroide aus den gespeicherten Chunk-Embeddings nachrechnen (Altbestand); liefert die Anzahl."""
+    from app.services.doc_catalog import get_doc_catalog
+    from app.services.vector_store import get_collection
+
+    catalog = get_doc_catalog()
+    centroids = get_centroid_collection(chunk_collection)
+    existing = set()
+    offset = 0
+    while True:
+        page = centroids.get(include=[], limit=5000, offset=offset)
+        if not page["ids"]:
+            break
+        existing.update(page["ids"])
+        offset += len(page["ids"])
+    missing = sorted(catalog.doc_ids(chunk_collection) - existing)
+    chunks = get_collection(chunk_collection)
+    for doc_id in missing:
+        chunk_ids = catalog.chunk_ids(chunk_collection, doc_id) or []
+        vectors = []
+        for start in range(0, len(chunk_ids), batch_size):
+            page = chunks.get(ids=chunk_ids[start:start + batch_size], include=["embeddings"])
+            vectors.extend(page["embeddings"])
+        info = catalog.get(chunk_collection, doc_id) or {}
+        upsert_centroid(chunk_collection, doc_id, vectors, filename=info.get("filename", ""))
+    if missing:
+        logger.info("Zentroide nachgerechnet: collection=%s docs=%d", chunk_collection, len(missing))
+    return len(missing)
@@ -1,14 +1,29 @@
 """
 Singleton Embeddings-Service (sentence-transformers).
 Thread-safe, einmal laden; embed_documents in Batches, embed_query für Chat.
+Standard ist das Modell des aktiven Index: index_state setzt es beim Laden bzw. Umschalten
+(set_default_model), ohne aktiven Index (Tools, Benchmarks) gilt EMBEDDING_MODEL – kein Katalogzugriff
+pro Aufruf. Während eines Reindex ist zusätzlich das Zielmodell geladen (model_name), danach wird das
+alte entladen.
 """
 import threading
-from typing import List
+from typing import Dict, List, Optional
 
 from app.core.config import get_settings
 
 _model_lock = threading.Lock()
-_model = None
+_models: Dict[str, object] = {}
+_default_model: Optional[str] = None
+
+
+def default_model() -> str:
+    """Modell für Aufrufe ohne model_name."""
+    return _default_model or get_settings().EMBEDDING_MODEL
+
+
+def set_default_model(model_name: str) -> None:
+    global _default_model
+    _default_model = model_name
 
 
 def _ensure_nltk() -> None:
@@ -18,18 +33,18 @@ def _ensure_nltk() -> None:
     nltk.download("punkt_tab", quiet=True)
 
 
-def get_embedder():
-    """Liefert das globale Embedding-Modell (thread-safe, lazy load). Kein silent None – bei Fehler Exception."""
-    global _model
-    if _model is None:
+def get_embedder(model_name: Optional[str] = None):
+    """Liefert das Embedding-Modell (Default: aktiver Index; thread-safe, lazy load). Kein silent None – bei Fehler Exception."""
+    name = model_name or default_model()
+    model = _models.get(name)
+    if model is None:
         with _model_lock:
-            if _model is None:
+            model = _models.get(name)
+            if model is None:
                 _ensure_nltk()
                 from sentence_transformers import SentenceTransformer
-                settings = get_settings()
-                model_name = getattr(settings, "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-                _model = SentenceTransformer(model_name)
-    return _model
+                model = _models[name] = SentenceTransformer(name)
+    return model
 
 
 def get_embeddings():
@@ -37,12 +52,18 @@ def get_embeddings():
     return get_embedder()
 
 
-def embed_documents(texts: List[str], batch_size: int = 32) -> List[List[float]]:
+def unload(model_name: str) -> None:
+    """Modell freigeben (nach dem Umschalten auf einen anderen Index)."""
+    with _model_lock:
+        _models.pop(model_name, None)
+
+
+def embed_documents(texts: List[str], batch_size: int = 32, model_name: Optional[str] = None) -> List[List[float]]:
     """Embedding-Vektoren für eine Liste von Texten (z. B. Chunks). Batched für RAM-Schonung.
     Chroma erwartet list[list[float]] – keine PyTorch-Tensoren."""
     if not texts:
         return []
-    model = get_embedder()
+    model = get_embedder(model_name)
     vectors = model.encode(
         texts,
         batch_size=batch_size,
@@ -65,5 +86,5 @@ def embed_query(text: str) -> List[float]:
 
 
 def is_loaded() -> bool:
-    """True, wenn das Modell bereits geladen wurde."""
-    return _model is not None
+    """True, wenn das Modell des aktiven Index bereits geladen wurde."""
+    return default_model() in _models
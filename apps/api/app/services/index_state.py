@@ -0,0 +1,141 @@
+"""
+Aktiver Index: welche Chroma-Collection mit welchem Embedding-Modell Chat und Ingest bedienen.
+Persistiert in catalog_meta des Dokumentkatalogs und als Zeiger in Chroma (Metadaten der leeren
+Collection <CHROMA_COLLECTION>__active): nach einem Reindex ist die Basis-Collection meist gelöscht –
+fehlt der Katalog, wird der aktive Index aus dem Zeiger wiederhergestellt statt auf eine neue, leere
+CHROMA_COLLECTION zu fallen (der Katalog baut sich danach aus ihr neu auf). Beim ersten Start gilt
+(CHROMA_COLLECTION, EMBEDDING_MODEL); ein späteres Ändern von EMBEDDING_MODEL schaltet NICHT sofort
+um (die Collection enthält Vektoren des alten Modells), sondern erst der Reindex
+(app.services.reindex) nach vollständigem Neuaufbau – bis dahin laufen Lese- und Schreibzugriffe
+auf dem alten Index weiter.
+write_lock(): Ingest/Delete schreiben unter diesem Lock, der Reindex schaltet unter ihm um
+(kein Dokument geht zwischen letztem Abgleich und Umschalten verloren).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_SECONDS = 5.0  # andere Worker-Prozesse sehen ein Umschalten spätestens nach dieser Zeit
+POINTER_SUFFIX = "__active"
+
+
+class ActiveIndex(NamedTuple):
+    collection: str
+    embedding_model: str
+
+
+_active: Optional[ActiveIndex] = None
+_loaded_at = 0.0
+_state_lock = threading.Lock()
+_write_lock = threading.RLock()
+
+
+def _pointer_collection(base: str):
+    from app.services.vector_store import get_chroma_client
+
+    return get_chroma_client().get_or_create_collection(f"{base}{POINTER_SUFFIX}")
+
+
+def _read_pointer(base: str) -> Optional[ActiveIndex]:
+    """Zeiger aus Chroma; None, wenn es keinen gibt oder die Collection nicht mehr existiert.
+    Chroma nicht erreichbar → Exception."""
+    from app.services.vector_store import get_chroma_client
+
+    meta = _pointer_collection(base).metadata or {}
+    collection, model = meta.get("active_collection"), meta.get("active_embedding_model")
+    if not collection or not model:
+        return None
+    try:
+        get_chroma_client().get_collection(collection)
+    except Exception:
+        logger.warning("Aktiver Index laut Chroma-Zeiger (%s) existiert nicht mehr", collection)
+        return None
+    return ActiveIndex(collection, model)
+
+
+def _load() -> ActiveIndex:
+    from app.services.doc_catalog import get_doc_catalog
+
+    settings = get_settings()
+    catalog = get_doc_catalog()
+    base = catalog.get_meta("active_base")
+    collection = catalog.get_meta("active_collection")
+    model = catalog.get_meta("active_embedding_model")
+    if base == settings.CHROMA_COLLECTION and collection and model:
+        return ActiveIndex(collection, model)
+    # Katalog ohne Eintrag (erster Start, Katalog verloren) bzw. CHROMA_COLLECTION bewusst gewechselt
+    try:
+        pointer = _read_pointer(settings.CHROMA_COLLECTION)
+    except Exception as e:
+        # Nicht festschreiben: beim nächsten Nachladen erneut versuchen
+        logger.warning("Zeiger auf den aktiven Index nicht lesbar, vorläufig %s: %s", settings.CHROMA_COLLECTION, e)
+        return ActiveIndex(settings.CHROMA_COLLECTION, settings.EMBEDDING_MODEL)
+    if pointer is not None:
+        logger.info("Aktiver Index aus Chroma-Zeiger wiederhergestellt: %s (%s)", *pointer)
+    active = pointer or ActiveIndex(settings.CHROMA_COLLECTION, settings.EMBEDDING_MODEL)
+    catalog.set_meta({"active_base": settings.CHROMA_COLLECTION, "active_collection": active.collection, "active_embedding_model": active.embedding_model})
+    return active
+
+
+def _apply(active: ActiveIndex) -> ActiveIndex:
+    """Embedding-Modell für Aufrufe ohne model_name mitziehen (auch in anderen Workern nach dem Nachladen)."""
+    from app.services import embeddings
+
+    embeddings.set_default_model(active.embedding_model)
+    return active
+
+
+def active_index() -> ActiveIndex:
+    """Aktive (Collection, Embedding-Modell); gecacht, alle _REFRESH_SECONDS aus dem Katalog nachgeladen."""
+    global _active, _loaded_at
+    now = time.monotonic()
+    if _active is None or now - _loaded_at > _REFRESH_SECONDS:
+        with _state_lock:
+            if _active is None or now - _loaded_at > _REFRESH_SECONDS:
+                _active = _apply(_load())
+                _loaded_at = now
+    return _active
+
+
+def active_collection() -> str:
+    return active_index().collection
+
+
+def active_embedding_model() -> str:
+    return active_index().embedding_model
+
+
+def set_active_index(collection: str, embedding_model: str) -> ActiveIndex:
+    """Umschalten (persistiert; in diesem Prozess sofort wirksam). Aufrufer hält write_lock().
+    Zuerst der Zeiger in Chroma: schlägt das fehl, bleibt der alte Index aktiv."""
+    global _active, _loaded_at
+    from app.services.doc_catalog import get_doc_catalog
+
+    base = get_settings().CHROMA_COLLECTION
+    _pointer_collection(base).modify(metadata={
+        "active_collection": collection,
+        "active_embedding_model": embedding_model,
+        "switched_at": time.time(),
+    })
+    get_doc_catalog().set_meta({
+        "active_base": base,
+        "active_collection": collection,
+        "active_embedding_model": embedding_model,
+    })
+    with _state_lock:
+        _active = _apply(ActiveIndex(collection, embedding_model))
+        _loaded_at = time.monotonic()
+    return _active
+
+
+@contextmanager
+def write_lock():
+    """Schreibzugriffe (Upsert + Katalog) gegen das Umschalten des aktiven Index serialisieren."""
+    with _write_lock:
+        yield
@@ -1,61 +1,440 @@
-import json
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
 import httpx
 from app.core.config import settings
+from app.services import circuit_breaker, metrics
+from app.services.llm_pool import Backend, BackendPool, stable_hash
+from app.utils.streaming import SSELineParser, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Ein langlebiger AsyncClient pro Prozess (Keep-Alive-Pool zum llama.cpp-Server).
+# Wird im Lifespan (app.main) angelegt und beim Shutdown geschlossen; lazy als Fallback.
+_http_client: Optional[httpx.AsyncClient] = None
+_llm_client: Optional["LLMClient"] = None
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    timeout = httpx.Timeout(
+        connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        read=settings.LLM_READ_TIMEOUT_SECONDS,
+        write=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        pool=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+    )
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Geteilter, gepoolter HTTP-Client für alle LLM-Aufrufe (RAG, Briefing, Health)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Beim Shutdown: Pool sauber schließen (offene Keep-Alive-Verbindungen beenden)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def record_timings(data: dict) -> None:
+    """`timings` der letzten llama.cpp-Antwort in Metriken übernehmen (Prompt-Cache-Trefferquote).
+    prompt_n = tatsächlich berechnete Prompt-Tokens; cache_n (neuere Versionen) bzw.
+    tokens_evaluated - prompt_n = aus dem KV-Cache übernommene Tokens."""
+    timings = data.get("timings") if isinstance(data, dict) else None
+    if not isinstance(timings, dict) or timings.get("prompt_n") is None:
+        return
+    prompt_n = int(timings["prompt_n"])
+    cached = timings.get("cache_n")
+    if cached is None:
+        evaluated = data.get("tokens_evaluated")
+        cached = max(0, int(evaluated) - prompt_n) if evaluated is not None else 0
+    metrics.inc("llm_prompt_tokens_total", prompt_n + int(cached))
+    metrics.inc("llm_prompt_cached_tokens_total", int(cached))
+    metrics.inc("llm_prompt_ms_sum", float(timings.get("prompt_ms") or 0.0))
+    metrics.inc("llm_completions_total")
+    # Serverseitige Dauer: Prompt-Verarbeitung (≈ TTFT ohne Netz/Warteschlange) und Token-Erzeugung
+    if timings.get("prompt_ms") is not None:
+        metrics.observe("llm_prompt_eval_seconds", float(timings["prompt_ms"]) / 1000.0)
+    if timings.get("predicted_ms") is not None:
+        metrics.observe("llm_generation_seconds", float(timings["predicted_ms"]) / 1000.0)
+    if timings.get("predicted_per_second"):
+        metrics.observe("llm_tokens_per_second", float(timings["predicted_per_second"]), buckets=metrics.RATE_BUCKETS)
+
+
+def get_llm_client() -> "LLMClient":
+    """Gemeinsame LLMClient-Instanz (RAG- und Briefing-Router)."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+        pool = _llm_client.pool
+        metrics.register_gauge(
+            "llm_in_flight", lambda: sum(b.in_flight for b in pool.backends), "Laufende Requests an LLM-Backends"
+        )
+        metrics.register_gauge(
+            "llm_backends_available",
+            lambda: sum(1 for b in pool.backends if b.available(time.monotonic())),
+            "Nutzbare LLM-Backends",
+        )
+        circuit_breaker.register(_llm_client.breaker)
+    return _llm_client
+
+
+def _retryable(e: BaseException) -> bool:
+    """Fehler, bei denen ein anderes Backend helfen kann (nicht: 4xx = Request selbst ungültig)."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
 
 
 class LLMClient:
-    def __init__(self) -> None:
-        self.base_url = settings.LLM_BASE_URL.rstrip("/")
+    def __init__(self, base_urls: Optional[List[str]] = None) -> None:
+        urls = base_urls or settings.llm_base_urls()
+        self.pool = BackendPool(
+            urls,
+            eject_after_failures=settings.LLM_EJECT_AFTER_FAILURES,
+            eject_seconds=settings.LLM_EJECT_SECONDS,
+        )
+        self.base_url = self.pool.backends[0].url
+        # Gesamtdauer einer Generierung; connect/read werden pro Verbindung im Pool begrenzt
         self.timeout = settings.LLM_TIMEOUT_SECONDS
+        self.hedge_after = settings.LLM_HEDGE_AFTER_MS / 1000.0
+        self._model_id: Optional[str] = None
+        self._model_id_checked_at = float("-inf")
+        self._model_id_task: Optional[asyncio.Task] = None
+        # Über alle Backends: Ausfall des LLM-Dienstes insgesamt (einzelne Backends wirft der Pool aus)
+        self.breaker = circuit_breaker.from_settings("llm", settings.LLM_BREAKER_SLOW_SECONDS)
 
-    async def completion(
-        self, prompt: str, n_predict: int = 600, temperature: float = 0.2
-    ) -> str:
-        # llama.cpp server: POST /completion
-        url = f"{self.base_url}/completion"
+    def _record_error(self, e: BaseException) -> None:
+        """Ausfall (Verbindung, Timeout, 5xx) zählt für den Breaker; 4xx heißt: Server antwortet."""
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+            self.breaker.record_success()
+        elif isinstance(e, (httpx.TransportError, httpx.HTTPStatusError, asyncio.TimeoutError)):
+            self.breaker.record_failure(type(e).__name__)
+        else:
+            self.breaker.release_probe()
+
+    def _payload(
+        self,
+        prompt: str,
+        n_predict: int,
+        temperature: float,
+        cache_key: Optional[str],
+        stream: bool = False,
+        json_schema: Optional[dict] = None,
+    ) -> dict:
         payload = {
             "prompt": prompt,
             "n_predict": n_predict,
             "temperature": temperature,
+            # KV-Cache des Slots wiederverwenden: nur der neue Teil des Prompts wird berechnet
+            "cache_prompt": settings.LLM_CACHE_PROMPT,
         }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            return data.get("content", "")
+        if stream:
+            payload["stream"] = True
+        if cache_key and settings.LLM_SLOTS_PER_BACKEND > 1:
+            # Gleiche doc_id/Session → gleicher Slot → gemeinsamer Prompt-Präfix liegt schon im KV-Cache.
+            # Eigener Hash (gesalzen), sonst hinge der Slot am Backend-Index aus pick_affine
+            # (gleicher crc32 modulo Backend-Anzahl) und manche Slots blieben je Backend ungenutzt.
+            payload["id_slot"] = stable_hash("slot:" + cache_key) % settings.LLM_SLOTS_PER_BACKEND
+        if json_schema is not None:
+            # llama.cpp leitet daraus eine Grammatik ab: nur gültiges JSON, Stopp nach dem Objekt
+            payload["json_schema"] = json_schema
+        return payload
+
+    async def completion(
+        self,
+        prompt: str,
+        n_predict: int = 600,
+        temperature: float = 0.2,
+        cache_key: Optional[str] = None,
+        json_schema: Optional[dict] = None,
+    ) -> str:
+        """cache_key (z. B. doc_id): Requests mit gleichem Schlüssel landen auf demselben Backend
+        und Slot, damit llama.cpp den Prompt-Präfix aus dem KV-Cache wiederverwendet.
+        json_schema: Ausgabe per Grammatik auf dieses JSON-Schema beschränken."""
+        # llama.cpp server: POST /completion
+        payload = self._payload(prompt, n_predict, temperature, cache_key, json_schema=json_schema)
+        self.breaker.before_call()
+        t0 = time.monotonic()
+        try:
+            if cache_key:
+                backend = self.pool.pick_affine(cache_key)
+                data = await asyncio.wait_for(self._post(backend, payload), timeout=self.timeout)
+            elif self.hedge_after > 0 and len(self.pool) > 1:
+                data = await asyncio.wait_for(self._hedged_post(payload), timeout=self.timeout)
+            else:
+                data = await asyncio.wait_for(self._post(None, payload), timeout=self.timeout)
+        except BaseException as e:
+            self._record_error(e)
+            raise
+        self.breaker.record_success(time.monotonic() - t0)
+        return data.get("content", "")
 
     async def completion_stream(
-        self, prompt: str, n_predict: int = 600, temperature: float = 0.2
+        self,
+        prompt: str,
+        n_predict: int = 600,
+        temperature: float = 0.2,
+        cache_key: Optional[str] = None,
+        json_schema: Optional[dict] = None,
+        stop_when: Optional[Callable[[], bool]] = None,
     ):
-        """Async generator: yields content chunks (str) as they arrive from llama.cpp SSE."""
-        url = f"{self.base_url}/completion"
-        payload = {
-            "prompt": prompt,
-            "n_predict": n_predict,
-            "temperature": temperature,
-            "stream": True,
-        }
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            async with client.stream("POST", url, json=payload) as r:
-                r.raise_for_status()
-                buffer = ""
-                async for chunk in r.aiter_text():
-                    buffer += chunk
-                    while "\n" in buffer:
-                        line, _, buffer = buffer.partition("\n")
-                        line = line.strip()
-                        if not line:
-                            continue
-                        # SSE: "data: {...}" oder NDJSON: "{...}"
-                        data_str = line[5:].strip() if line.startswith("data:") else line
-                        if data_str == "[DONE]":
-                            return
-                        try:
-                            data = json.loads(data_str)
-                            content = data.get("content") if isinstance(data, dict) else None
-                            if content:
-                                yield content
-                            if isinstance(data, dict) and data.get("stop") is True:
-                                return
-                        except json.JSONDecodeError:
+        """Async generator: yields content chunks (str) as they arrive from llama.cpp SSE.
+        stop_when: nach jedem Chunk geprüft; True → Stream regulär beenden (zählt nicht als Abbruch).
+        Mit json_schema endet die Generierung per Grammatik ohnehin direkt nach dem Objekt → den Rest
+        bis zum Stop-Event (mit Timings) noch lesen, aber nichts mehr ausgeben."""
+        payload = self._payload(prompt, n_predict, temperature, cache_key, stream=True, json_schema=json_schema)
+        self.breaker.before_call()
+        backend = self.pool.pick_affine(cache_key) if cache_key else self.pool.pick()
+        url = f"{backend.url}/completion"
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        client = get_http_client()
+        produced = 0
+        ttfb: Optional[float] = None
+        with self.pool.track(backend):
+            try:
+                async with client.stream("POST", url, json=payload) as r:
+                    r.raise_for_status()
+                    ttfb = time.monotonic() - t0
+                    self.pool.record_first_byte(backend, ttfb * 1000)
+                    finished = False
+                    async for contents in self._iter_sse(r, deadline):
+                        if finished:
                             continue
+                        produced += len(contents)
+                        yield "".join(contents)
+                        if stop_when is not None and stop_when():
+                            if json_schema is None:
+                                break
+                            finished = True
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                self.pool.record_failure(backend)
+                self._record_error(e)
+                raise
+            except (GeneratorExit, asyncio.CancelledError):
+                # Consumer weg (Client-Disconnect, Abbruch): `async with` hat die Upstream-Verbindung
+                # bereits geschlossen → llama.cpp bricht die Generierung ab, Slot wird frei.
+                # Ein gewolltes vorzeitiges Ende läuft über stop_when und landet im else-Zweig.
+                metrics.inc("llm_stream_aborted_total")
+                metrics.inc("llm_stream_tokens_saved_total", max(0, n_predict - produced))
+                if ttfb is not None:
+                    self.breaker.record_success(ttfb)
+                else:
+                    self.breaker.release_probe()
+                raise
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            else:
+                self.pool.record_success(backend, (time.monotonic() - t0) * 1000)
+                self.breaker.record_success(ttfb or 0.0)
+
+    async def _iter_sse(self, r: httpx.Response, deadline: float):
+        """Content aus der SSE-Antwort von llama.cpp, bis stop/[DONE].
+        Pro Netzwerk-Read eine Liste der enthaltenen Token-Texte (natürliches Bündeln ohne
+        Zusatzlatenz: was zusammen ankommt, geht auch zusammen raus)."""
+        parser = SSELineParser()
+        async for chunk in r.aiter_bytes():
+            if time.monotonic() > deadline:
+                raise httpx.ReadTimeout(f"LLM-Stream länger als {self.timeout}s", request=r.request)
+            contents: List[str] = []
+            stop = False
+            for data_str in parser.feed(chunk):
+                if data_str == b"[DONE]":
+                    stop = True
+                    break
+                try:
+                    data = json_loads(data_str)
+                except ValueError:
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                content = data.get("content")
+                if content:
+                    contents.append(content)
+                if data.get("stop") is True:
+                    record_timings(data)
+                    stop = True
+                    break
+            if contents:
+                yield contents
+            if stop:
+                return
+
+    async def _post(self, backend: Optional[Backend], payload: dict) -> dict:
+        """Ein Nicht-Streaming-Request an ein Backend; pflegt In-flight-Zähler und Latenz.
+        backend=None → Auswahl erst hier, direkt vor dem Hochzählen (sonst wählen parallel
+        gestartete Requests alle dasselbe Backend)."""
+        if backend is None:
+            backend = self.pool.pick()
+        url = f"{backend.url}/completion"
+        client = get_http_client()
+        t0 = time.monotonic()
+        with self.pool.track(backend):
+            try:
+                # Ohne Streaming kommt das erste Byte erst am Ende → read-Timeout = Gesamtdauer
+                async with client.stream("POST", url, json=payload, timeout=self._completion_timeout()) as r:
+                    self.pool.record_first_byte(backend, (time.monotonic() - t0) * 1000)
+                    r.raise_for_status()
+                    body = await r.aread()
+            except (httpx.TransportError, httpx.HTTPStatusError):
+                self.pool.record_failure(backend)
+                raise
+        self.pool.record_success(backend, (time.monotonic() - t0) * 1000)
+        data = json_loads(body)
+        record_timings(data)
+        return data
+
+    async def _post_streamed(self, backend: Backend, payload: dict, accepted: asyncio.Event) -> dict:
+        """Wie _post, aber als SSE-Stream (für Hedging): llama.cpp schickt die Header dann sofort,
+        ohne Streaming erst mit der fertigen Antwort. accepted wird mit den Headern (2xx) gesetzt."""
+        url = f"{backend.url}/completion"
+        client = get_http_client()
+        t0 = time.monotonic()
+        parts: List[str] = []
+        with self.pool.track(backend):
+            try:
+                async with client.stream("POST", url, json={**payload, "stream": True}) as r:
+                    self.pool.record_first_byte(backend, (time.monotonic() - t0) * 1000)
+                    r.raise_for_status()
+                    accepted.set()
+                    async for contents in self._iter_sse(r, t0 + self.timeout):
+                        parts.extend(contents)
+            except (httpx.TransportError, httpx.HTTPStatusError):
+                self.pool.record_failure(backend)
+                raise
+        self.pool.record_success(backend, (time.monotonic() - t0) * 1000)
+        return {"content": "".join(parts)}
+
+    async def _hedged_post(self, payload: dict) -> dict:
+        """Hedging: nimmt das erste Backend den Request nicht innerhalb von LLM_HEDGE_AFTER_MS an
+        (Verbindung + Antwort-Header des Streams), parallel ein zweites anfragen; die schnellere Antwort
+        gewinnt, die andere wird abgebrochen. Lange Generierungen werden so nicht doppelt erzeugt.
+        Failover: scheitert ein Backend vor der Annahme (Verbindung, 5xx) und läuft kein anderes mehr,
+        übernimmt sofort das nächste noch nicht versuchte."""
+        tried: List[Backend] = []
+        tasks: dict = {}  # Task → accepted-Event
+
+        def launch(backend: Backend) -> asyncio.Task:
+            tried.append(backend)
+            accepted = asyncio.Event()
+            task = asyncio.create_task(self._post_streamed(backend, payload, accepted))
+            tasks[task] = accepted
+            return task
+
+        primary = launch(self.pool.pick())
+        waiter = asyncio.create_task(tasks[primary].wait())
+        try:
+            done, _ = await asyncio.wait({primary, waiter}, timeout=self.hedge_after, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                secondary = self.pool.pick(exclude=tried)
+                if secondary is not None:
+                    secondary.hedged_total += 1
+                    launch(secondary)
+            error: Optional[BaseException] = None
+            while tasks:
+                done, _ = await asyncio.wait(set(tasks), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    accepted = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    if not tasks and not accepted.is_set() and _retryable(error):
+                        backend = self.pool.pick(exclude=tried)
+                        if backend is not None:
+                            metrics.inc("llm_failover_total")
+                            launch(backend)
+            raise error
+        finally:
+            waiter.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def model_id(self) -> str:
+        """Identität des geladenen Modells (llama.cpp GET /props → model_path), z. B. für Cache-Schlüssel.
+        Blockiert nie: liefert den zuletzt bekannten Wert (bleibt auch bei ausgefallenem LLM gültig);
+        älter als LLM_MODEL_ID_TTL_SECONDS → Auffrischung im Hintergrund (ebenso im Health-Check), damit
+        ein neu gestarteter llama.cpp mit anderem Modell erkannt wird. Noch nie ermittelt → Backend-URLs."""
+        if time.monotonic() - self._model_id_checked_at > settings.LLM_MODEL_ID_TTL_SECONDS:
+            self._schedule_model_id_refresh()
+        return self._model_id or ",".join(b.url for b in self.pool.backends)
+
+    def _schedule_model_id_refresh(self) -> None:
+        if self._model_id_task is not None and not self._model_id_task.done():
+            return
+        try:
+            self._model_id_task = asyncio.get_running_loop().create_task(self.refresh_model_id())
+        except RuntimeError:  # kein Event-Loop (Aufruf aus einem Thread)
+            pass
+
+    async def refresh_model_id(self) -> Optional[str]:
+        """/props der verfügbaren Backends abfragen; bei Fehlern bleibt der bisherige Wert."""
+        self._model_id_checked_at = time.monotonic()
+        client = get_http_client()
+        for backend in self.pool.backends:
+            if not backend.available(time.monotonic()):
+                continue
+            try:
+                r = await client.get(f"{backend.url}/props", timeout=settings.LLM_CONNECT_TIMEOUT_SECONDS)
+                r.raise_for_status()
+                props = r.json()
+            except (httpx.HTTPError, ValueError):
+                continue
+            model = props.get("model_path") or props.get("default_generation_settings", {}).get("model")
+            if model:
+                if self._model_id is not None and str(model) != self._model_id:
+                    logger.info("LLM-Modell gewechselt: %s → %s", self._model_id, model)
+                self._model_id = str(model)
+                return self._model_id
+        return None
+
+    async def check_backends(self) -> None:
+        """Aktiver Health-Check: ausgefallene Backends wieder aufnehmen, kranke auswerfen."""
+        client = get_http_client()
+        any_ok = False
+        for backend in self.pool.backends:
+            try:
+                r = await client.get(f"{backend.url}/health", timeout=5.0)
+                ok = r.status_code in (200, 404)
+            except httpx.HTTPError:
+                ok = False
+            any_ok = any_ok or ok
+            if ok and not backend.healthy:
+                self.pool.readmit(backend)
+            elif not ok and backend.healthy:
+                self.pool.eject(backend)
+        if any_ok and time.monotonic() - self._model_id_checked_at > settings.LLM_MODEL_ID_TTL_SECONDS:
+            await self.refresh_model_id()
+        if not any_ok and self.breaker.state == circuit_breaker.CLOSED:
+            # Kein Backend antwortet: nicht erst Fehler neuer Requests abwarten (jeder bis zum Timeout)
+            self.breaker.force_open("Health-Check: kein LLM-Backend erreichbar")
+
+    async def health_loop(self, interval_seconds: float) -> None:
+        """Periodischer Health-Check (als Task im Lifespan gestartet)."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.check_backends()
+            except Exception:
+                logger.exception("LLM-Health-Check fehlgeschlagen")
+
+    def _completion_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            read=float(self.timeout),
+            write=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        )
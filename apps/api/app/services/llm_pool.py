@@ -0,0 +1,127 @@
+"""
+Backend-Pool für mehrere llama.cpp-Server.
+Routing: Backend mit den wenigsten laufenden Requests (least outstanding), bei Gleichstand
+das mit der geringeren Latenz. Backends werden nach wiederholten Fehlern oder fehlgeschlagenem
+Health-Check ausgeworfen (eject) und nach Ablauf der Sperrzeit bzw. erfolgreichem Check wieder
+aufgenommen.
+"""
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+
+class Backend:
+    """Ein llama.cpp-Server inkl. Laufzeit-Statistik (nur im Event-Loop verändert)."""
+
+    # Glättungsfaktor für die Latenz-EWMA
+    _ALPHA = 0.2
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.hedged_total = 0
+        self.latency_ewma_ms: Optional[float] = None
+        self.ttfb_ewma_ms: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.ejected_until
+
+    def _ewma(self, old: Optional[float], value: float) -> float:
+        return value if old is None else old + self._ALPHA * (value - old)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "hedged_total": self.hedged_total,
+            "latency_ewma_ms": round(self.latency_ewma_ms, 1) if self.latency_ewma_ms is not None else None,
+            "ttfb_ewma_ms": round(self.ttfb_ewma_ms, 1) if self.ttfb_ewma_ms is not None else None,
+            "ejected_for_s": round(max(0.0, self.ejected_until - time.monotonic()), 1) if not self.healthy else 0.0,
+        }
+
+
+class BackendPool:
+    def __init__(self, urls: Iterable[str], eject_after_failures: int = 3, eject_seconds: float = 30.0) -> None:
+        self.backends: List[Backend] = [Backend(u) for u in urls]
+        if not self.backends:
+            raise ValueError("Mindestens ein LLM-Backend nötig (LLM_BASE_URL / LLM_BASE_URLS).")
+        self.eject_after_failures = max(1, eject_after_failures)
+        self.eject_seconds = eject_seconds
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def pick(self, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """Least-outstanding-Auswahl. Sind alle ausgeworfen, trotzdem eins liefern (fail open)."""
+        excluded = set(id(b) for b in exclude)
+        candidates = [b for b in self.backends if id(b) not in excluded]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        available = [b for b in candidates if b.available(now)] or candidates
+        return min(
+            available,
+            key=lambda b: (b.in_flight, b.latency_ewma_ms if b.latency_ewma_ms is not None else 0.0),
+        )
+
+    def pick_affine(self, key: str) -> Backend:
+        """Stabiles Backend für einen Schlüssel (doc_id/Session → KV-Cache bleibt auf einem Server).
+        Ausgeworfene Backends werden übersprungen."""
+        now = time.monotonic()
+        start = stable_hash(key) % len(self.backends)
+        for i in range(len(self.backends)):
+            b = self.backends[(start + i) % len(self.backends)]
+            if b.available(now):
+                return b
+        return self.backends[start]
+
+    @contextmanager
+    def track(self, backend: Backend):
+        """In-flight-Zähler für die Dauer eines Requests."""
+        backend.in_flight += 1
+        backend.requests_total += 1
+        try:
+            yield backend
+        finally:
+            backend.in_flight -= 1
+
+    def record_first_byte(self, backend: Backend, ttfb_ms: float) -> None:
+        backend.ttfb_ewma_ms = backend._ewma(backend.ttfb_ewma_ms, ttfb_ms)
+
+    def record_success(self, backend: Backend, latency_ms: float) -> None:
+        backend.latency_ewma_ms = backend._ewma(backend.latency_ewma_ms, latency_ms)
+        backend.consecutive_failures = 0
+        if not backend.healthy:
+            backend.healthy = True
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.errors_total += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.eject_after_failures:
+            self.eject(backend)
+
+    def eject(self, backend: Backend) -> None:
+        backend.healthy = False
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    def readmit(self, backend: Backend) -> None:
+        backend.healthy = True
+        backend.consecutive_failures = 0
+        backend.ejected_until = 0.0
+
+    def stats(self) -> List[dict]:
+        return [b.stats() for b in self.backends]
+
+
+def stable_hash(key: str) -> int:
+    """Prozessübergreifend stabiler Hash (hash() ist pro Prozess gesalzen)."""
+    return zlib.crc32(key.encode("utf-8"))
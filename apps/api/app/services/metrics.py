@@ -0,0 +1,192 @@
+"""
+Prozessinterne Metriken, thread-safe: Counter, Histogramme (feste Buckets), Gauges.
+Leichtgewichtig für den Hot-Path (ein Lock + bisect pro Messung; Gauges werden erst beim
+Auslesen berechnet). Auslesen über /health/metrics (JSON) und /metrics (Prometheus-Textformat).
+"""
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.utils import timing
+
+logger = logging.getLogger(__name__)
+
+# Sekunden: 5 ms … 2 min (Embedding/Chroma im ms-Bereich, Generierung bis Minuten)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Tokens pro Sekunde (CPU … GPU)
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_histograms: Dict[Tuple[str, Labels], "_Histogram"] = {}
+_help: Dict[str, str] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # letzter Eintrag = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+def inc(name: str, value: float = 1.0) -> None:
+    """Counter `name` um `value` erhöhen (legt ihn bei Bedarf an)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0.0) + value
+
+
+def get(name: str) -> float:
+    """Aktueller Wert eines Counters (0, wenn unbekannt)."""
+    with _lock:
+        return _counters.get(name, 0.0)
+
+
+def snapshot() -> Dict[str, float]:
+    """Kopie aller Counter (für Diagnose-Endpoints)."""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str) -> None:
+    """Messwert in Histogramm `name` (mit Labels, z. B. stage="embed") eintragen.
+    Dauern (`*_seconds`) gehen zusätzlich in die Server-Timing-Aufschlüsselung des Requests."""
+    if name.endswith("_seconds"):
+        timing.record(labels.get("stage") or name[: -len("_seconds")], value)
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = _Histogram(buckets)
+        hist.counts[bisect.bisect_left(hist.buckets, value)] += 1
+        hist.sum += value
+        hist.count += 1
+
+
+@contextmanager
+def timer(name: str, **labels: str):
+    """`with metrics.timer("rag_chat_stage_seconds", stage="retrieve"): ...` – Dauer in Sekunden."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+def register_gauge(name: str, fn: Callable[[], float], help_text: str = "") -> None:
+    """Gauge, deren Wert erst beim Auslesen über fn() ermittelt wird (kein Aufwand im Hot-Path)."""
+    with _lock:
+        _gauges[name] = fn
+        if help_text:
+            _help[name] = help_text
+
+
+def describe(name: str, help_text: str) -> None:
+    """HELP-Text für /metrics."""
+    with _lock:
+        _help[name] = help_text
+
+
+def histogram_snapshot() -> Dict[str, dict]:
+    """Histogramme als JSON-freundliches Dict: count, sum, Mittelwert, p50/p95/p99 (Bucket-Schätzung)."""
+    with _lock:
+        items = [(k, h.buckets, list(h.counts), h.sum, h.count) for k, h in _histograms.items()]
+    out = {}
+    for (name, labels), buckets, counts, total, count in sorted(items):
+        key = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        out[key] = {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else None,
+            "p50": _quantile(buckets, counts, count, 0.50),
+            "p95": _quantile(buckets, counts, count, 0.95),
+            "p99": _quantile(buckets, counts, count, 0.99),
+        }
+    return out
+
+
+def _quantile(buckets: Sequence[float], counts: List[int], count: int, q: float) -> Optional[float]:
+    """Obere Bucket-Grenze, unter der der Anteil q der Messungen liegt (wie histogram_quantile grob)."""
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    for bound, n in zip(list(buckets) + [math.inf], counts):
+        seen += n
+        if seen >= rank:
+            return bound if bound != math.inf else None
+    return None
+
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _prom_name(name: str) -> str:
+    return _NAME_RE.sub("_", name)
+
+
+def _prom_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _prom_float(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        hists = sorted((k, h.buckets, list(h.counts), h.sum, h.count) for k, h in _histograms.items())
+        gauges = sorted(_gauges.items())
+        help_texts = dict(_help)
+    lines: List[str] = []
+    for name, value in counters:
+        prom = _prom_name(name)
+        if name in help_texts:
+            lines.append(f"# HELP {prom} {help_texts[name]}")
+        lines.append(f"# TYPE {prom} counter")
+        lines.append(f"{prom} {_prom_float(value)}")
+    for name, fn in gauges:
+        try:
+            value = float(fn())
+        except Exception as e:
+            # Scrape nicht abbrechen, aber sichtbar machen: sonst fehlt die Gauge unbemerkt
+            logger.warning("Gauge %s nicht auslesbar: %s", name, e)
+            continue
+        prom = _prom_name(name)
+        if name in help_texts:
+            lines.append(f"# HELP {prom} {help_texts[name]}")
+        lines.append(f"# TYPE {prom} gauge")
+        lines.append(f"{prom} {_prom_float(value)}")
+    last_name = None
+    for (name, labels), buckets, counts, total, count in hists:
+        prom = _prom_name(name)
+        if name != last_name:
+            if name in help_texts:
+                lines.append(f"# HELP {prom} {help_texts[name]}")
+            lines.append(f"# TYPE {prom} histogram")
+            last_name = name
+        cumulative = 0
+        for bound, n in zip(list(buckets) + [math.inf], counts):
+            cumulative += n
+            lines.append(f"{prom}_bucket{_prom_labels(labels, ('le', _prom_float(bound)))} {cumulative}")
+        lines.append(f"{prom}_sum{_prom_labels(labels)} {_prom_float(total)}")
+        lines.append(f"{prom}_count{_prom_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,304 @@
+"""
+Reindex in eine neue Collection (z. B. nach Wechsel von EMBEDDING_MODEL) – ohne Original-PDFs.
+Ablauf (Hintergrund-Thread, ein Job gleichzeitig):
+  1) Ziel-Collection <CHROMA_COLLECTION>__<modell>_<zeit>_<id> mit den Index-Parametern aus den Settings
+  2) je Dokument des aktiven Index: Chunks aus dem Extraktions-Artefakt (gespeicherte Grenzen bzw.
+     mit rechunk neu zerlegt), ohne Artefakt aus den in Chroma gespeicherten Chunk-Texten (mit
+     rechunk bleiben deren Grenzen erhalten – im Status als not_rechunked gezählt);
+     Embedding mit dem Zielmodell in Batches (REINDEX_BATCH_CHUNKS), Upsert, Katalogeintrag,
+     Dokument-Zentroid (<Ziel>__docs)
+  3) Nachzügler: währenddessen hinzugekommene/gelöschte Dokumente abgleichen
+  4) unter index_state.write_lock(): letzter Abgleich, aktiven Index umschalten (Collection + Modell
+     zusammen), Antwort-Cache leeren, altes Modell entladen; alte Collection danach löschen
+     (außer REINDEX_KEEP_OLD)
+Bis zum Umschalten lesen und schreiben Chat/Ingest/Delete auf dem alten Index.
+"""
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.artifact_store import artifact_chunks, get_artifact_store
+from app.services.doc_catalog import get_doc_catalog, sync_from_vector_store
+from app.services.doc_centroids import delete_centroid, drop_centroids, upsert_centroid
+from app.services.index_state import active_index, set_active_index, write_lock
+
+logger = logging.getLogger(__name__)
+
+_DROP_GRACE_SECONDS = 10.0  # laufende Abfragen auf der alten Collection zu Ende laufen lassen
+_CATCH_UP_ROUNDS = 3
+_STATUS_MAX_DOC_IDS = 20
+
+
+class ReindexError(RuntimeError):
+    pass
+
+
+def _collection_name(base: str, model: str) -> str:
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", model.rsplit("/", 1)[-1]).strip("-").lower()[:40] or "model"
+    return f"{base}__{slug}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class ReindexJob:
+    def __init__(self, target_model: str, rechunk: bool = False) -> None:
+        settings = get_settings()
+        source = active_index()
+        self.source_collection = source.collection
+        self.source_model = source.embedding_model
+        self.target_model = target_model
+        self.target_collection = _collection_name(settings.CHROMA_COLLECTION, target_model)
+        self.rechunk = rechunk
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.docs_total = 0
+        self.docs_done = 0
+        self.chunks_done = 0
+        self.from_artifacts = 0
+        self.from_chroma = 0
+        self.not_rechunked: List[str] = []
+        self.started_at = time.time()
+        self.switched_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._target = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="reindex", daemon=True)
+
+    # --- Steuerung ---
+
+    def start(self) -> "ReindexJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def status(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        rate = self.chunks_done / elapsed if elapsed > 0 else 0.0
+        remaining_docs = max(0, self.docs_total - self.docs_done)
+        eta = None
+        if self.state == "running" and self.docs_done and rate:
+            eta = round(remaining_docs * (self.chunks_done / self.docs_done) / rate)
+        return {
+            "state": self.state,
+            "source_collection": self.source_collection,
+            "source_model": self.source_model,
+            "target_collection": self.target_collection,
+            "target_model": self.target_model,
+            "rechunk": self.rechunk,
+            "docs_total": self.docs_total,
+            "docs_done": self.docs_done,
+            "chunks_done": self.chunks_done,
+            "from_artifacts": self.from_artifacts,
+            "from_chroma": self.from_chroma,
+            # rechunk angefordert, aber kein Artefakt: alte Chunk-Grenzen übernommen
+            "not_rechunked": len(self.not_rechunked),
+            "not_rechunked_doc_ids": self.not_rechunked[:_STATUS_MAX_DOC_IDS],
+            "progress": round(self.docs_done / self.docs_total, 4) if self.docs_total else (1.0 if self.state == "done" else 0.0),
+            "chunks_per_s": round(rate, 1),
+            "eta_s": eta,
+            "started_at": self.started_at,
+            "switched_at": self.switched_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    # --- Ablauf ---
+
+    def _run(self) -> None:
+        from app.services.vector_store import collection_metadata, get_chroma_client, get_collection
+
+        self.state = "running"
+        client = get_chroma_client()
+        catalog = get_doc_catalog()
+        try:
+            sync_from_vector_store()  # Altbestand ohne Katalog: Dokumentliste aus den Chunk-Metadaten
+            self._source = get_collection(self.source_collection)
+            self._target = client.create_collection(
+                self.target_collection, metadata=collection_metadata(embedding_model=self.target_model)
+            )
+            pending = sorted(catalog.doc_ids(self.source_collection))
+            self.docs_total = len(pending)
+            logger.info(
+                "Reindex %s (%s) → %s (%s): %d Dokumente",
+                self.source_collection, self.source_model, self.target_collection, self.target_model, len(pending),
+            )
+            self._apply(pending, [])
+            for _ in range(_CATCH_UP_ROUNDS):
+                added, removed = self._delta()
+                if not added and not removed:
+                    break
+                self._apply(added, removed)
+
+            self.state = "switching"
+            with write_lock():
+                self._apply(*self._delta())
+                set_active_index(self.target_collection, self.target_model)
+                self.switched_at = time.time()
+            self._after_switch()
+            logger.info("Reindex abgeschlossen: aktiver Index %s (%s)", self.target_collection, self.target_model)
+            if self.not_rechunked:
+                logger.warning(
+                    "Rechunk: %d Dokumente ohne Extraktions-Artefakt behalten ihre alten Chunks (z. B. %s)",
+                    len(self.not_rechunked), ", ".join(self.not_rechunked[:5]),
+                )
+            self.state = "done"
+        except Exception as e:
+            cancelled = isinstance(e, ReindexError) and self._cancel.is_set()
+            self.state = "cancelled" if cancelled else "failed"
+            self.error = str(e)
+            if not cancelled:
+                logger.exception("Reindex fehlgeschlagen")
+            if self.switched_at is None and self._target is not None:
+                self._drop(self.target_collection)  # nur die selbst angelegte Ziel-Collection
+        finally:
+            self.finished_at = time.time()
+
+    def _delta(self) -> Tuple[List[str], List[str]]:
+        catalog = get_doc_catalog()
+        source = catalog.doc_ids(self.source_collection)
+        target = catalog.doc_ids(self.target_collection)
+        added, removed = sorted(source - target), sorted(target - source)
+        self.docs_total += len(added)
+        return added, removed
+
+    def _apply(self, added: List[str], removed: List[str]) -> None:
+        catalog = get_doc_catalog()
+        step = get_settings().DOC_DELETE_BATCH
+        for doc_id in removed:
+            ids = catalog.chunk_ids(self.target_collection, doc_id) or []
+            for start in range(0, len(ids), step):
+                self._target.delete(ids=ids[start:start + step])
+            catalog.remove_document(self.target_collection, doc_id)
+            delete_centroid(self.target_collection, doc_id)
+        for doc_id in added:
+            if self._cancel.is_set():
+                raise ReindexError("abgebrochen")
+            self._reindex_doc(doc_id)
+            self.docs_done += 1
+
+    def _load_chunks(self, doc_id: str) -> Optional[Tuple[List[str], List[str], List[dict]]]:
+        settings = get_settings()
+        store = get_artifact_store()
+        artifact = store.load(doc_id) if store else None
+        if artifact is not None:
+            self.from_artifacts += 1
+            if self.rechunk:
+                return artifact_chunks(artifact, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+            return artifact_chunks(artifact)
+        chunk_ids = get_doc_catalog().chunk_ids(self.source_collection, doc_id)
+        if not chunk_ids:
+            return None  # zwischenzeitlich gelöscht
+        self.from_chroma += 1
+        if self.rechunk:
+            self.not_rechunked.append(doc_id)
+        ids, documents, metadatas = [], [], []
+        step = settings.DOC_DELETE_BATCH
+        for start in range(0, len(chunk_ids), step):
+            page = self._source.get(ids=chunk_ids[start:start + step], include=["documents", "metadatas"])
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+        return ids, documents, metadatas
+
+    def _reindex_doc(self, doc_id: str) -> None:
+        from app.services.embeddings import embed_documents
+
+        catalog = get_doc_catalog()
+        info = catalog.get(self.source_collection, doc_id)
+        loaded = self._load_chunks(doc_id) if info else None
+        if loaded is None:
+            return
+        ids, documents, metadatas = loaded
+        batch = max(1, get_settings().REINDEX_BATCH_CHUNKS)
+        vectors = []
+        for start in range(0, len(ids), batch):
+            embeddings = embed_documents(documents[start:start + batch], batch_size=32, model_name=self.target_model)
+            vectors.extend(embeddings)
+            self._target.upsert(
+                ids=ids[start:start + batch],
+                embeddings=embeddings,
+                documents=documents[start:start + batch],
+                metadatas=metadatas[start:start + batch],
+            )
+            self.chunks_done += len(embeddings)
+            metrics.inc("reindex_chunks_total", len(embeddings))
+        catalog.add_document(
+            self.target_collection,
+            doc_id,
+            info["filename"],
+            chunk_ids=ids,
+            pages=info["pages"],
+            size_bytes=info["bytes"],
+            content_hash=info["content_hash"],
+            ingested_at=info["ingested_at"],
+        )
+        upsert_centroid(self.target_collection, doc_id, vectors, filename=info["filename"], embedding_model=self.target_model)
+        metrics.inc("reindex_docs_total")
+
+    def _after_switch(self) -> None:
+        from app.services import embeddings
+        from app.services.semantic_cache import get_semantic_cache
+
+        get_semantic_cache().invalidate()  # gespeicherte Frage-Embeddings stammen vom alten Modell
+        if self.source_model != self.target_model:
+            embeddings.unload(self.source_model)
+        if not get_settings().REINDEX_KEEP_OLD:
+            time.sleep(_DROP_GRACE_SECONDS)
+            self._drop(self.source_collection)
+
+    def _drop(self, collection: str) -> None:
+        from app.services.vector_store import get_chroma_client
+
+        try:
+            get_chroma_client().delete_collection(collection)
+        except Exception as e:
+            logger.warning("Collection %s nicht gelöscht: %s", collection, e)
+        drop_centroids(collection)
+        get_doc_catalog().drop_collection(collection)
+
+
+_job: Optional[ReindexJob] = None
+_job_lock = threading.Lock()
+
+
+def get_reindex_job() -> Optional[ReindexJob]:
+    return _job
+
+
+def start_reindex(target_model: Optional[str] = None, rechunk: bool = False) -> ReindexJob:
+    """Reindex starten (Default-Ziel: EMBEDDING_MODEL). ReindexError, wenn bereits ein Job läuft oder
+    nichts zu tun ist (gleiches Modell ohne rechunk)."""
+    global _job
+    target = target_model or get_settings().EMBEDDING_MODEL
+    with _job_lock:
+        if _job is not None and _job.running:
+            raise ReindexError("Reindex läuft bereits")
+        if target == active_index().embedding_model and not rechunk:
+            raise ReindexError(f"Aktiver Index nutzt bereits {target}")
+        _job = ReindexJob(target, rechunk=rechunk).start()
+    return _job
+
+
+def reindex_on_model_change() -> Optional[ReindexJob]:
+    """Beim Start: EMBEDDING_MODEL weicht vom Modell des aktiven Index ab → Reindex im Hintergrund."""
+    settings = get_settings()
+    if not settings.REINDEX_ON_MODEL_CHANGE or settings.EMBEDDING_MODEL == active_index().embedding_model:
+        return None
+    logger.info(
+        "EMBEDDING_MODEL geändert (%s → %s): Reindex startet, bis dahin bleibt der alte Index aktiv",
+        active_index().embedding_model, settings.EMBEDDING_MODEL,
+    )
+    try:
+        return start_reindex(settings.EMBEDDING_MODEL)
+    except ReindexError as e:
+        logger.info("Kein Reindex: %s", e)
+        return None
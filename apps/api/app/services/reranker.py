@@ -0,0 +1,136 @@
+"""
+Optionales Reranking mit einem lokalen Cross-Encoder (sentence-transformers, CPU): der Chat holt
+RERANK_CANDIDATES Kandidaten aus query_chunks, bewertet die Paare (Frage, Chunk) in einem Batch im
+Thread-Pool und gibt nur die besten top_k an den Prompt weiter.
+- Modell (RERANK_MODEL) wird erst beim ersten Rerank geladen; schlägt das fehl (Paket/Modell fehlt),
+  bleibt es für _LOAD_RETRY_SECONDS bei der Dense-Reihenfolge.
+- Scores werden pro (Modell, Frage-Hash, Chunk-ID, Text-Hash) gecacht – nur neue Paare werden bewertet.
+- Latenzbudget RERANK_BUDGET_MS (inkl. Laden und Warten auf den Lock): wird es überschritten, gilt die
+  Dense-Reihenfolge; die Bewertung läuft im Hintergrund zu Ende und füllt den Cache.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import get_settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+_LOAD_RETRY_SECONDS = 60.0
+
+_model = None
+_model_name: Optional[str] = None
+_load_failed_at: Optional[float] = None
+_model_lock = threading.Lock()  # Laden + predict (ein Batch zur Zeit, CPU)
+
+_cache_lock = threading.Lock()
+_scores: "OrderedDict[tuple, float]" = OrderedDict()
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def _question_key(question: str) -> bytes:
+    return _digest(" ".join(question.lower().split()))
+
+
+def _get_model():
+    global _model, _model_name, _load_failed_at
+    name = get_settings().RERANK_MODEL
+    if _model is not None and _model_name == name:
+        return _model
+    if _load_failed_at is not None and time.monotonic() - _load_failed_at < _LOAD_RETRY_SECONDS:
+        raise RuntimeError("Rerank-Modell nicht verfügbar (letzter Ladeversuch fehlgeschlagen)")
+    try:
+        from sentence_transformers import CrossEncoder
+
+        t0 = time.perf_counter()
+        _model = CrossEncoder(name, max_length=512, device="cpu")
+        _model_name = name
+        _load_failed_at = None
+        logger.info("Rerank-Modell %s geladen (%.1fs)", name, time.perf_counter() - t0)
+        return _model
+    except Exception:
+        _load_failed_at = time.monotonic()
+        raise
+
+
+def is_loaded() -> bool:
+    return _model is not None
+
+
+def status() -> dict:
+    settings = get_settings()
+    return {
+        "enabled": settings.RERANK_ENABLED,
+        "model": settings.RERANK_MODEL,
+        "loaded": is_loaded(),
+        "cached_scores": len(_scores),
+    }
+
+
+def score(question: str, chunk_ids: List[str], documents: List[str]) -> List[float]:
+    """Cross-Encoder-Scores (höher = relevanter) für alle Chunks; nur ungecachte Paare werden bewertet."""
+    settings = get_settings()
+    qkey = _question_key(question)
+    keys = [(settings.RERANK_MODEL, qkey, cid, _digest(doc)) for cid, doc in zip(chunk_ids, documents)]
+    out: Dict[int, float] = {}
+    with _cache_lock:
+        for i, key in enumerate(keys):
+            if key in _scores:
+                _scores.move_to_end(key)
+                out[i] = _scores[key]
+    metrics.inc("rag_rerank_cache_hits_total", len(out))
+    todo = [i for i in range(len(keys)) if i not in out]
+    if todo:
+        with _model_lock:
+            model = _get_model()
+            values = model.predict(
+                [(question, documents[i]) for i in todo],
+                batch_size=max(1, settings.RERANK_BATCH_SIZE),
+                show_progress_bar=False,
+            )
+        metrics.inc("rag_rerank_pairs_scored_total", len(todo))
+        with _cache_lock:
+            for i, value in zip(todo, values):
+                out[i] = float(value)
+                _scores[keys[i]] = out[i]
+            while len(_scores) > settings.RERANK_CACHE_MAX_ENTRIES:
+                _scores.popitem(last=False)
+    return [out[i] for i in range(len(keys))]
+
+
+async def rerank(question: str, result: dict, top_n: int) -> dict:
+    """Treffer von query_chunks nach Cross-Encoder-Score neu ordnen und auf top_n kürzen
+    (zusätzlicher Key "rerank_scores"). Budget überschritten oder Fehler → Dense-Reihenfolge, top_n."""
+    ids = result["ids"]
+    if len(ids) <= 1:
+        return result
+    budget = get_settings().RERANK_BUDGET_MS / 1000.0
+    task = asyncio.ensure_future(asyncio.to_thread(score, question, list(ids), list(result["documents"])))
+    try:
+        scores = await asyncio.wait_for(asyncio.shield(task), timeout=budget if budget > 0 else None)
+    except asyncio.TimeoutError:
+        # Bewertung läuft im Thread weiter und füllt den Cache für die nächste gleiche Frage
+        task.add_done_callback(lambda t: t.exception())
+        metrics.inc("rag_rerank_timeouts_total")
+        return _truncate(result, top_n)
+    except Exception as e:
+        logger.warning("Rerank fehlgeschlagen, Dense-Reihenfolge: %s", e)
+        metrics.inc("rag_rerank_errors_total")
+        return _truncate(result, top_n)
+    metrics.inc("rag_rerank_total")
+    order = sorted(range(len(ids)), key=lambda i: -scores[i])[:top_n]
+    out = {key: [result[key][i] for i in order] for key in ("ids", "documents", "metadatas", "distances")}
+    out["rerank_scores"] = [round(scores[i], 4) for i in order]
+    return out
+
+
+def _truncate(result: dict, top_n: int) -> dict:
+    return {key: list(result[key][:top_n]) for key in ("ids", "documents", "metadatas", "distances")}
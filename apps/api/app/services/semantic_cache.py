@@ -0,0 +1,167 @@
+"""
+Semantischer Antwort-Cache für umformulierte Fragen („Was kostet X?“ / „Preis von X?“).
+Beantwortete Fragen liegen als (normalisierte) Vektoren in einem kleinen In-Memory-Index,
+getrennt nach Scope (Collection-Version, doc_id, Sprache). Treffer nur, wenn
+  1) Cosinus-Ähnlichkeit der Frage ≥ SEMANTIC_CACHE_THRESHOLD und
+  2) die abgerufenen Chunks sich ausreichend überschneiden (Jaccard ≥ SEMANTIC_CACHE_MIN_OVERLAP).
+Ähnliche Frage, aber andere Chunks → „false hit“ (verhindert, zählt als Metrik).
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services import metrics
+
+Scope = Tuple[int, Optional[str], str]
+
+
+@dataclass
+class _Entry:
+    scope: Scope
+    vector: np.ndarray
+    chunk_ids: frozenset
+    question: str
+    answer: str
+
+
+@dataclass
+class CacheHit:
+    answer: str
+    similarity: float
+    overlap: float
+    question: str
+
+
+class SemanticCache:
+    """LRU-begrenzter Vektor-Cache; eine Matrix pro Scope, lazy neu aufgebaut."""
+
+    def __init__(self, threshold: float, min_overlap: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._next_id = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._scope_ids: Dict[Scope, List[int]] = {}
+        self._scope_matrix: Dict[Scope, np.ndarray] = {}
+
+    def _scope(self, doc_id: Optional[str], language: str) -> Scope:
+        return (self._version, doc_id, language)
+
+    def invalidate(self) -> None:
+        """Collection hat sich geändert (Ingest/Delete) → neue Version, alte Einträge verwerfen."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._scope_ids.clear()
+            self._scope_matrix.clear()
+        metrics.inc("semantic_cache_invalidations_total")
+
+    def lookup(
+        self,
+        query_embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        doc_id: Optional[str],
+        language: str,
+    ) -> Optional[CacheHit]:
+        """Besten Kandidaten im Scope suchen; None bei Miss (inkl. verhindertem false hit)."""
+        metrics.inc("semantic_cache_lookups_total")
+        q = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            scope = self._scope(doc_id, language)
+            ids = self._scope_ids.get(scope)
+            if not ids:
+                metrics.inc("semantic_cache_misses_total")
+                return None
+            matrix = self._scope_matrix.get(scope)
+            if matrix is None:
+                matrix = np.vstack([self._entries[i].vector for i in ids])
+                self._scope_matrix[scope] = matrix
+            sims = matrix @ q
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            entry_id = ids[best]
+            entry = self._entries[entry_id]
+            metrics.inc("semantic_cache_similarity_sum", similarity)
+            metrics.inc("semantic_cache_similarity_count")
+            if similarity < self.threshold:
+                metrics.inc("semantic_cache_misses_total")
+                return None
+            current = frozenset(chunk_ids)
+            union = entry.chunk_ids | current
+            overlap = len(entry.chunk_ids & current) / len(union) if union else 0.0
+            if overlap < self.min_overlap:
+                metrics.inc("semantic_cache_false_hits_total")
+                metrics.inc("semantic_cache_misses_total")
+                return None
+            self._entries.move_to_end(entry_id)
+        metrics.inc("semantic_cache_hits_total")
+        return CacheHit(answer=entry.answer, similarity=similarity, overlap=overlap, question=entry.question)
+
+    def store(
+        self,
+        query_embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        doc_id: Optional[str],
+        language: str,
+        question: str,
+        answer: str,
+    ) -> None:
+        """Beantwortete Frage aufnehmen; älteste Einträge fliegen bei Überlauf raus."""
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        with self._lock:
+            scope = self._scope(doc_id, language)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(
+                scope=scope,
+                vector=vector,
+                chunk_ids=frozenset(chunk_ids),
+                question=question,
+                answer=answer,
+            )
+            self._scope_ids.setdefault(scope, []).append(entry_id)
+            self._scope_matrix.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                old_id, old = self._entries.popitem(last=False)
+                scope_ids = self._scope_ids.get(old.scope)
+                if scope_ids is not None:
+                    scope_ids.remove(old_id)
+                    if not scope_ids:
+                        del self._scope_ids[old.scope]
+                self._scope_matrix.pop(old.scope, None)
+        metrics.inc("semantic_cache_stores_total")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "scopes": len(self._scope_ids),
+                "version": self._version,
+                "threshold": self.threshold,
+                "min_overlap": self.min_overlap,
+            }
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Globaler Cache (Singleton, Parameter aus Settings)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = SemanticCache(
+                    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                    min_overlap=settings.SEMANTIC_CACHE_MIN_OVERLAP,
+                    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+    return _cache
@@ -0,0 +1,137 @@
+"""
+Chat-Sessions: serverseitiger Gesprächsverlauf + pro Session gecachte Retrieval-Treffer.
+In-Memory, begrenzt (SESSION_MAX, LRU) mit TTL-Eviction (SESSION_TTL_SECONDS).
+Chunk-Pool wächst nur hinten an → Kontext bleibt über Turns ein stabiler Prompt-Präfix.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+
+@dataclass
+class PooledChunk:
+    chunk_id: str
+    document: str
+    metadata: dict
+    distance: Optional[float]
+
+
+@dataclass
+class Session:
+    id: str
+    doc_id: Optional[str]
+    language: str
+    created_at: float
+    last_used: float
+    turns: List[Turn] = field(default_factory=list)
+    chunks: "OrderedDict[str, PooledChunk]" = field(default_factory=OrderedDict)
+    # Embedding der letzten Chroma-Abfrage + deren Treffer (für Wiederverwendung bei Folgefragen)
+    last_query_embedding: Optional[np.ndarray] = None
+    last_hit_ids: List[str] = field(default_factory=list)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def add_chunks(self, ids: list, documents: list, metadatas: list, distances: list, max_chunks: int) -> int:
+        """Neue Treffer hinten anhängen (bekannte nur aktualisieren); älteste fallen bei Überlauf raus.
+        Liefert die Anzahl neu aufgenommener Chunks."""
+        added = 0
+        for cid, doc, meta, dist in zip(ids, documents, metadatas or [None] * len(ids), distances or [None] * len(ids)):
+            if cid in self.chunks:
+                self.chunks[cid].distance = dist
+                continue
+            self.chunks[cid] = PooledChunk(cid, doc if isinstance(doc, str) else str(doc), meta or {}, dist)
+            added += 1
+        while len(self.chunks) > max_chunks:
+            self.chunks.popitem(last=False)
+        return added
+
+    def hits(self) -> List[PooledChunk]:
+        """Treffer der letzten Abfrage (für Citations), soweit noch im Pool."""
+        return [self.chunks[cid] for cid in self.last_hit_ids if cid in self.chunks]
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int, ttl_seconds: float) -> None:
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl_seconds]
+        for sid in expired:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def create(self, doc_id: Optional[str], language: str) -> Session:
+        now = time.monotonic()
+        session = Session(id=uuid.uuid4().hex, doc_id=doc_id, language=language, created_at=now, last_used=now)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(now)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expires_in(self, session: Session) -> int:
+        return max(0, int(self.ttl_seconds - (time.monotonic() - session.last_used)))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+def condense_history(turns: List[Turn], max_chars: int, max_answer_chars: int = 400) -> str:
+    """Verlauf für den nächsten Prompt: neueste Turns zuerst ins Budget, dann chronologisch.
+    Lange Antworten werden gekürzt."""
+    lines: List[str] = []
+    used = 0
+    for turn in reversed(turns):
+        answer = turn.answer if len(turn.answer) <= max_answer_chars else turn.answer[:max_answer_chars] + " …"
+        entry = f"Frage: {turn.question}\nAntwort: {answer}"
+        if used + len(entry) > max_chars:
+            break
+        lines.append(entry)
+        used += len(entry) + 1
+    return "\n".join(reversed(lines))
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                settings = get_settings()
+                _store = SessionStore(settings.SESSION_MAX, settings.SESSION_TTL_SECONDS)
+    return _store
+
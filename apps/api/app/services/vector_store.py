@@ -1,39 +1,135 @@
 """
 Chroma Vector-Store: Verbindung, Collection, Upsert, Query, Delete.
-Nutzt chromadb HttpClient (Docker: chroma:8000, lokal: 127.0.0.1:8001).
+Nutzt chromadb HttpClient (Docker: chroma:8000, lokal: 127.0.0.1:8001);
+mit CHROMA_MODE=persistent/ephemeral eingebettet im API-Prozess (ohne Server).
 """
+import functools
 import logging
 import threading
+import time
 from typing import List, Optional, Any
 
 from app.core.config import settings
+from app.services import circuit_breaker, metrics
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.index_state import active_collection, active_embedding_model
 
 logger = logging.getLogger(__name__)
 
+_breaker: Optional[circuit_breaker.CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_chroma_breaker() -> circuit_breaker.CircuitBreaker:
+    """Circuit Breaker für alle Chroma-Zugriffe (Singleton, in /health/deps und /metrics)."""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = circuit_breaker.register(
+                    circuit_breaker.from_settings("chroma", settings.CHROMA_BREAKER_SLOW_SECONDS)
+                )
+    return _breaker
+
+
+def _guarded(timed: bool = True):
+    """Chroma-Aufruf über den Breaker: offen → CircuitOpenError ohne Chroma-Kontakt.
+    timed=False: Dauer nicht bewerten (Schreibzugriffe dauern mit der Chunk-Anzahl legitim länger)."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_chroma_breaker().guard(timed=timed):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 _client = None
+_client_lock = threading.Lock()
 
 
 def get_chroma_client():
-    """Chroma HTTP-Client (Singleton)."""
+    """Chroma-Client (Singleton) je nach CHROMA_MODE. Mit Lock: eingebettete Clients dürfen nicht
+    parallel aus mehreren Threads angelegt werden (Health-Check, Katalog-Abgleich beim Start)."""
     global _client
     if _client is None:
-        import chromadb
-        _client = chromadb.HttpClient(
-            host=settings.CHROMA_HOST,
-            port=settings.CHROMA_PORT,
-        )
+        with _client_lock:
+            if _client is None:
+                import chromadb
+                if settings.CHROMA_MODE == "ephemeral":
+                    _client = chromadb.EphemeralClient()
+                elif settings.CHROMA_MODE == "persistent":
+                    _client = chromadb.PersistentClient(path=settings.CHROMA_PATH)
+                else:
+                    _client = chromadb.HttpClient(
+                        host=settings.CHROMA_HOST,
+                        port=settings.CHROMA_PORT,
+                    )
     return _client
 
 
-def get_collection():
-    """Collection für RAG (pdf_chatbot) holen oder anlegen."""
+INDEX_KEYS = ("hnsw:space", "hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+
+
+def collection_metadata(embedding_model: Optional[str] = None) -> dict:
+    """Metadaten für neue Collections inkl. HNSW-Parameter aus den Settings und Embedding-Modell
+    (Default: aktiver Index). Chroma übernimmt sie nur beim Anlegen; bestehende Collections behalten
+    ihre Werte (→ app.tools.migrate_collection)."""
+    return {
+        "description": "PDF chunks for RAG",
+        "embedding_model": embedding_model or active_embedding_model(),
+        "hnsw:space": settings.CHROMA_SPACE,
+        "hnsw:M": settings.CHROMA_HNSW_M,
+        "hnsw:construction_ef": settings.CHROMA_HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": settings.CHROMA_HNSW_SEARCH_EF,
+    }
+
+
+def index_params(coll) -> dict:
+    """HNSW-Parameter einer vorhandenen Collection. Chroma ≥ 1.0: aus der Konfiguration (spiegelt auch
+    nachträgliche Änderungen), sonst aus den Metadaten; fehlende Keys = Defaults der installierten
+    Chroma-Version (HnswParams; search_ef ist z. B. 10 in 0.4.x, 100 ab 1.0)."""
+    hnsw = (getattr(coll, "configuration", None) or {}).get("hnsw")
+    if hnsw:
+        return {
+            "hnsw:space": hnsw.get("space"),
+            "hnsw:M": hnsw.get("max_neighbors"),
+            "hnsw:construction_ef": hnsw.get("ef_construction"),
+            "hnsw:search_ef": hnsw.get("ef_search"),
+        }
+    meta = coll.metadata or {}
+    return {key: meta.get(key, value) for key, value in _chroma_hnsw_defaults().items()}
+
+
+def _chroma_hnsw_defaults() -> dict:
+    try:
+        from chromadb.segment.impl.vector.hnsw_params import HnswParams
+
+        params = HnswParams({})
+        return {
+            "hnsw:space": params.space,
+            "hnsw:M": params.M,
+            "hnsw:construction_ef": params.construction_ef,
+            "hnsw:search_ef": params.search_ef,
+        }
+    except Exception:
+        # Modul intern/verschoben: Defaults von chromadb 1.x
+        return {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 100}
+
+
+def get_collection(name: Optional[str] = None):
+    """Collection für RAG (Default: aktiver Index, anfangs CHROMA_COLLECTION) holen oder anlegen."""
     client = get_chroma_client()
     return client.get_or_create_collection(
-        name=settings.CHROMA_COLLECTION,
-        metadata={"description": "PDF chunks for RAG"},
+        name=name or active_collection(),
+        metadata=collection_metadata(),
     )
 
 
+@_guarded(timed=False)
 def add_chunks(
     doc_id: str,
     filename: str,
@@ -53,22 +149,41 @@ def add_chunks(
     logger.info("Ingested doc_id=%s filename=%s chunks=%d", doc_id, filename, len(ids))
 
 
+@_guarded()
 def query_chunks(
     query_embedding: List[float],
     n_results: int,
     doc_id: Optional[str] = None,
+    collection: Optional[str] = None,
 ) -> dict:
     """
-    Ähnliche Chunks abfragen.
+    Ähnliche Chunks abfragen (Default: aktiver Index); ohne doc_id zweistufig über Dokument-Zentroide
+    (app.services.doc_centroids, Fallback auf die volle Suche).
     Returns: {"ids": [...], "documents": [...], "metadatas": [...], "distances": [...]}
     """
-    coll = get_collection()
-    where = {"doc_id": doc_id} if doc_id else None
+    coll = get_collection(collection)
+    if doc_id:
+        return _query_one(coll, query_embedding, n_results, where={"doc_id": doc_id})
+    # Ohne doc_id: erst die passendsten Dokumente über ihre Zentroide, dann nur deren Chunks
+    from app.services import doc_centroids
+
+    docs = doc_centroids.route(coll.name, query_embedding)
+    if docs:
+        out = _query_one(coll, query_embedding, n_results, **doc_centroids.chunk_filter(coll.name, docs))
+        if len(out["ids"]) >= n_results:
+            metrics.inc("rag_routing_routed_total")
+            return out
+        metrics.inc("rag_routing_fallback_total")
+    return _query_one(coll, query_embedding, n_results)
+
+
+def _query_one(coll, query_embedding: List[float], n_results: int, **restrict: Any) -> dict:
+    """Eine Query; restrict: where=... bzw. ids=... (Stufe 2 des Routings)."""
     result = coll.query(
         query_embeddings=[query_embedding],
         n_results=n_results,
-        where=where,
         include=["documents", "metadatas", "distances"],
+        **restrict,
     )
     # chromadb liefert Listen pro Key; wir haben eine Query
     out = {
@@ -80,21 +195,87 @@ def query_chunks(
     return out
 
 
+@_guarded()
+def query_chunks_batch(
+    query_embeddings: List[List[float]],
+    n_results: int,
+    doc_id: Optional[str] = None,
+) -> List[dict]:
+    """
+    Wie query_chunks, aber für viele Queries in einem Chroma-Aufruf (ein HTTP-Roundtrip), ohne Routing.
+    Returns: pro Query ein Dict {"ids", "documents", "metadatas", "distances"} (gleiche Reihenfolge).
+    """
+    if not query_embeddings:
+        return []
+    coll = get_collection()
+    where = {"doc_id": doc_id} if doc_id else None
+    result = coll.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    out = []
+    for i in range(len(query_embeddings)):
+        out.append({
+            key: (result[key][i] if result.get(key) and i < len(result[key]) else [])
+            for key in ("ids", "documents", "metadatas", "distances")
+        })
+    return out
+
+
+@_guarded(timed=False)
+def delete_ids(ids: List[str], batch_size: int = 500, collection: Optional[str] = None) -> int:
+    """Chunks per expliziter ID löschen (in Batches, kein Metadaten-Scan). Unbekannte IDs werden ignoriert."""
+    if not ids:
+        return 0
+    coll = get_collection(collection)
+    step = max(1, batch_size)
+    for start in range(0, len(ids), step):
+        coll.delete(ids=ids[start:start + step])
+    return len(ids)
+
+
+def iter_chunk_metadata(batch_size: int = 1000):
+    """(chunk_id, metadata) aller Chunks der Collection, seitenweise (für den Katalog-Rebuild)."""
+    coll = get_collection()
+    offset = 0
+    while True:
+        page = coll.get(include=["metadatas"], limit=batch_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        yield from zip(ids, page.get("metadatas") or [{}] * len(ids))
+        offset += len(ids)
+
+
+@_guarded(timed=False)
 def delete_by_doc_id(doc_id: str) -> None:
-    """Alle Chunks mit doc_id löschen."""
+    """Alle Chunks mit doc_id löschen (where-Scan; für Dokumente ohne Katalogeintrag)."""
     coll = get_collection()
     coll.delete(where={"doc_id": doc_id})
     logger.info("Deleted doc_id=%s", doc_id)
 
 
+@_guarded()
 def collection_count() -> int:
     """Anzahl Einträge in der Collection (für Health/Admin)."""
     coll = get_collection()
     return coll.count()
 
 
-def chroma_reachable(timeout_seconds: float = 5.0) -> bool:
-    """Prüft, ob Chroma erreichbar ist (für /health/deps). Mit Timeout, damit die API nicht hängt."""
+def chroma_reachable(timeout_seconds: Optional[float] = None, raise_if_open: bool = False) -> bool:
+    """Prüft, ob Chroma erreichbar ist (für /health/deps und vor Chroma-Zugriffen). Mit Timeout
+    (CHROMA_CHECK_TIMEOUT_SECONDS), damit die API nicht hängt. Breaker offen → sofort False bzw.
+    CircuitOpenError (raise_if_open, für 503 + Retry-After); das Ergebnis zählt für den Breaker."""
+    breaker = get_chroma_breaker()
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        if raise_if_open:
+            raise
+        return False
+    timeout = settings.CHROMA_CHECK_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
     result = [False]
 
     def _check():
@@ -108,7 +289,12 @@ def chroma_reachable(timeout_seconds: float = 5.0) -> bool:
         except Exception as e:
             logger.debug("Chroma check failed: %s", e)
 
+    t0 = time.monotonic()
     t = threading.Thread(target=_check, daemon=True)
     t.start()
-    t.join(timeout=timeout_seconds)
+    t.join(timeout=timeout)
+    if result[0]:
+        breaker.record_success(time.monotonic() - t0)
+    else:
+        breaker.record_failure("unreachable" if not t.is_alive() else "check timeout")
     return result[0]
@@ -0,0 +1 @@
+"""Kommandozeilen-Werkzeuge für den Betrieb (python -m app.tools.<name>)."""
@@ -0,0 +1,134 @@
+"""
+Chroma-Collection unter neuen Index-Parametern (CHROMA_SPACE, CHROMA_HNSW_*) neu aufbauen –
+ohne Re-Embedding: gespeicherte Vektoren, Dokumente und Metadaten werden seitenweise in eine
+neue Collection kopiert, danach werden die Namen getauscht.
+
+Ablauf:
+  1) Vergleich Ist/Soll (auch search_ef: Chroma übernimmt ihn nur beim Anlegen des Index –
+     collection.modify ändert zwar die Konfiguration, ein geladener Index sucht aber weiter mit dem alten Wert)
+  2) Kopie nach <name>__migrate (HNSW-Graph wird mit den neuen Parametern gebaut)
+  3) Anzahl prüfen, <name> → <name>__old_<zeit>, <name>__migrate → <name>
+  4) Alte Collection löschen (außer --keep-old)
+Während der Migration keine Ingests/Deletes ausführen (die Kopie ist ein Schnappschuss);
+Chat-Anfragen laufen bis zum Tausch auf der alten Collection weiter.
+
+Verwendung:
+  python -m app.tools.migrate_collection --check
+  python -m app.tools.migrate_collection [--collection pdf_chatbot] [--batch 1000] [--keep-old]   # Default: aktiver Index
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import Optional
+
+from app.services.index_state import active_collection
+from app.services.vector_store import INDEX_KEYS, collection_metadata, get_chroma_client, index_params
+
+logger = logging.getLogger(__name__)
+
+
+def _target_params() -> dict:
+    meta = collection_metadata()
+    return {key: meta[key] for key in INDEX_KEYS}
+
+
+def copy_collection(src, dst, batch_size: int = 1000) -> int:
+    """Alle Einträge von src nach dst kopieren (Vektoren unverändert); liefert die Anzahl."""
+    total = src.count()
+    copied = 0
+    t0 = time.perf_counter()
+    while True:
+        page = src.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=copied)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        dst.add(
+            ids=ids,
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+        )
+        copied += len(ids)
+        rate = copied / max(time.perf_counter() - t0, 1e-9)
+        print(f"  {copied}/{total} kopiert ({rate:.0f}/s)", flush=True)
+    return copied
+
+
+def swap_in(client, name: str, new_coll, keep_old: bool = False) -> Optional[str]:
+    """new_coll unter `name` aktiv schalten. Eine vorhandene Collection wird zu <name>__old_<zeit> und
+    danach gelöscht (außer keep_old). Liefert deren Namen (None, wenn es keine gab)."""
+    old_name = None
+    try:
+        src = client.get_collection(name)
+    except Exception:
+        src = None
+    if src is not None:
+        old_name = f"{name}__old_{time.strftime('%Y%m%d%H%M%S')}"
+        src.modify(name=old_name)
+    try:
+        new_coll.modify(name=name)
+    except Exception:
+        # Zwischen den Umbenennungen kann get_or_create eine leere Collection <name> angelegt haben
+        stray = client.get_collection(name)
+        if stray.count():
+            raise
+        client.delete_collection(name)
+        new_coll.modify(name=name)
+    if old_name:
+        logger.info("Collection %s ersetzt, alte Collection: %s", name, old_name)
+        if not keep_old:
+            client.delete_collection(old_name)
+    return old_name
+
+
+def migrate(name: str, batch_size: int = 1000, keep_old: bool = False) -> str:
+    """Migration ausführen; Rückgabe: "unchanged" | "rebuilt"."""
+    client = get_chroma_client()
+    src = client.get_collection(name)
+    current = index_params(src)
+    target = _target_params()
+    if current == target:
+        return "unchanged"
+
+    tmp_name = f"{name}__migrate"
+    try:
+        client.delete_collection(tmp_name)  # Rest eines abgebrochenen Laufs
+    except Exception:
+        pass
+    extra = {k: v for k, v in (src.metadata or {}).items() if not k.startswith("hnsw:")}
+    dst = client.create_collection(tmp_name, metadata={**collection_metadata(), **extra})
+    copied = copy_collection(src, dst, batch_size)
+    if dst.count() != src.count():
+        raise RuntimeError(f"Anzahl weicht ab: {name}={src.count()} {tmp_name}={dst.count()} – nichts getauscht")
+
+    swap_in(client, name, dst, keep_old=keep_old)
+    logger.info("Collection %s neu aufgebaut (%d Einträge)", name, copied)
+    return "rebuilt"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=None, help="Default: aktiver Index")
+    parser.add_argument("--batch", type=int, default=1000, help="Einträge pro get/add")
+    parser.add_argument("--keep-old", action="store_true", help="Alte Collection als <name>__old_<zeit> behalten")
+    parser.add_argument("--check", action="store_true", help="Nur Ist/Soll anzeigen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    args.collection = args.collection or active_collection()
+
+    src = get_chroma_client().get_collection(args.collection)
+    current = index_params(src)
+    target = _target_params()
+    print(f"Collection {args.collection}: {src.count()} Einträge")
+    for key in INDEX_KEYS:
+        marker = "" if current[key] == target[key] else "  ← abweichend"
+        print(f"  {key:<22} ist {current[key]!s:<8} soll {target[key]!s:<8}{marker}")
+    if args.check:
+        sys.exit(0 if current == target else 1)
+    result = migrate(args.collection, batch_size=args.batch, keep_old=args.keep_old)
+    print("Nichts zu tun." if result == "unchanged" else "Neu aufgebaut.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Snapshot einer Chroma-Collection exportieren/importieren – neue API-/Vector-Store-Knoten ohne
+Re-Ingest (keine PDF-Extraktion, kein Embedding) und ohne Kopie von storage/chroma im Offline-Zustand.
+
+Dateiformat (Version 1, little-endian):
+  [0:64)      Präambel: Magic b"RAGSNAP\\0", uint32 Formatversion, Rest Nullen
+  [64:…)      Embeddings: float32, count × dim, ein zusammenhängender Block (→ np.memmap)
+  […:…)       Records: zlib-komprimiertes JSONL, je Zeile {"id", "document", "metadata"} in Embedding-Reihenfolge
+  Footer      JSON: count, dim, Offsets/Längen und SHA-256 beider Abschnitte, Index-Parameter,
+              Embedding-Modell, Quell-Collection, Zeitpunkt
+  Trailer     uint64 Footer-Länge + b"RAGSEND\\0"
+Der Export schreibt seitenweise (Embeddings direkt, Records in eine Temp-Datei, die am Ende angehängt
+wird) und benennt die Datei erst nach Abschluss um. Der Import liest die Embeddings per memmap (oder
+blockweise mit --no-mmap), schreibt in Batches nach <name>__import und schaltet danach per
+Umbenennung um (wie migrate_collection); der Dokumentkatalog wird aus den Snapshot-Metadaten neu aufgebaut.
+Während des Exports keine Ingests/Deletes ausführen (die Anzahl wird am Ende geprüft).
+
+Verwendung:
+  python -m app.tools.snapshot export snapshots/pdf_chatbot.snap [--collection pdf_chatbot] [--batch 5000]
+  python -m app.tools.snapshot info snapshots/pdf_chatbot.snap [--verify]
+  python -m app.tools.snapshot import snapshots/pdf_chatbot.snap [--collection pdf_chatbot] [--replace] [--keep-old]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import sys
+import time
+import zlib
+from typing import Iterator, Optional
+
+import numpy as np
+
+from app.services.index_state import active_collection, active_embedding_model
+from app.services.vector_store import collection_metadata, get_chroma_client, index_params
+from app.tools.migrate_collection import swap_in
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGSNAP\0"
+END_MAGIC = b"RAGSEND\0"
+FORMAT_VERSION = 1
+DATA_OFFSET = 64
+_PREAMBLE = struct.Struct("<8sI")
+_TRAILER = struct.Struct("<Q8s")
+_DTYPE = np.dtype("<f4")
+_READ_CHUNK = 8 * 1024 * 1024
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+def _progress(label: str, done: int, total: int, t0: float) -> None:
+    rate = done / max(time.perf_counter() - t0, 1e-9)
+    print(f"  {label}: {done}/{total} ({rate:.0f}/s)", flush=True)
+
+
+def export_snapshot(path: str, collection: Optional[str] = None, batch_size: int = 5000) -> dict:
+    """Collection seitenweise nach `path` schreiben; liefert den Footer."""
+    name = collection or active_collection()
+    coll = get_chroma_client().get_collection(name)
+    total = coll.count()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path, records_path = f"{path}.tmp", f"{path}.records.tmp"
+    emb_hash, rec_hash = hashlib.sha256(), hashlib.sha256()
+    compressor = zlib.compressobj(6)
+    count, dim, rec_bytes = 0, None, 0
+    t0 = time.perf_counter()
+    try:
+        with open(tmp_path, "wb") as out, open(records_path, "wb") as rec:
+            out.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION).ljust(DATA_OFFSET, b"\0"))
+            while True:
+                page = coll.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=count)
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                emb = np.ascontiguousarray(page["embeddings"], dtype=_DTYPE)
+                if dim is None:
+                    dim = emb.shape[1]
+                if emb.shape != (len(ids), dim):
+                    raise SnapshotError(f"Unerwartete Embedding-Form {emb.shape} (dim {dim})")
+                buf = emb.tobytes()
+                out.write(buf)
+                emb_hash.update(buf)
+                documents = page.get("documents") or [None] * len(ids)
+                metadatas = page.get("metadatas") or [None] * len(ids)
+                lines = "".join(
+                    json.dumps({"id": i, "document": d, "metadata": m}, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    for i, d, m in zip(ids, documents, metadatas)
+                )
+                block = compressor.compress(lines.encode("utf-8"))
+                rec.write(block)
+                rec_hash.update(block)
+                rec_bytes += len(block)
+                count += len(ids)
+                _progress("exportiert", count, total, t0)
+            block = compressor.flush()
+            rec.write(block)
+            rec_hash.update(block)
+            rec_bytes += len(block)
+            rec.close()
+
+            if coll.count() != count:
+                raise SnapshotError(f"Collection während des Exports verändert ({total} → {coll.count()}, gelesen {count})")
+            emb_bytes = out.tell() - DATA_OFFSET
+            with open(records_path, "rb") as rec_in:
+                shutil.copyfileobj(rec_in, out, _READ_CHUNK)
+            footer = {
+                "format_version": FORMAT_VERSION,
+                "collection": name,
+                "count": count,
+                "dim": dim or 0,
+                "dtype": "float32",
+                "embeddings": {"offset": DATA_OFFSET, "bytes": emb_bytes, "sha256": emb_hash.hexdigest()},
+                "records": {
+                    "offset": DATA_OFFSET + emb_bytes,
+                    "bytes": rec_bytes,
+                    "sha256": rec_hash.hexdigest(),
+                    "encoding": "jsonl+zlib",
+                },
+                "index": index_params(coll),
+                "collection_metadata": {k: v for k, v in (coll.metadata or {}).items() if not k.startswith("hnsw:")},
+                "embedding_model": (coll.metadata or {}).get("embedding_model") or active_embedding_model(),
+                "created_at": time.time(),
+            }
+            raw = json.dumps(footer, ensure_ascii=False).encode("utf-8")
+            out.write(raw)
+            out.write(_TRAILER.pack(len(raw), END_MAGIC))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        for leftover in (tmp_path, records_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    logger.info("Snapshot %s geschrieben: %d Einträge, dim %s, %.1fs", path, count, dim, time.perf_counter() - t0)
+    return footer
+
+
+class Snapshot:
+    """Lesezugriff auf eine Snapshot-Datei (Footer, Embeddings per memmap oder blockweise, Records gestreamt)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            magic, version = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise SnapshotError(f"{path}: keine Snapshot-Datei")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"{path}: Formatversion {version} nicht unterstützt (erwartet {FORMAT_VERSION})")
+            f.seek(size - _TRAILER.size)
+            footer_len, end_magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if end_magic != END_MAGIC:
+                raise SnapshotError(f"{path}: Trailer fehlt (Datei unvollständig?)")
+            f.seek(size - _TRAILER.size - footer_len)
+            self.footer = json.loads(f.read(footer_len))
+        self.count = int(self.footer["count"])
+        self.dim = int(self.footer["dim"])
+
+    def embeddings(self) -> np.ndarray:
+        """Alle Embeddings als schreibgeschützte memmap (count × dim) – lädt nur, was gelesen wird."""
+        if not self.count:
+            return np.empty((0, self.dim), dtype=_DTYPE)
+        return np.memmap(
+            self.path, dtype=_DTYPE, mode="r", offset=self.footer["embeddings"]["offset"], shape=(self.count, self.dim)
+        )
+
+    def iter_embedding_batches(self, batch_size: int, mmap: bool = True) -> Iterator[np.ndarray]:
+        if mmap:
+            emb = self.embeddings()
+            for start in range(0, self.count, batch_size):
+                yield emb[start:start + batch_size]
+            return
+        row_bytes = self.dim * _DTYPE.itemsize
+        with open(self.path, "rb") as f:
+            f.seek(self.footer["embeddings"]["offset"])
+            for start in range(0, self.count, batch_size):
+                n = min(batch_size, self.count - start)
+                yield np.frombuffer(f.read(n * row_bytes), dtype=_DTYPE).reshape(n, self.dim)
+
+    def iter_records(self) -> Iterator[dict]:
+        section = self.footer["records"]
+        decompressor = zlib.decompressobj()
+        rest = b""
+        with open(self.path, "rb") as f:
+            f.seek(section["offset"])
+            remaining = section["bytes"]
+            while remaining:
+                raw = f.read(min(_READ_CHUNK, remaining))
+                if not raw:
+                    raise SnapshotError(f"{self.path}: Records-Abschnitt abgeschnitten")
+                remaining -= len(raw)
+                lines = (rest + decompressor.decompress(raw)).split(b"\n")
+                rest = lines.pop()
+                for line in lines:
+                    yield json.loads(line)
+            rest += decompressor.flush()
+        if rest.strip():
+            yield json.loads(rest)
+
+    def verify(self) -> None:
+        """SHA-256 beider Abschnitte prüfen (liest die Datei einmal sequentiell)."""
+        with open(self.path, "rb") as f:
+            for key in ("embeddings", "records"):
+                section = self.footer[key]
+                digest = hashlib.sha256()
+                f.seek(section["offset"])
+                remaining = section["bytes"]
+                while remaining:
+                    raw = f.read(min(_READ_CHUNK, remaining))
+                    if not raw:
+                        break
+                    digest.update(raw)
+                    remaining -= len(raw)
+                if remaining or digest.hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"{self.path}: Prüfsumme {key} stimmt nicht")
+        if self.footer["embeddings"]["bytes"] != self.count * self.dim * _DTYPE.itemsize:
+            raise SnapshotError(f"{self.path}: Embedding-Block passt nicht zu count × dim")
+
+
+def import_snapshot(
+    path: str,
+    collection: Optional[str] = None,
+    batch_size: int = 5000,
+    replace: bool = False,
+    keep_old: bool = False,
+    verify: bool = True,
+    mmap: bool = True,
+    allow_model_mismatch: bool = False,
+) -> int:
+    """Snapshot in die Collection laden (über <name>__import + Umbenennung); liefert die Anzahl Einträge."""
+    from app.services.doc_catalog import get_doc_catalog
+    from app.services.doc_centroids import drop_centroids, sync_centroids
+
+    snap = Snapshot(path)
+    if verify:
+        snap.verify()
+    model = snap.footer.get("embedding_model")
+    if model != active_embedding_model() and not allow_model_mismatch:
+        raise SnapshotError(
+            f"Snapshot mit {model} erzeugt, aktiver Index nutzt {active_embedding_model()} – Query-Embeddings wären inkompatibel"
+        )
+    name = collection or active_collection()
+    client = get_chroma_client()
+    try:
+        existing = client.get_collection(name).count()
+    except Exception:
+        existing = 0
+    if existing and not replace:
+        raise SnapshotError(f"Collection {name} enthält bereits {existing} Einträge (--replace zum Ersetzen)")
+
+    tmp_name = f"{name}__import"
+    try:
+        client.delete_collection(tmp_name)  # Rest eines abgebrochenen Laufs
+    except Exception:
+        pass
+    dst = client.create_collection(tmp_name, metadata={**collection_metadata(), **snap.footer.get("collection_metadata", {})})
+    if hasattr(client, "get_max_batch_size"):
+        batch_size = min(batch_size, client.get_max_batch_size())
+
+    t0 = time.perf_counter()
+    records = snap.iter_records()
+    done = 0
+    for emb in snap.iter_embedding_batches(batch_size, mmap=mmap):
+        batch = [next(records) for _ in range(len(emb))]
+        dst.upsert(
+            ids=[r["id"] for r in batch],
+            embeddings=emb,
+            documents=[r["document"] for r in batch],
+            metadatas=[r["metadata"] or None for r in batch],
+        )
+        done += len(batch)
+        _progress("importiert", done, snap.count, t0)
+    if dst.count() != snap.count:
+        raise SnapshotError(f"Anzahl weicht ab: Snapshot {snap.count}, {tmp_name} {dst.count()} – nichts getauscht")
+
+    swap_in(client, name, dst, keep_old=keep_old)
+    docs = get_doc_catalog().rebuild(name, ((r["id"], r["metadata"]) for r in snap.iter_records()))
+    drop_centroids(name)  # Zentroide des ersetzten Bestands
+    sync_centroids(name)
+    logger.info(
+        "Snapshot %s nach %s importiert: %d Einträge, %d Dokumente, %.1fs", path, name, done, docs, time.perf_counter() - t0
+    )
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="Collection in eine Snapshot-Datei schreiben")
+    exp.add_argument("path")
+    exp.add_argument("--collection", default=None, help="Default: aktiver Index")
+    exp.add_argument("--batch", type=int, default=5000, help="Einträge pro get")
+    info = sub.add_parser("info", help="Footer anzeigen")
+    info.add_argument("path")
+    info.add_argument("--verify", action="store_true", help="Prüfsummen prüfen")
+    imp = sub.add_parser("import", help="Snapshot in die Collection laden")
+    imp.add_argument("path")
+    imp.add_argument("--collection", default=None, help="Default: aktiver Index")
+    imp.add_argument("--batch", type=int, default=5000, help="Einträge pro upsert (höchstens Chromas max_batch_size)")
+    imp.add_argument("--replace", action="store_true", help="Nicht leere Collection ersetzen")
+    imp.add_argument("--keep-old", action="store_true", help="Ersetzte Collection als <name>__old_<zeit> behalten")
+    imp.add_argument("--no-verify", action="store_true", help="Prüfsummen nicht vorab prüfen")
+    imp.add_argument("--no-mmap", action="store_true", help="Embeddings blockweise lesen statt per memmap")
+    imp.add_argument("--allow-model-mismatch", action="store_true", help="Abweichendes EMBEDDING_MODEL zulassen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    try:
+        if args.command == "export":
+            footer = export_snapshot(args.path, args.collection, batch_size=args.batch)
+            print(f"{args.path}: {footer['count']} Einträge, dim {footer['dim']}, {os.path.getsize(args.path) / 1e6:.1f} MB")
+        elif args.command == "info":
+            snap = Snapshot(args.path)
+            if args.verify:
+                snap.verify()
+                print("Prüfsummen OK")
+            print(json.dumps(snap.footer, indent=2, ensure_ascii=False))
+        else:
+            import_snapshot(
+                args.path,
+                args.collection,
+                batch_size=args.batch,
+                replace=args.replace,
+                keep_old=args.keep_old,
+                verify=not args.no_verify,
+                mmap=not args.no_mmap,
+                allow_model_mismatch=args.allow_model_mismatch,
+            )
+    except SnapshotError as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,64 @@
 """Einfaches Text-Chunking (ohne LangChain)."""
-from typing import List
+import re
+from typing import List, Tuple
 
 
-def chunk_text(
+def chunk_spans(
     text: str,
     chunk_size: int = 1000,
     overlap: int = 200,
-) -> List[str]:
-    """Teilt Text in überlappende Chunks. Leere Chunks werden ausgelassen."""
+) -> List[Tuple[int, int]]:
+    """Grenzen (start, end) der Chunks im Originaltext: text[start:end] == chunk_text(...)[i].
+    So lassen sich Chunks aus gespeichertem Seitentext ohne Kopie des Chunk-Texts rekonstruieren."""
     if not text or not text.strip():
         return []
-    text = text.strip()
-    if len(text) <= chunk_size:
-        return [text] if text else []
-    chunks: List[str] = []
+    lead = len(text) - len(text.lstrip())
+    stripped = text.strip()
+    if len(stripped) <= chunk_size:
+        return [(lead, lead + len(stripped))]
+    spans: List[Tuple[int, int]] = []
     start = 0
-    while start < len(text):
+    while start < len(stripped):
         end = start + chunk_size
-        chunk = text[start:end]
+        chunk = stripped[start:end]
+        if chunk.strip():
+            inner = len(chunk) - len(chunk.lstrip())
+            spans.append((lead + start + inner, lead + start + len(chunk.rstrip())))
         # Überlappung: nächster Start geht zurück
         start = end - overlap
-        if chunk.strip():
-            chunks.append(chunk.strip())
-    return chunks
+    return spans
+
+
+def chunk_text(
+    text: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+) -> List[str]:
+    """Teilt Text in überlappende Chunks. Leere Chunks werden ausgelassen."""
+    return [text[s:e] for s, e in chunk_spans(text, chunk_size=chunk_size, overlap=overlap)]
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…:;])[\"'»“”)\]]*\s+(?=[\"'„«(\[]?[A-ZÄÖÜ0-9•\-–])|\n\s*\n|\n(?=\s*[-•–*]\s)")
+
+
+def sentence_spans(text: str, min_chars: int = 30) -> List[Tuple[int, int]]:
+    """Satzgrenzen (start, end) per Regex (Satzzeichen + Großbuchstabe/Ziffer/Aufzählung, Leerzeilen,
+    Aufzählungszeilen);
+    ohne NLTK, schnell genug für den Chat-Pfad. Bruchstücke unter min_chars hängen am Vorgängersatz."""
+    spans: List[Tuple[int, int]] = []
+    pos = 0
+    for match in list(_SENTENCE_END.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        part = text[pos:end]
+        if part.strip():
+            start = pos + len(part) - len(part.lstrip())
+            stop = pos + len(part.rstrip())
+            if spans and stop - start < min_chars:
+                spans[-1] = (spans[-1][0], stop)
+            else:
+                spans.append((start, stop))
+        pos = match.end() if match else len(text)
+    if len(spans) > 1 and spans[0][1] - spans[0][0] < min_chars:
+        spans[1] = (spans[0][0], spans[1][1])
+        del spans[0]
+    return spans
@@ -0,0 +1,185 @@
+"""
+Streaming-Hilfen für den Token-Pfad (llama.cpp SSE → NDJSON an den Client).
+- SSELineParser: inkrementell, zeilenbasiert auf Bytes (kein quadratisches `buffer +=`)
+- json_loads / ndjson_line / ndjson_token: schnelles (de)serialisieren, orjson falls installiert
+- coalesce: Tokens zeit-/größenbasiert zu weniger Writes bündeln
+- JSONFieldParser: Felder eines gestreamten JSON-Objekts liefern, sobald sie vollständig sind
+"""
+import asyncio
+import json
+import time
+from json.encoder import encode_basestring
+from typing import AsyncIterator, List, Optional, Tuple
+
+try:  # optional: deutlich schneller als json (C-Extension)
+    import orjson
+except ImportError:  # pragma: no cover - Fallback ohne orjson
+    orjson = None
+
+if orjson is not None:
+    json_loads = orjson.loads
+
+    def ndjson_line(obj: dict) -> str:
+        """Ein NDJSON-Event (kompakt, UTF-8)."""
+        return orjson.dumps(obj).decode("utf-8") + "\n"
+else:
+    json_loads = json.loads
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def ndjson_line(obj: dict) -> str:
+        """Ein NDJSON-Event (kompakt, UTF-8)."""
+        return _encoder.encode(obj) + "\n"
+
+
+def ndjson_token(content: str) -> str:
+    """Hot-Path: Token-Event ohne Dict + generischen Encoder (nur String-Escaping)."""
+    return '{"type":"token","content":' + encode_basestring(content) + "}\n"
+
+
+class SSELineParser:
+    """Zerlegt einen Byte-Stream in SSE-Payloads ("data: ..." bzw. rohe NDJSON-Zeilen).
+    Bereits durchsuchte Bytes werden nicht erneut gescannt; verarbeitete Zeilen werden
+    gesammelt abgeschnitten (ein `del` pro feed statt pro Zeile)."""
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Neue Bytes anhängen; liefert alle vollständigen, nicht leeren Payloads."""
+        buf = self._buf
+        scan_from = len(buf)
+        buf += data
+        out: List[bytes] = []
+        start = 0
+        nl = buf.find(b"\n", scan_from)
+        while nl != -1:
+            line = bytes(buf[start:nl]).strip()
+            start = nl + 1
+            if line:
+                out.append(line[5:].lstrip() if line.startswith(b"data:") else line)
+            nl = buf.find(b"\n", start)
+        if start:
+            del buf[:start]
+        return out
+
+
+class JSONFieldParser:
+    """Inkrementeller Parser für ein JSON-Objekt, das in Stücken ankommt (z. B. LLM-Tokens).
+    feed() liefert die Top-Level-Felder (key, value), sobald ihr Wert abgeschlossen ist;
+    `complete` wird True, wenn das Objekt geschlossen ist. Text vor dem `{` wird ignoriert."""
+
+    def __init__(self) -> None:
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member: List[str] = []
+        self.complete = False
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        out: List[Tuple[str, object]] = []
+        member = self._member
+        for ch in text:
+            if self.complete:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                member.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+            if self._depth == 0 or (self._depth == 1 and ch == ","):
+                # Ende eines Top-Level-Felds: "key": value
+                out.extend(self._flush_member())
+                if self._depth == 0:
+                    self.complete = True
+                continue
+            member.append(ch)
+        return out
+
+    def _flush_member(self) -> List[Tuple[str, object]]:
+        raw = "".join(self._member).strip()
+        self._member.clear()
+        if not raw:
+            return []
+        try:
+            return list(json.loads("{" + raw + "}").items())
+        except ValueError:
+            return []
+
+
+async def coalesce(
+    source: AsyncIterator[str],
+    flush_interval_s: float,
+    max_chars: int,
+) -> AsyncIterator[str]:
+    """Bündelt Text-Stücke: Flush spätestens nach flush_interval_s (ab dem ersten gepufferten
+    Stück) oder ab max_chars. flush_interval_s <= 0 → unverändert durchreichen.
+    Ein Hintergrund-Task liest die Quelle, damit der Zeit-Flush auch bei Pausen greift."""
+    if flush_interval_s <= 0:
+        try:
+            async for piece in source:
+                yield piece
+        finally:
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def _pump() -> None:
+        try:
+            async for piece in source:
+                await queue.put(piece)
+        except Exception as e:  # an den Consumer weiterreichen
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    pump = asyncio.create_task(_pump())
+    parts: List[str] = []
+    size = 0
+    first_at: Optional[float] = None
+    try:
+        while True:
+            if parts:
+                timeout = max(0.0, flush_interval_s - (time.monotonic() - first_at))
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    yield "".join(parts)
+                    parts, size, first_at = [], 0, None
+                    continue
+            else:
+                item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if not parts:
+                first_at = time.monotonic()
+            parts.append(item)
+            size += len(item)
+            if size >= max_chars:
+                yield "".join(parts)
+                parts, size, first_at = [], 0, None
+        if parts:
+            yield "".join(parts)
+    finally:
+        # Quelle läuft im Pump-Task: Cancel schließt sie dort (inkl. Upstream-Verbindung)
+        pump.cancel()
@@ -0,0 +1,56 @@
+"""
+Zeitaufschlüsselung für einzelne Requests (Server-Timing).
+Nur aktiv, wenn ein RequestTimer im Kontext gesetzt ist (Debug-Header, siehe
+app/core/server_timing.py); sonst kostet record() nur einen ContextVar-Lookup.
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+_current: ContextVar[Optional["RequestTimer"]] = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Stufen eines Requests in Reihenfolge des ersten Auftretens; Wiederholungen werden summiert."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._stages: Dict[str, Tuple[float, int]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        total, count = self._stages.get(name, (0.0, 0))
+        self._stages[name] = (total + seconds, count + 1)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, float]:
+        """{Stufe: Millisekunden} inkl. "total" (seit Request-Beginn)."""
+        out = {name: round(total * 1000, 2) for name, (total, _count) in self._stages.items()}
+        out["total"] = round(self.elapsed() * 1000, 2)
+        return out
+
+    def header(self) -> str:
+        """Wert für den Server-Timing-Header, z. B. `query_embed;dur=12.3, retrieve;dur=4.1, total;dur=20.0`."""
+        parts: List[str] = [f"{name};dur={dur}" for name, dur in self.as_dict().items()]
+        return ", ".join(parts)
+
+
+def current() -> Optional[RequestTimer]:
+    return _current.get()
+
+
+def start() -> Tuple[RequestTimer, object]:
+    """Timer für den laufenden Request setzen; Rückgabe (timer, token für reset())."""
+    timer = RequestTimer()
+    return timer, _current.set(timer)
+
+
+def reset(token) -> None:
+    _current.reset(token)
+
+
+def record(name: str, seconds: float) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
@@ -0,0 +1 @@
+# Benchmarks und Test-Hilfen (Stub-LLM); nicht Teil des Docker-Images
@@ -0,0 +1,112 @@
+"""
+Benchmark: /api/rag/chat/batch gegen sequentielle /api/rag/chat-Aufrufe.
+Stub-LLM (bench/stub_llm.py) mit fester TTFT und Token-Rate, API in-process; Embeddings und
+Chroma werden im RAG-Router durch feste Treffer ersetzt (gemessen wird Orchestrierung + LLM).
+LLM_MAX_CONCURRENCY entspricht den parallelen Slots des (simulierten) llama.cpp-Servers.
+
+Verwendung:
+  python -m bench.bench_batch
+  python -m bench.bench_batch --questions 64 --concurrency 4 --json out.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+
+def _fake_embed_documents(texts, batch_size=32):
+    return [[float(len(t) % 7), float(i), 1.0, 0.5] for i, t in enumerate(texts)]
+
+
+def _fake_result():
+    return {
+        "ids": ["doc:1:0", "doc:2:0"],
+        "documents": ["Der Preis von X beträgt 10 Euro.", "Lieferzeit: 3 Tage."],
+        "metadatas": [{"doc_id": "doc", "filename": "x.pdf", "page": 1}, {"doc_id": "doc", "filename": "x.pdf", "page": 2}],
+        "distances": [0.1, 0.2],
+    }
+
+
+def _start_api(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM_MAX_CONCURRENCY (Slots)")
+    parser.add_argument("--ttft-ms", type=float, default=50.0)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--json", dest="json_path", default=None, help="Ergebnisse als JSON speichern")
+    args = parser.parse_args()
+
+    # Vor dem App-Import: Settings und Admission-Controller lesen die Umgebung
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["LLM_QUEUE_MAX"] = str(max(32, args.questions))
+    import httpx
+
+    from app.main import app
+    from app.routers import rag
+    from app.services.llm_client import LLMClient
+    from bench.stub_llm import StubLLM
+
+    stub = StubLLM(ttft_ms=args.ttft_ms, tokens_per_second=args.tps, max_tokens=args.max_tokens).start()
+    rag.chroma_reachable = lambda *a, **kw: True
+    rag.is_loaded = lambda: True
+    rag.embed_query = lambda text: _fake_embed_documents([text])[0]
+    rag.embed_documents = _fake_embed_documents
+    rag.query_chunks = lambda query_embedding, n_results, doc_id=None: _fake_result()
+    rag.query_chunks_batch = lambda embs, n_results, doc_id=None: [_fake_result() for _ in embs]
+    rag.llm_client = LLMClient([stub.url])
+    server, thread, base = _start_api(app)
+    questions = [f"Frage {i}: Was kostet X in Variante {i}?" for i in range(args.questions)]
+    try:
+        with httpx.Client(timeout=300) as client:
+            t0 = time.perf_counter()
+            for q in questions:
+                r = client.post(f"{base}/api/rag/chat", json={"question": q, "use_cache": False})
+                r.raise_for_status()
+            sequential_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            answers = 0
+            payload = {"questions": questions, "use_cache": False}
+            with client.stream("POST", f"{base}/api/rag/chat/batch", json=payload) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if line and json.loads(line).get("type") == "result":
+                        answers += 1
+            batch_s = time.perf_counter() - t0
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        stub.stop()
+
+    row = {
+        "questions": args.questions,
+        "concurrency": args.concurrency,
+        "sequential_qps": round(args.questions / sequential_s, 2),
+        "batch_qps": round(answers / batch_s, 2),
+        "speedup": round(sequential_s / batch_s, 2),
+    }
+    print(
+        f"{args.questions} Fragen, {args.concurrency} Slots: sequentiell {row['sequential_qps']} Fragen/s, "
+        f"Batch {row['batch_qps']} Fragen/s  x{row['speedup']}"
+    )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(row, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Offline-End-to-End-Benchmark: API in-process, Stub-LLM (bench/stub_llm.py), eingebettete
+Chroma (CHROMA_MODE=ephemeral), synthetische PDFs. Kein Docker, kein Modell nötig.
+
+Misst:
+  ingest   – Seiten/s, Chunks/s, Latenz pro PDF
+  chat     – /api/rag/chat: p50/p95/p99 + Requests/s je Concurrency-Stufe
+  stream   – /api/rag/chat/stream: TTFT und Gesamtdauer p50/p95/p99 je Stufe
+  memory   – RSS-Höchststand (ru_maxrss) nach jeder Phase
+Ergebnisse als JSON; --compare meldet Regressionen gegenüber einem früheren Lauf (Exit-Code 1).
+
+Embeddings: --embedder model (sentence-transformers, wie in Produktion) oder hash
+(deterministische Hash-Vektoren, misst nur die API/Chroma-Kosten); auto = model falls installiert.
+
+Verwendung:
+  python -m bench.bench_e2e --json bench_results.json
+  python -m bench.bench_e2e --docs 4 --pages 30 --concurrency 1 4 16 --requests 64
+  python -m bench.bench_e2e --json new.json --compare bench_results.json --threshold 0.15
+  python -m bench.bench_e2e --compare-only old.json new.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+EMBED_DIM = 384
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50": round(pick(0.50) * 1000, 2),
+        "p95": round(pick(0.95) * 1000, 2),
+        "p99": round(pick(0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def _hash_embed(texts, batch_size: int = 32):
+    """Deterministische Bag-of-Words-Vektoren (normalisiert) – ähnliche Texte, ähnliche Vektoren."""
+    import numpy as np
+
+    out = np.zeros((len(texts), EMBED_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in text.lower().split():
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i, h % EMBED_DIM] += 1.0 if (h >> 32) & 1 else -1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (out / norms).tolist()
+
+
+def _start_api(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def _bench_ingest(client, base: str, pdfs: List[bytes]) -> dict:
+    latencies = []
+    pages = chunks = 0
+    t0 = time.perf_counter()
+    for i, data in enumerate(pdfs):
+        t = time.perf_counter()
+        r = await client.post(
+            f"{base}/api/rag/ingest", files={"file": (f"bench_{i}.pdf", data, "application/pdf")}
+        )
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - t)
+        body = r.json()
+        pages += body["pages"]
+        chunks += body["chunks"]
+    elapsed = time.perf_counter() - t0
+    return {
+        "docs": len(pdfs),
+        "pages": pages,
+        "chunks": chunks,
+        "pages_per_s": round(pages / elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+        "latency_ms": _percentiles(latencies),
+    }
+
+
+async def _run_concurrent(n_requests: int, concurrency: int, fn) -> float:
+    """n_requests Aufrufe von fn(i) mit höchstens `concurrency` gleichzeitig; liefert Wandzeit."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await fn(i)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - t0
+
+
+async def _bench_chat(client, base: str, questions: List[str], n_requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        t = time.perf_counter()
+        r = await client.post(f"{base}/api/rag/chat", json={"question": questions[i % len(questions)], "use_cache": False})
+        if r.status_code != 200:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - t)
+
+    wall = await _run_concurrent(n_requests, concurrency, one)
+    return {"latency_ms": _percentiles(latencies), "rps": round(len(latencies) / wall, 2), "errors": errors}
+
+
+async def _bench_stream(client, base: str, questions: List[str], n_requests: int, concurrency: int) -> dict:
+    ttfts: List[float] = []
+    totals: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        t = time.perf_counter()
+        first = None
+        payload = {"question": questions[i % len(questions)], "use_cache": False}
+        async with client.stream("POST", f"{base}/api/rag/chat/stream", json=payload) as r:
+            if r.status_code != 200:
+                errors += 1
+                return
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "token" and first is None:
+                    first = time.perf_counter() - t
+                elif event.get("type") == "error":
+                    errors += 1
+                    return
+        if first is not None:
+            ttfts.append(first)
+        totals.append(time.perf_counter() - t)
+
+    wall = await _run_concurrent(n_requests, concurrency, one)
+    return {
+        "ttft_ms": _percentiles(ttfts),
+        "total_ms": _percentiles(totals),
+        "rps": round(len(totals) / wall, 2),
+        "errors": errors,
+    }
+
+
+async def _run(args, base: str) -> dict:
+    import httpx
+
+    from bench.synthetic_pdf import make_pdf
+
+    results: dict = {"memory_mb": {}}
+    pdfs = [make_pdf(args.pages, seed=i) for i in range(args.docs)]
+    questions = [f"Was kostet die Lieferung in Abschnitt {i}?" for i in range(1, 33)]
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        results["ingest"] = await _bench_ingest(client, base, pdfs)
+        results["memory_mb"]["after_ingest"] = _max_rss_mb()
+        results["chat"] = {}
+        results["stream"] = {}
+        for c in args.concurrency:
+            results["chat"][str(c)] = await _bench_chat(client, base, questions, args.requests, c)
+            results["stream"][str(c)] = await _bench_stream(client, base, questions, args.requests, c)
+            print(
+                f"concurrency={c:>3}  chat p50 {results['chat'][str(c)]['latency_ms']['p50']} ms"
+                f" p99 {results['chat'][str(c)]['latency_ms']['p99']} ms {results['chat'][str(c)]['rps']} rps  |"
+                f"  stream TTFT p50 {results['stream'][str(c)]['ttft_ms']['p50']} ms"
+                f" p99 {results['stream'][str(c)]['ttft_ms']['p99']} ms"
+            )
+        results["memory_mb"]["after_chat"] = _max_rss_mb()
+    return results
+
+
+# (Pfad im Ergebnis, höher ist schlechter?)
+def _comparable(results: dict) -> Dict[str, tuple]:
+    out = {
+        "ingest.pages_per_s": (results["ingest"]["pages_per_s"], False),
+        "ingest.chunks_per_s": (results["ingest"]["chunks_per_s"], False),
+        "memory_mb.after_chat": (results["memory_mb"]["after_chat"], True),
+    }
+    for c, row in results.get("chat", {}).items():
+        for q in ("p50", "p95", "p99"):
+            out[f"chat.{c}.latency_ms.{q}"] = (row["latency_ms"][q], True)
+        out[f"chat.{c}.rps"] = (row["rps"], False)
+    for c, row in results.get("stream", {}).items():
+        for q in ("p50", "p95", "p99"):
+            out[f"stream.{c}.ttft_ms.{q}"] = (row["ttft_ms"][q], True)
+            out[f"stream.{c}.total_ms.{q}"] = (row["total_ms"][q], True)
+    return out
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Metriken, die sich um mehr als `threshold` (relativ) verschlechtert haben."""
+    old = _comparable(baseline["results"])
+    new = _comparable(current["results"])
+    regressions = []
+    for key, (value, higher_is_worse) in new.items():
+        if key not in old or old[key][0] in (None, 0) or value is None:
+            continue
+        base_value = old[key][0]
+        change = (value - base_value) / base_value
+        worse = change > threshold if higher_is_worse else change < -threshold
+        marker = "REGRESSION" if worse else ""
+        print(f"  {key:<34} {base_value:>10} → {value:>10}  {change:+.1%} {marker}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=48, help="Requests pro Concurrency-Stufe und Endpoint")
+    parser.add_argument("--ttft-ms", type=float, default=50.0)
+    parser.add_argument("--tps", type=float, default=100.0)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--slots", type=int, default=4, help="LLM_MAX_CONCURRENCY (simulierte llama.cpp-Slots)")
+    parser.add_argument("--embedder", choices=["auto", "model", "hash"], default="auto")
+    parser.add_argument("--json", dest="json_path", default=None, help="Ergebnisse als JSON speichern")
+    parser.add_argument("--compare", default=None, help="Baseline-JSON: Regressionen melden")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative Verschlechterung ab der gemeldet wird")
+    parser.add_argument("--compare-only", nargs=2, metavar=("BASELINE", "CURRENT"), help="Nur zwei JSON-Läufe vergleichen")
+    args = parser.parse_args()
+
+    if args.compare_only:
+        with open(args.compare_only[0], encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare_only[1], encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        print(f"{len(regressions)} Regression(en)")
+        sys.exit(1 if regressions else 0)
+
+    from bench.stub_llm import StubLLM
+
+    stub = StubLLM(ttft_ms=args.ttft_ms, tokens_per_second=args.tps, max_tokens=args.max_tokens).start()
+    artifact_dir = tempfile.mkdtemp(prefix="bench_artifacts_")
+    # Vor dem App-Import: Settings lesen die Umgebung
+    os.environ.update({
+        "LLM_BASE_URL": stub.url,
+        "LLM_BASE_URLS": "",
+        "LLM_MAX_CONCURRENCY": str(args.slots),
+        "LLM_QUEUE_MAX": str(max(64, max(args.concurrency) * 2)),
+        "CHROMA_MODE": "ephemeral",
+        "CHROMA_COLLECTION": f"bench_{os.getpid()}",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "LLM_HEALTH_INTERVAL_SECONDS": "0",
+        "DOC_CATALOG_PATH": ":memory:",
+        "ARTIFACT_DIR": artifact_dir,  # Artefakt-Schreiben gehört zum Ingest
+    })
+    from app.main import app
+    from app.routers import rag
+
+    embedder = args.embedder
+    if embedder == "auto":
+        try:
+            import sentence_transformers  # noqa: F401
+
+            embedder = "model"
+        except ImportError:
+            embedder = "hash"
+    if embedder == "hash":
+        rag.embed_documents = _hash_embed
+        rag.embed_query = lambda text: _hash_embed([text])[0]
+        rag.is_loaded = lambda: True
+
+    server, thread, base = _start_api(app)
+    try:
+        results = asyncio.run(_run(args, base))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        stub.stop()
+        shutil.rmtree(artifact_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "embedder": embedder,
+            "params": {k: v for k, v in vars(args).items() if k not in ("json_path", "compare", "compare_only")},
+        },
+        "results": results,
+    }
+    print(
+        f"ingest: {results['ingest']['pages_per_s']} Seiten/s, {results['ingest']['chunks_per_s']} Chunks/s;"
+        f" RSS max {results['memory_mb']['after_chat']} MB"
+    )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        print(f"{len(regressions)} Regression(en)")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
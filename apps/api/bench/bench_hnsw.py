@@ -0,0 +1,146 @@
+"""
+HNSW-Sweep: Recall@k gegen Query-Latenz und Aufbauzeit für M / construction_ef / search_ef
+auf synthetischen, geclusterten Einheitsvektoren (384 Dim. wie all-MiniLM-L6-v2).
+Eingebettete Chroma (EphemeralClient), Ground Truth per exakter Suche (numpy). Jede Kombination
+wird neu aufgebaut: search_ef gilt nur für beim Anlegen übergebene Werte (modify wirkt nicht auf
+den geladenen Index).
+Hilft bei der Wahl von CHROMA_HNSW_* für 100k bzw. 1M Chunks.
+
+Verwendung:
+  python -m bench.bench_hnsw                                   # 100k Vektoren, Standard-Raster
+  python -m bench.bench_hnsw --sizes 100000 1000000 --json hnsw.json
+  python -m bench.bench_hnsw --sizes 20000 --m 16 --construction-ef 100 --search-ef 10 50 100
+
+Hinweis: 1M Vektoren ≈ 1,5 GB float32 im Benchmark-Prozess zzgl. HNSW-Index in Chroma.
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import List
+
+import numpy as np
+
+DIM = 384
+
+
+def make_corpus(n: int, clusters: int, seed: int) -> np.ndarray:
+    """n normalisierte Vektoren um `clusters` Zentren (ähnlich Embeddings vieler Dokumente)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIM)).astype(np.float32)
+    out = np.empty((n, DIM), dtype=np.float32)
+    step = 50_000
+    for start in range(0, n, step):
+        m = min(step, n - start)
+        idx = rng.integers(0, clusters, size=m)
+        block = centers[idx] + rng.normal(scale=0.6, size=(m, DIM)).astype(np.float32)
+        out[start:start + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return out
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indizes der k nächsten Nachbarn (Kosinus) je Query, blockweise über das Korpus."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_idx = np.zeros((len(queries), k), dtype=np.int64)
+    step = 100_000
+    for start in range(0, len(corpus), step):
+        scores = queries @ corpus[start:start + step].T
+        cand = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+        cand_scores = np.take_along_axis(scores, cand, axis=1)
+        all_scores = np.concatenate([best_scores, cand_scores], axis=1)
+        all_idx = np.concatenate([best_idx, cand + start], axis=1)
+        order = np.argsort(-all_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, order, axis=1)
+        best_idx = np.take_along_axis(all_idx, order, axis=1)
+    return best_idx
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def build(client, corpus: np.ndarray, m: int, construction_ef: int, search_ef: int, batch: int):
+    coll = client.create_collection(
+        f"hnsw_{uuid.uuid4().hex[:8]}",
+        metadata={"hnsw:space": "cosine", "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef},
+    )
+    t0 = time.perf_counter()
+    for start in range(0, len(corpus), batch):
+        block = corpus[start:start + batch]
+        coll.add(ids=[str(i) for i in range(start, start + len(block))], embeddings=block)
+    return coll, time.perf_counter() - t0
+
+
+def measure(coll, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        t = time.perf_counter()
+        res = coll.query(query_embeddings=[q], n_results=k, include=[])
+        latencies.append(time.perf_counter() - t)
+        hits += len(set(int(i) for i in res["ids"][0]) & set(expected.tolist()))
+    return {
+        "recall": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(_pct(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 3),
+        "qps": round(len(queries) / sum(latencies), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--k", type=int, default=10, help="Recall@k (RAG_TOP_K inkl. Reserve)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=1000, help="≈ Anzahl Dokumente/Themen")
+    parser.add_argument("--batch", type=int, default=5000, help="Vektoren pro add()")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args()
+
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    rows = []
+    for n in args.sizes:
+        corpus = make_corpus(n, args.clusters, args.seed)
+        queries = make_corpus(args.queries, args.clusters, args.seed)  # gleiche Zentren, neue Punkte
+        queries = queries + np.random.default_rng(args.seed + 1).normal(scale=0.05, size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        t = time.perf_counter()
+        truth = exact_topk(corpus, queries, args.k)
+        print(f"n={n}: Ground Truth in {time.perf_counter() - t:.1f}s")
+        for m in args.m:
+            for cef in args.construction_ef:
+                for sef in args.search_ef:
+                    coll, build_s = build(client, corpus, m, cef, sef, args.batch)
+                    row = {"n": n, "M": m, "construction_ef": cef, "search_ef": sef,
+                           "build_s": round(build_s, 1), "build_per_s": round(n / build_s), **measure(coll, queries, truth, args.k)}
+                    rows.append(row)
+                    print(
+                        f"  M={m:<3} cef={cef:<4} sef={sef:<4} recall@{args.k}={row['recall']:.3f}"
+                        f"  p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms  build={row['build_s']}s"
+                    )
+                    client.delete_collection(coll.name)
+        del corpus
+
+    # Empfehlung je Größe: schnellste Konfiguration mit Recall ≥ 0,95 (sonst beste Recall)
+    for n in args.sizes:
+        candidates = [r for r in rows if r["n"] == n]
+        good = [r for r in candidates if r["recall"] >= 0.95]
+        pick = min(good, key=lambda r: r["p95_ms"]) if good else max(candidates, key=lambda r: r["recall"])
+        print(
+            f"n={n}: CHROMA_HNSW_M={pick['M']} CHROMA_HNSW_CONSTRUCTION_EF={pick['construction_ef']}"
+            f" CHROMA_HNSW_SEARCH_EF={pick['search_ef']}  (recall {pick['recall']}, p95 {pick['p95_ms']} ms)"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
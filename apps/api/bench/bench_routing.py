@@ -0,0 +1,141 @@
+"""
+Routing-Benchmark: flache Chunk-Suche gegen zweistufige Suche (Dokument-Zentroide → Chunk-Query nur
+über die Chunks der gerouteten Dokumente) wie in app.services.doc_centroids, je Dokumentanzahl und
+ROUTING_FANOUT. Stufe 2 in beiden Varianten von chunk_filter: ids=<Chunk-IDs> und where doc_id $in.
+Synthetische Dokumente: Themenzentrum + Dokumentversatz, Chunks streuen um das Dokument (384 Dim.);
+Fragen sind neue Punkte um ein zufälliges Dokument. Eingebettete Chroma (EphemeralClient),
+Ground Truth per exakter Suche (numpy).
+Gemessen: Recall@k gegen die exakte Suche, Anteil der Treffer aus dem Quelldokument (doc_precision),
+p50/p95-Latenz (Stufe 1 + Stufe 2 zusammen).
+
+Verwendung:
+  python -m bench.bench_routing                                   # 1000 / 5000 Dokumente à 20 Chunks
+  python -m bench.bench_routing --docs 2000 --chunks-per-doc 50 --fanout 4 8 16 --restrict ids --json routing.json
+"""
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+
+from app.services.doc_centroids import centroid, route_in
+from bench.bench_hnsw import DIM, _pct, exact_topk
+
+CHUNK_SPREAD = 1.2
+
+
+def make_docs(n_docs: int, chunks_per_doc: int, topics: int, seed: int):
+    """(Chunk-Vektoren, doc-Index je Chunk, Dokumentzentren); mehrere Dokumente teilen ein Thema,
+    Chunks streuen so weit, dass die flache Top-k auch Chunks ähnlicher Dokumente enthält."""
+    rng = np.random.default_rng(seed)
+    topic_centers = rng.normal(size=(topics, DIM)).astype(np.float32)
+    doc_centers = topic_centers[rng.integers(0, topics, size=n_docs)] + rng.normal(scale=0.5, size=(n_docs, DIM)).astype(np.float32)
+    owner = np.repeat(np.arange(n_docs), chunks_per_doc)
+    chunks = doc_centers[owner] + rng.normal(scale=CHUNK_SPREAD, size=(len(owner), DIM)).astype(np.float32)
+    chunks /= np.linalg.norm(chunks, axis=1, keepdims=True)
+    return chunks, owner, doc_centers
+
+
+def make_queries(doc_centers: np.ndarray, n: int, seed: int):
+    """Fragen wie neue Chunks eines zufälligen Dokuments; liefert (Vektoren, Quelldokument)."""
+    rng = np.random.default_rng(seed + 1)
+    sources = rng.integers(0, len(doc_centers), size=n)
+    queries = doc_centers[sources] + rng.normal(scale=CHUNK_SPREAD, size=(n, DIM)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True), sources
+
+
+def build(client, chunks: np.ndarray, owner: np.ndarray, batch: int):
+    coll = client.create_collection(f"route_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"})
+    for start in range(0, len(chunks), batch):
+        block = chunks[start:start + batch]
+        coll.add(
+            ids=[str(i) for i in range(start, start + len(block))],
+            embeddings=block,
+            metadatas=[{"doc_id": f"d{owner[i]}"} for i in range(start, start + len(block))],
+        )
+    docs = client.create_collection(f"{coll.name}__docs", metadata={"hnsw:space": "cosine"})
+    n_docs = int(owner.max()) + 1
+    bounds = np.searchsorted(owner, np.arange(n_docs + 1))
+    for start in range(0, n_docs, batch):
+        ids = list(range(start, min(n_docs, start + batch)))
+        docs.add(
+            ids=[f"d{i}" for i in ids],
+            embeddings=[centroid(chunks[bounds[i]:bounds[i + 1]]) for i in ids],
+        )
+    return coll, docs
+
+
+def measure(coll, docs, queries: np.ndarray, sources: np.ndarray, truth: np.ndarray, k: int, fanout: int,
+            restrict: str, chunks_per_doc: int) -> dict:
+    latencies = []
+    hits = same_doc = fallbacks = 0
+    for q, source, expected in zip(queries, sources, truth):
+        t = time.perf_counter()
+        kwargs = {}
+        routed = route_in(docs, q.tolist(), fanout) if fanout else None
+        if routed and restrict == "ids":
+            # entspricht den Chunk-IDs aus dem Katalog (fortlaufend je Dokument)
+            kwargs = {"ids": [str(int(d[1:]) * chunks_per_doc + j) for d in routed for j in range(chunks_per_doc)]}
+        elif routed:
+            kwargs = {"where": {"doc_id": {"$in": routed}}}
+        res = coll.query(query_embeddings=[q], n_results=k, include=["metadatas"], **kwargs)
+        if kwargs and len(res["ids"][0]) < k:
+            fallbacks += 1  # wie query_chunks: zu wenige Treffer → flache Suche
+            res = coll.query(query_embeddings=[q], n_results=k, include=["metadatas"])
+        latencies.append(time.perf_counter() - t)
+        hits += len(set(int(i) for i in res["ids"][0]) & set(expected.tolist()))
+        same_doc += sum(1 for m in res["metadatas"][0] if m["doc_id"] == f"d{source}")
+    return {
+        "recall": round(hits / (len(queries) * k), 4),
+        "doc_precision": round(same_doc / (len(queries) * k), 4),
+        "fallbacks": fallbacks,
+        "p50_ms": round(_pct(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--topics", type=int, default=100, help="Themen, die sich Dokumente teilen")
+    parser.add_argument("--fanout", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--restrict", nargs="+", choices=["ids", "where"], default=["ids", "where"], help="Stufe 2")
+    parser.add_argument("--k", type=int, default=5, help="RAG_TOP_K")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=5000, help="Vektoren pro add()")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args()
+
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    rows = []
+    for n_docs in args.docs:
+        chunks, owner, doc_centers = make_docs(n_docs, args.chunks_per_doc, args.topics, args.seed)
+        queries, sources = make_queries(doc_centers, args.queries, args.seed)
+        truth = exact_topk(chunks, queries, args.k)
+        t = time.perf_counter()
+        coll, docs = build(client, chunks, owner, args.batch)
+        print(f"docs={n_docs} chunks={len(chunks)}: Aufbau {time.perf_counter() - t:.1f}s")
+        runs = [(0, "-")] + [(f, r) for f in args.fanout for r in args.restrict]
+        for fanout, restrict in runs:
+            row = {"docs": n_docs, "chunks": len(chunks), "fanout": fanout, "restrict": restrict,
+                   **measure(coll, docs, queries, sources, truth, args.k, fanout, restrict, args.chunks_per_doc)}
+            rows.append(row)
+            label = "flach" if not fanout else f"fanout={fanout} {restrict}"
+            print(
+                f"  {label:<17} recall@{args.k}={row['recall']:.3f} doc_precision={row['doc_precision']:.3f}"
+                f"  p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms  fallbacks={row['fallbacks']}"
+            )
+        client.delete_collection(coll.name)
+        client.delete_collection(docs.name)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: API-CPU pro gestreamtem Token (llama.cpp SSE → NDJSON), alter vs. neuer Pfad.
+Simuliert den Upstream als Folge von Netzwerk-Reads (n Events pro Read) und misst nur die
+Arbeit der API: SSE-Parsing, JSON, NDJSON-Framing, Anzahl Writes an den Client.
+
+  legacy: str-Puffer mit `buffer +=` / partition, json.loads + json.dumps je Token, 1 Write je Token
+  new:    SSELineParser (Bytes), json_loads (orjson falls vorhanden), ndjson_token, 1 Write je Read
+
+Verwendung:
+  python -m bench.bench_stream
+  python -m bench.bench_stream --tokens 20000 --events-per-read 1 4 16 --json out.json
+"""
+import argparse
+import json
+import time
+
+from app.utils.streaming import SSELineParser, json_loads, ndjson_token
+
+
+def _sse_reads(n_tokens: int, events_per_read: int) -> list:
+    events = []
+    for i in range(n_tokens):
+        payload = {"content": f" wort{i % 97}", "stop": False, "id_slot": 0, "tokens_predicted": i + 1}
+        events.append(f"data: {json.dumps(payload)}\n\n")
+    events.append(f"data: {json.dumps({'content': '', 'stop': True})}\n\n")
+    reads = []
+    for i in range(0, len(events), events_per_read):
+        reads.append("".join(events[i : i + events_per_read]))
+    return reads
+
+
+def legacy_path(reads: list) -> int:
+    """Nachbau des alten Pfads (completion_stream + _stream_rag_chat vor der Umstellung)."""
+    writes = 0
+    buffer = ""
+    for chunk in reads:
+        buffer += chunk
+        while "\n" in buffer:
+            line, _, buffer = buffer.partition("\n")
+            line = line.strip()
+            if not line:
+                continue
+            data_str = line[5:].strip() if line.startswith("data:") else line
+            try:
+                data = json.loads(data_str)
+            except json.JSONDecodeError:
+                continue
+            content = data.get("content")
+            if content:
+                out = json.dumps({"type": "token", "content": content}) + "\n"
+                out.encode("utf-8")
+                writes += 1
+            if data.get("stop") is True:
+                return writes
+    return writes
+
+
+def new_path(reads: list) -> int:
+    writes = 0
+    parser = SSELineParser()
+    for chunk in reads:
+        contents = []
+        stop = False
+        for data_str in parser.feed(chunk.encode("utf-8")):
+            try:
+                data = json_loads(data_str)
+            except ValueError:
+                continue
+            content = data.get("content")
+            if content:
+                contents.append(content)
+            if data.get("stop") is True:
+                stop = True
+                break
+        if contents:
+            ndjson_token("".join(contents)).encode("utf-8")
+            writes += 1
+        if stop:
+            return writes
+    return writes
+
+
+def _measure(fn, reads: list, n_tokens: int, repeat: int) -> dict:
+    best = None
+    writes = 0
+    for _ in range(repeat):
+        t0 = time.process_time()
+        writes = fn(reads)
+        cpu = time.process_time() - t0
+        best = cpu if best is None else min(best, cpu)
+    return {"cpu_us_per_token": round(best / n_tokens * 1e6, 3), "writes": writes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=10000)
+    parser.add_argument("--events-per-read", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", default=None, help="Ergebnisse als JSON speichern")
+    args = parser.parse_args()
+
+    results = []
+    for epr in args.events_per_read:
+        reads = _sse_reads(args.tokens, epr)
+        legacy = _measure(legacy_path, reads, args.tokens, args.repeat)
+        new = _measure(new_path, reads, args.tokens, args.repeat)
+        speedup = legacy["cpu_us_per_token"] / new["cpu_us_per_token"] if new["cpu_us_per_token"] else None
+        row = {"events_per_read": epr, "legacy": legacy, "new": new, "speedup": round(speedup, 2) if speedup else None}
+        results.append(row)
+        print(
+            f"events/read={epr:>3}  legacy {legacy['cpu_us_per_token']:>7.2f} µs/token ({legacy['writes']} writes)"
+            f"  new {new['cpu_us_per_token']:>7.2f} µs/token ({new['writes']} writes)  x{row['speedup']}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"tokens": args.tokens, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
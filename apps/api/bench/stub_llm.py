@@ -0,0 +1,192 @@
+"""
+Deterministischer llama.cpp-Ersatz für Tests und Benchmarks (kein Modell, keine GPU).
+Spricht POST /completion (mit und ohne SSE-Stream), GET / und GET /health.
+Konfigurierbar: Zeit bis zum ersten Token (ttft_ms, plus prefill_ms_per_token für nicht
+gecachte Prompt-Tokens), Tokens pro Sekunde, Fehler/Hänger.
+
+Verwendung:
+    stub = StubLLM(ttft_ms=50, tokens_per_second=100).start()
+    ... stub.url ...
+    stub.stop()
+
+Standalone: python -m bench.stub_llm --port 8080
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class StubLLM:
+    def __init__(
+        self,
+        ttft_ms: float = 20.0,
+        tokens_per_second: float = 200.0,
+        max_tokens: int = 64,
+        prefill_ms_per_token: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.host = host
+        self.port = port
+        # Fehlerinjektion: "ok" | "error" (HTTP 500) | "hang" (keine Antwort)
+        self.mode = "ok"
+        self.requests_total = 0
+        self.active_streams = 0
+        self.tokens_sent = 0
+        self.aborted_streams = 0
+        self.last_stream_closed_at: Optional[float] = None
+        self.last_payload: Optional[dict] = None
+        # Nachbildung des llama.cpp-Prompt-Caches: letzter Prompt je Slot
+        self._slot_prompts: dict = {}
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = self._build_app()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _tokens(self, n_predict: int):
+        return [f"tok{i} " for i in range(max(1, min(n_predict, self.max_tokens)))]
+
+    def _cached_tokens(self, payload: dict) -> int:
+        """Gemeinsamer Präfix mit dem letzten Prompt desselben Slots (≈ 4 Zeichen pro Token)."""
+        prompt = str(payload.get("prompt", ""))
+        slot = payload.get("id_slot", 0)
+        previous = self._slot_prompts.get(slot, "")
+        self._slot_prompts[slot] = prompt
+        if not payload.get("cache_prompt"):
+            return 0
+        common = 0
+        for a, b in zip(previous, prompt):
+            if a != b:
+                break
+            common += 1
+        return common // 4
+
+    def _prefill_s(self, prompt: str, cached: int) -> float:
+        return (self.ttft_ms + max(1, len(prompt) // 4 - cached) * self.prefill_ms_per_token) / 1000.0
+
+    def _timings(self, prompt: str, n_tokens: int, elapsed_ms: float, cached: int = 0) -> dict:
+        return {
+            "cache_n": cached,
+            "prompt_n": max(1, len(prompt) // 4 - cached),
+            "prompt_ms": self._prefill_s(prompt, cached) * 1000.0,
+            "predicted_n": n_tokens,
+            "predicted_ms": max(0.0, elapsed_ms - self._prefill_s(prompt, cached) * 1000.0),
+            "predicted_per_second": self.tokens_per_second,
+        }
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+        stub = self
+
+        @app.get("/")
+        @app.get("/health")
+        async def health():
+            if stub.mode == "error":
+                return JSONResponse({"status": "error"}, status_code=503)
+            if stub.mode == "hang":
+                await asyncio.sleep(3600)
+            return {"status": "ok"}
+
+        @app.post("/completion")
+        async def completion(request: Request):
+            payload = await request.json()
+            stub.requests_total += 1
+            stub.last_payload = payload
+            if stub.mode == "error":
+                return JSONResponse({"error": "injected"}, status_code=500)
+            if stub.mode == "hang":
+                await asyncio.sleep(3600)
+            prompt = str(payload.get("prompt", ""))
+            cached = stub._cached_tokens(payload)
+            tokens = stub._tokens(int(payload.get("n_predict", 64)))
+            delay = 1.0 / stub.tokens_per_second if stub.tokens_per_second > 0 else 0.0
+            t0 = time.perf_counter()
+
+            if not payload.get("stream"):
+                await asyncio.sleep(stub._prefill_s(prompt, cached) + delay * len(tokens))
+                stub.tokens_sent += len(tokens)
+                elapsed = (time.perf_counter() - t0) * 1000
+                return {
+                    "content": "".join(tokens),
+                    "stop": True,
+                    "timings": stub._timings(prompt, len(tokens), elapsed, cached),
+                }
+
+            async def events():
+                stub.active_streams += 1
+                sent = 0
+                try:
+                    await asyncio.sleep(stub._prefill_s(prompt, cached))
+                    for tok in tokens:
+                        if await request.is_disconnected():
+                            stub.aborted_streams += 1
+                            return
+                        yield f"data: {json.dumps({'content': tok, 'stop': False})}\n\n"
+                        sent += 1
+                        stub.tokens_sent += 1
+                        await asyncio.sleep(delay)
+                    elapsed = (time.perf_counter() - t0) * 1000
+                    final = {"content": "", "stop": True, "timings": stub._timings(prompt, sent, elapsed, cached)}
+                    yield f"data: {json.dumps(final)}\n\n"
+                except asyncio.CancelledError:
+                    stub.aborted_streams += 1
+                    raise
+                finally:
+                    stub.active_streams -= 1
+                    stub.last_stream_closed_at = time.monotonic()
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        @app.get("/props")
+        async def props():
+            return {"model_path": "/models/stub.gguf", "total_slots": 4}
+
+        @app.get("/favicon.ico")
+        async def favicon():
+            return Response(status_code=204)
+
+        return app
+
+    def start(self) -> "StubLLM":
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stub llama.cpp server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttft-ms", type=float, default=20.0)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubLLM(args.ttft_ms, args.tps, args.max_tokens, args.prefill_ms_per_token, host=args.host, port=args.port)
+    uvicorn.run(stub.app, host=args.host, port=args.port, log_level="info")
@@ -0,0 +1,85 @@
+"""
+Synthetische PDFs für Benchmarks (ohne reportlab): einfache Textseiten mit Helvetica,
+deterministisch aus einem Seed. pypdf extrahiert den Text wie bei echten Text-PDFs.
+
+Verwendung:
+    data = make_pdf(pages=20, seed=1)
+    python -m bench.synthetic_pdf out.pdf --pages 20
+"""
+import random
+from typing import List
+
+_WORDS = (
+    "Vertrag Lieferung Preis Kunde Rechnung Frist Angebot Projekt Risiko Budget Termin Leistung "
+    "Qualität Zahlung Rabatt Material Prüfung Bericht Analyse Ergebnis Anforderung Schnittstelle "
+    "Wartung Support Lizenz Server Datenbank Sicherheit Abnahme Meilenstein Änderung Umfang"
+).split()
+
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+
+def page_lines(rng: random.Random, page_no: int) -> List[str]:
+    lines = [f"Abschnitt {page_no}: Bericht zu Projekt {rng.randint(100, 999)}"]
+    for _ in range(LINES_PER_PAGE - 1):
+        words = [rng.choice(_WORDS) for _ in range(WORDS_PER_LINE)]
+        lines.append(" ".join(words) + f" {rng.randint(1, 9999)} Euro.")
+    return lines
+
+
+def _escape(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """PDF mit `pages` Textseiten (A4, WinAnsi-Encoding für Umlaute)."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objects) + 1 + 2 * pages  # Pages-Objekt kommt nach allen Seiten
+    page_ids = []
+    for p in range(pages):
+        stream = b"BT /F1 10 Tf 14 TL 50 800 Td\n"
+        for line in page_lines(rng, p + 1):
+            stream += b"(" + _escape(line) + b") Tj T*\n"
+        stream += b"ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+            )
+        )
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    assert add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)) == pages_id
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetisches Text-PDF erzeugen")
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with open(args.path, "wb") as f:
+        f.write(make_pdf(args.pages, args.seed))
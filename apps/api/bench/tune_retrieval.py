@@ -0,0 +1,291 @@
+"""
+Tuning-Harness für CHUNK_SIZE / CHUNK_OVERLAP / RAG_TOP_K / RAG_MAX_CONTEXT_CHARS auf eigenem Korpus:
+Ordner mit PDFs + gelabelte Fragen (Frage → erwartete Seite). Jede Kombination läuft durch die echten
+Pfade des Ingest/Chat: _extract_text_from_pdf, _chunk_pages_with_metadata (chunk_text),
+embed_documents, chroma_store.upsert_chunks, vector_store.query_chunks, _build_context und
+_build_rag_prompt. Chroma eingebettet (CHROMA_MODE=ephemeral), Routing/Reranking/Kompression aus.
+Embeddings werden in einer SQLite-Datei gecacht (Schlüssel: Modell + Text) – Wiederholungen und
+andere Retrieval-Parameter kosten kein erneutes Embedding.
+
+Je Konfiguration:
+  recall@k         erwartete Seite unter den k Treffern
+  mrr              1/Rang des ersten Treffers der erwarteten Seite (0, wenn nicht unter k)
+  context_recall   erwartete Seite steckt noch im Kontext nach RAG_MAX_CONTEXT_CHARS
+  prompt_tokens    Ø geschätzte Prompt-Tokens (~4 Zeichen/Token)
+  query p50/p95    query_chunks-Latenz
+  chunks, index_mb Chunks bzw. Indexgröße: Vektoren (float32) + HNSW-Kanten (2·CHROMA_HNSW_M je Vektor)
+                   + Chunk-Texte + Metadaten (berechnet – die Plattengröße der eingebetteten Chroma
+                   schwankt mit Flush-Zeitpunkten)
+  index_chunks_s   Chunking + Upsert (ohne Embedding); embed_chunks_s nur aus Cache-Misses
+
+Fragen: JSONL oder JSON-Liste, je Eintrag {"question": "...", "page": 3} oder "pages": [3, 4];
+"file" (Dateiname im PDF-Ordner) ist bei mehreren PDFs Pflicht.
+
+Verwendung:
+  python -m bench.tune_retrieval --pdfs ./korpus --questions fragen.jsonl
+  python -m bench.tune_retrieval --pdfs ./korpus --questions fragen.jsonl \\
+      --chunk-size 500 800 1000 1500 --chunk-overlap 0 100 200 --top-k 2 4 8 \\
+      --max-context-chars 4000 8000 12000 --json tuning.json
+  python -m bench.tune_retrieval ... --embedder hash      # ohne sentence-transformers (nur Mechanik)
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bench.bench_hnsw import _pct
+
+
+class EmbeddingCache:
+    """SQLite: sha256(Modell + Text) → float32-Vektor. Misses gehen gebatcht an embed_documents."""
+
+    def __init__(self, path: str, model: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.model = model
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS emb (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    def embed(self, texts: Sequence[str], batch_size: int = 64) -> np.ndarray:
+        from app.services.embeddings import embed_documents
+
+        keys = [self._key(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vec FROM emb WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            text_of = dict(zip(keys, texts))
+            t0 = time.perf_counter()
+            vectors = embed_documents([text_of[k] for k in missing], batch_size=batch_size)
+            self.embed_seconds += time.perf_counter() - t0
+            rows = [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in zip(missing, vectors)]
+            self.conn.executemany("INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)", rows)
+            self.conn.commit()
+            found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+        return np.stack([found[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+
+def load_questions(path: str, files: List[str]) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        raw = f.read().strip()
+    items = json.loads(raw) if raw.startswith("[") else [json.loads(line) for line in raw.splitlines() if line.strip()]
+    out = []
+    for n, item in enumerate(items, 1):
+        pages = item.get("pages") or ([item["page"]] if "page" in item else [])
+        name = item.get("file") or (files[0] if len(files) == 1 else None)
+        if not item.get("question") or not pages or name not in files:
+            raise SystemExit(f"Frage {n}: question, page(s) und file (bei mehreren PDFs) nötig: {item}")
+        out.append({"question": item["question"], "file": name, "pages": {int(p) for p in pages}})
+    return out
+
+
+def _relevant(meta: dict, question: dict) -> bool:
+    return meta.get("filename") == question["file"] and meta.get("page") in question["pages"]
+
+
+def run_grid(args, pdfs: Dict[str, List[str]], questions: List[dict], cache: EmbeddingCache) -> List[dict]:
+    from app.core.config import get_settings
+    from app.routers.rag import _build_context, _build_rag_prompt, _chunk_pages_with_metadata
+    from app.services.chroma_store import upsert_chunks
+    from app.services.context_compression import estimate_tokens
+    from app.services.vector_store import get_chroma_client, query_chunks
+
+    client = get_chroma_client()
+    hnsw_m = get_settings().CHROMA_HNSW_M
+    q_emb = cache.embed([q["question"] for q in questions]).tolist()
+    rows = []
+    for size, overlap in itertools.product(args.chunk_size, args.chunk_overlap):
+        if overlap >= size:
+            continue
+        name = f"tune_{size}_{overlap}"
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
+        misses_before, embed_s_before = cache.misses, cache.embed_seconds
+        t_chunk = t_upsert = 0.0
+        n_chunks = index_bytes = 0
+        for filename, page_texts in pdfs.items():
+            t0 = time.perf_counter()
+            doc_id = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:32]
+            ids, documents, metadatas = _chunk_pages_with_metadata(page_texts, doc_id, filename, size, overlap)
+            t_chunk += time.perf_counter() - t0
+            vectors = cache.embed(documents).tolist()
+            t0 = time.perf_counter()
+            for start in range(0, len(ids), args.batch):
+                upsert_chunks(
+                    ids=ids[start:start + args.batch],
+                    embeddings=vectors[start:start + args.batch],
+                    documents=documents[start:start + args.batch],
+                    metadatas=metadatas[start:start + args.batch],
+                    collection_name=name,
+                )
+            t_upsert += time.perf_counter() - t0
+            n_chunks += len(ids)
+            index_bytes += sum(len(v) * 4 + 2 * hnsw_m * 4 for v in vectors)
+            index_bytes += sum(len(d.encode("utf-8")) + len(json.dumps(m)) for d, m in zip(documents, metadatas))
+        embedded = cache.misses - misses_before
+        embed_s = cache.embed_seconds - embed_s_before
+        build = {
+            "chunk_size": size,
+            "chunk_overlap": overlap,
+            "chunks": n_chunks,
+            "index_mb": round(index_bytes / 1e6, 2),
+            "index_chunks_s": round(n_chunks / (t_chunk + t_upsert), 1) if t_chunk + t_upsert else None,
+            "embed_chunks_s": round(embedded / embed_s, 1) if embedded and embed_s else None,
+        }
+
+        for k in sorted(set(args.top_k)):
+            latencies, hits = [], []
+            for question, emb in zip(questions, q_emb):
+                t0 = time.perf_counter()
+                res = query_chunks(query_embedding=emb, n_results=k, collection=name)
+                latencies.append(time.perf_counter() - t0)
+                hits.append(res)
+            ranks = [
+                next((i + 1 for i, m in enumerate(res["metadatas"]) if _relevant(m or {}, q)), None)
+                for q, res in zip(questions, hits)
+            ]
+            retrieval = {
+                "top_k": k,
+                "recall": round(sum(r is not None for r in ranks) / len(questions), 4),
+                "mrr": round(sum(1.0 / r for r in ranks if r) / len(questions), 4),
+                "query_p50_ms": round(_pct(latencies, 0.50) * 1000, 2),
+                "query_p95_ms": round(_pct(latencies, 0.95) * 1000, 2),
+            }
+            for max_chars in sorted(set(args.max_context_chars)):
+                tokens, in_context = [], 0
+                for q, res in zip(questions, hits):
+                    context = _build_context(res["documents"], res["metadatas"], max_chars=max_chars)
+                    tokens.append(estimate_tokens(_build_rag_prompt(context, q["question"], args.language)))
+                    in_context += any(
+                        _relevant(m or {}, q) and doc[:80] in context
+                        for doc, m in zip(res["documents"], res["metadatas"])
+                    )
+                row = {
+                    **build,
+                    **retrieval,
+                    "max_context_chars": max_chars,
+                    "context_recall": round(in_context / len(questions), 4),
+                    "prompt_tokens": round(sum(tokens) / len(tokens), 1),
+                }
+                rows.append(row)
+                print(
+                    f"size={size:<5} overlap={overlap:<4} k={k:<3} ctx={max_chars:<6}"
+                    f" recall={row['recall']:.3f} mrr={row['mrr']:.3f} ctx_recall={row['context_recall']:.3f}"
+                    f" tokens={row['prompt_tokens']:<7} p50={row['query_p50_ms']}ms chunks={n_chunks} {build['index_mb']}MB"
+                )
+        if not args.keep_collections:
+            client.delete_collection(name)
+    return rows
+
+
+def recommend(rows: List[dict], min_recall: float) -> Optional[dict]:
+    """Konfiguration mit context_recall ≥ min_recall und den wenigsten Prompt-Tokens
+    (sonst die mit dem höchsten context_recall)."""
+    if not rows:
+        return None
+    good = [r for r in rows if r["context_recall"] >= min_recall]
+    if good:
+        return min(good, key=lambda r: (r["prompt_tokens"], r["query_p50_ms"]))
+    return max(rows, key=lambda r: (r["context_recall"], r["mrr"], -r["prompt_tokens"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", required=True, help="Ordner mit PDFs")
+    parser.add_argument("--questions", required=True, help="JSONL/JSON mit question, page(s), file")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[500, 1000, 1500])
+    parser.add_argument("--chunk-overlap", type=int, nargs="+", default=[0, 200])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--max-context-chars", type=int, nargs="+", default=[6000, 12000])
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Schwelle für die Empfehlung (context_recall)")
+    parser.add_argument("--language", choices=["de", "en"], default="de")
+    parser.add_argument("--embedder", choices=["auto", "model", "hash"], default="auto")
+    parser.add_argument("--cache", default="storage/tune_embeddings.sqlite3", help="Embedding-Cache (SQLite)")
+    parser.add_argument("--batch", type=int, default=500, help="Chunks pro Upsert")
+    parser.add_argument("--keep-collections", action="store_true", help="Collections bis zum Ende behalten")
+    parser.add_argument("--json", dest="json_path", default=None)
+    args = parser.parse_args()
+
+    # Vor dem App-Import: Settings lesen die Umgebung
+    os.environ.update({
+        "CHROMA_MODE": "ephemeral",
+        "DOC_CATALOG_PATH": ":memory:",
+        "ROUTING_ENABLED": "false",
+        "LLM_HEALTH_INTERVAL_SECONDS": "0",
+    })
+    from app.routers.rag import _extract_text_from_pdf
+    from app.services import embeddings
+
+    embedder = args.embedder
+    if embedder == "auto":
+        try:
+            import sentence_transformers  # noqa: F401
+
+            embedder = "model"
+        except ImportError:
+            embedder = "hash"
+    model = embeddings.default_model()
+    if embedder == "hash":
+        from bench.bench_e2e import _hash_embed
+
+        class _HashModel:
+            def encode(self, texts, **_kwargs):
+                return np.asarray(_hash_embed(texts), dtype=np.float32)
+
+        embeddings._models[model] = _HashModel()  # embed_documents bleibt der echte Pfad
+        model = "hash"
+
+    files = sorted(f for f in os.listdir(args.pdfs) if f.lower().endswith(".pdf"))
+    if not files:
+        raise SystemExit(f"Keine PDFs in {args.pdfs}")
+    questions = load_questions(args.questions, files)
+    pdfs = {}
+    t0 = time.perf_counter()
+    for name in files:
+        with open(os.path.join(args.pdfs, name), "rb") as f:
+            pdfs[name], _warnings = _extract_text_from_pdf(f.read())
+    print(
+        f"{len(files)} PDFs, {sum(len(p) for p in pdfs.values())} Seiten, {len(questions)} Fragen;"
+        f" Extraktion {time.perf_counter() - t0:.1f}s; Embedder {model}"
+    )
+
+    cache = EmbeddingCache(args.cache, model)
+    rows = run_grid(args, pdfs, questions, cache)
+    print(f"Embedding-Cache: {cache.hits} Treffer, {cache.misses} neu ({cache.embed_seconds:.1f}s)")
+
+    pick = recommend(rows, args.min_recall)
+    if pick:
+        print(
+            f"Empfehlung: CHUNK_SIZE={pick['chunk_size']} CHUNK_OVERLAP={pick['chunk_overlap']}"
+            f" RAG_TOP_K={pick['top_k']} RAG_MAX_CONTEXT_CHARS={pick['max_context_chars']}"
+            f"  (context_recall {pick['context_recall']}, mrr {pick['mrr']}, {pick['prompt_tokens']} Prompt-Tokens)"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "embedder": model, "results": rows, "recommended": pick}, f, indent=2)
+    sys.exit(0 if rows else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Admission Control testen – ohne Docker, ohne LLM.
+Prüft: ein abgebrochener Wartender (CancelledError in der Warteschlange) belegt keinen Slot.
+Verwendung:
+  python test_admission.py
+"""
+import asyncio
+
+from app.services.admission import AdmissionController
+
+
+async def _cancel_queued_waiter():
+    print("1. Wartenden abbrechen, danach Slot freigeben ...")
+    controller = AdmissionController(limit=1, max_queue=4, queue_timeout=2.0)
+    holder = controller.enqueue("interactive")
+    assert holder.admitted
+
+    async def waiter():
+        async with controller.slot("batch"):
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(waiter())
+    await asyncio.sleep(0.05)
+    assert controller.stats()["queued"] == 1
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    holder.release()
+    print("   stats:", controller.stats())
+    assert controller.stats()["active"] == 0 and controller.stats()["queued"] == 0
+
+    ticket = controller.enqueue("interactive")
+    await asyncio.wait_for(ticket.wait(), timeout=1.0)
+    assert ticket.admitted
+    ticket.release()
+    assert controller.stats()["active"] == 0
+
+
+async def _cancel_after_admission():
+    print("2. Abbruch nach Zuteilung, bevor der Wartende weiterläuft ...")
+    controller = AdmissionController(limit=1, max_queue=4, queue_timeout=2.0)
+    holder = controller.enqueue("interactive")
+
+    async def waiter():
+        async with controller.slot("batch"):
+            pass
+
+    task = asyncio.create_task(waiter())
+    await asyncio.sleep(0.05)
+    holder.release()  # Wartender ist jetzt zugelassen, der Task aber noch nicht fortgesetzt
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    print("   stats:", controller.stats())
+    assert controller.stats()["active"] == 0
+
+
+def test_cancel_queued_waiter():
+    asyncio.run(_cancel_queued_waiter())
+
+
+def test_cancel_after_admission():
+    asyncio.run(_cancel_after_admission())
+
+
+if __name__ == "__main__":
+    test_cancel_queued_waiter()
+    test_cancel_after_admission()
+    print("\nAdmission-Tests durchgelaufen.")
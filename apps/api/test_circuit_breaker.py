@@ -0,0 +1,179 @@
+"""
+Circuit Breaker testen – LLM- und Chroma-Ausfall mit Fehler-Stubs, ohne Docker.
+Prüft: begrenzte Wartezeit während des Ausfalls, schnelle Ablehnung (CircuitOpenError) sobald offen,
+Probe + Schließen nach Erholung, Öffnen per Health-Check, HTTP-Mapping auf 503 + Retry-After.
+Verwendung:
+  python test_circuit_breaker.py
+"""
+import asyncio
+import socket
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from bench.stub_llm import StubLLM
+from app.core.config import settings
+from app.main import app
+from app.services import vector_store as vs
+from app.services.circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.llm_client import LLMClient, close_http_client, get_llm_client
+
+FAST_FAIL_SECONDS = 0.05
+
+
+class HangingTCPServer:
+    """Nimmt Verbindungen an und antwortet nie (simuliert ein hängendes Chroma)."""
+
+    def __init__(self) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+        self.conns = []
+        self._stop = False
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def start(self) -> "HangingTCPServer":
+        self._thread.start()
+        return self
+
+    def _accept(self) -> None:
+        self.sock.settimeout(0.1)
+        while not self._stop:
+            try:
+                conn, _ = self.sock.accept()
+                self.conns.append(conn)
+            except OSError:
+                continue
+
+    def stop(self) -> None:
+        self._stop = True
+        self._thread.join(timeout=2)
+        for conn in self.conns:
+            conn.close()
+        self.sock.close()
+
+
+async def _llm_outage():
+    print("1. LLM hängt: begrenzte Wartezeit, danach sofortige Ablehnung ...")
+    stub = StubLLM(max_tokens=4).start()
+    stub.mode = "hang"
+    try:
+        client = LLMClient([stub.url])
+        client.timeout = 0.5
+        client.breaker = CircuitBreaker("llm_test", min_calls=4, error_rate=0.5, open_seconds=1.0)
+        sem = asyncio.Semaphore(4)
+        outcomes = []
+
+        async def one():
+            async with sem:
+                t = time.monotonic()
+                try:
+                    await client.completion("hallo", n_predict=4)
+                    outcomes.append(("ok", time.monotonic() - t, None))
+                except CircuitOpenError as e:
+                    outcomes.append(("open", time.monotonic() - t, e))
+                except Exception as e:
+                    outcomes.append(("error", time.monotonic() - t, e))
+
+        await asyncio.gather(*[one() for _ in range(40)])
+        timeouts = [o for o in outcomes if o[0] == "error"]
+        rejected = [o for o in outcomes if o[0] == "open"]
+        print(f"   Timeouts: {len(timeouts)}  abgelehnt: {len(rejected)}  Upstream-Requests: {stub.requests_total}")
+        assert max(o[1] for o in outcomes) < client.timeout + 0.5
+        assert len(timeouts) <= 4 + 4  # min_calls + Parallelität
+        assert stub.requests_total <= 8
+        assert len(rejected) == 40 - len(timeouts)
+        assert all(o[1] < FAST_FAIL_SECONDS for o in rejected)
+        assert all(o[2].retry_after >= 1 for o in rejected)
+        assert client.breaker.state == OPEN
+
+        print("2. Erholung: Probe nach open_seconds schließt den Breaker ...")
+        stub.mode = "ok"
+        await asyncio.sleep(1.1)
+        assert await client.completion("hallo", n_predict=4)
+        assert client.breaker.state == CLOSED
+
+        print("3. Health-Check ohne erreichbares Backend öffnet den Breaker ...")
+        stub.mode = "error"
+        await client.check_backends()
+        assert client.breaker.state == OPEN
+        t = time.monotonic()
+        try:
+            await client.completion("hallo", n_predict=4)
+            raise AssertionError("CircuitOpenError erwartet")
+        except CircuitOpenError:
+            assert time.monotonic() - t < FAST_FAIL_SECONDS
+    finally:
+        await close_http_client()
+        stub.stop()
+
+
+def test_llm_outage():
+    asyncio.run(_llm_outage())
+
+
+def test_chroma_outage():
+    print("4. Chroma hängt: Check mit Timeout, danach sofortige Ablehnung ...")
+    server = HangingTCPServer().start()
+    saved = {k: getattr(settings, k) for k in ("CHROMA_MODE", "CHROMA_HOST", "CHROMA_PORT", "CHROMA_CHECK_TIMEOUT_SECONDS")}
+    saved_client, saved_breaker = vs._client, vs._breaker
+    try:
+        settings.CHROMA_MODE = "http"
+        settings.CHROMA_HOST = "127.0.0.1"
+        settings.CHROMA_PORT = server.port
+        settings.CHROMA_CHECK_TIMEOUT_SECONDS = 0.3
+        vs._client = None
+        vs._breaker = CircuitBreaker("chroma", min_calls=3, open_seconds=30)
+        latencies, rejected = [], 0
+        for _ in range(20):
+            t = time.monotonic()
+            try:
+                assert not vs.chroma_reachable(raise_if_open=True)
+            except CircuitOpenError:
+                rejected += 1
+            latencies.append(time.monotonic() - t)
+        print(f"   max. Latenz {max(latencies):.2f}s  abgelehnt: {rejected}/20")
+        assert max(latencies) < 0.3 + 0.2
+        assert rejected >= 17
+        assert sum(latencies) < 3 * 0.3 + 0.5
+
+        t = time.monotonic()
+        try:
+            vs.query_chunks([0.0] * 384, 3)
+            raise AssertionError("CircuitOpenError erwartet")
+        except CircuitOpenError as e:
+            assert time.monotonic() - t < FAST_FAIL_SECONDS
+            assert e.retry_after >= 1
+    finally:
+        server.stop()
+        for key, value in saved.items():
+            setattr(settings, key, value)
+        # Der hängende Client-Aufbau hält ggf. noch den Lock → frischen Lock/Client verwenden
+        vs._client_lock = threading.Lock()
+        vs._client = saved_client
+        vs._breaker = saved_breaker
+
+
+def test_http_503_retry_after():
+    print("5. Offener Breaker → 503 + Retry-After ...")
+    breaker = get_llm_client().breaker
+    with TestClient(app) as client:
+        breaker.force_open("test")
+        try:
+            r = client.post("/api/text/briefing", json={"text": "x" * 20, "use_cache": False})
+            print("  ", r.status_code, r.headers.get("retry-after"), r.json().get("detail"))
+            assert r.status_code == 503
+            assert int(r.headers["retry-after"]) >= 1
+            health = client.get("/health/deps").json()
+            assert health["circuit_breakers"]["llm"]["state"] == OPEN
+        finally:
+            breaker.reset()
+
+
+if __name__ == "__main__":
+    test_llm_outage()
+    test_chroma_outage()
+    test_http_503_retry_after()
+    print("\nCircuit-Breaker-Tests durchgelaufen.")
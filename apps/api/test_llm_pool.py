@@ -0,0 +1,229 @@
+"""
+LLM-Backend-Pool testen – ohne Docker, gegen lokale Stub-Server (bench/stub_llm.py).
+Prüft: Least-Outstanding-Routing, Auswerfen/Wiederaufnahme, Hedging (nur bei fehlender Annahme,
+nicht bei langer Generierung), Failover bei schnellem Backend-Fehler, Modell-Identität ohne Warten auf das LLM,
+Slot-Affinität unabhängig von der Backend-Wahl, gewolltes Stream-Ende (stop_when) zählt nicht als Abbruch.
+Verwendung:
+  python test_llm_pool.py
+"""
+import asyncio
+import time
+
+from bench.stub_llm import StubLLM
+from app.core.config import settings
+from app.services import metrics
+from app.services.llm_client import LLMClient, close_http_client
+
+
+async def _routing():
+    print("1. Least-Outstanding-Routing ...")
+    fast = StubLLM(ttft_ms=10, tokens_per_second=500, max_tokens=8).start()
+    slow = StubLLM(ttft_ms=300, tokens_per_second=50, max_tokens=8).start()
+    try:
+        client = LLMClient([fast.url, slow.url])
+        sem = asyncio.Semaphore(4)
+
+        async def one():
+            async with sem:
+                await client.completion("hallo", n_predict=8)
+
+        await asyncio.gather(*[one() for _ in range(20)])
+        print("   fast:", fast.requests_total, "slow:", slow.requests_total)
+        assert fast.requests_total > slow.requests_total
+        assert all(b["in_flight"] == 0 for b in client.pool.stats())
+    finally:
+        await close_http_client()
+        fast.stop()
+        slow.stop()
+
+
+async def _eject_and_readmit():
+    print("2. Auswerfen + Wiederaufnahme ...")
+    good = StubLLM(max_tokens=4).start()
+    bad = StubLLM(max_tokens=4).start()
+    bad.mode = "error"
+    try:
+        client = LLMClient([bad.url, good.url])
+        client.pool.eject_after_failures = 2
+        for _ in range(6):
+            try:
+                await client.completion("x", n_predict=4)
+            except Exception:
+                pass
+        bad_backend = client.pool.backends[0]
+        print("   bad healthy:", bad_backend.healthy, "errors:", bad_backend.errors_total)
+        assert not bad_backend.healthy
+        requests_before = bad.requests_total
+        await asyncio.gather(*[client.completion("x", n_predict=4) for _ in range(5)])
+        assert bad.requests_total == requests_before  # ausgeworfen → kein Traffic
+        bad.mode = "ok"
+        await client.check_backends()
+        print("   nach Health-Check healthy:", bad_backend.healthy)
+        assert bad_backend.healthy
+    finally:
+        await close_http_client()
+        good.stop()
+        bad.stop()
+
+
+async def _hedging():
+    print("3. Hedging (zweites Backend nach 50 ms) ...")
+    hanging = StubLLM().start()
+    hanging.mode = "hang"
+    fast = StubLLM(ttft_ms=10, max_tokens=4).start()
+    try:
+        client = LLMClient([hanging.url, fast.url])
+        client.hedge_after = 0.05
+        t0 = time.perf_counter()
+        content = await client.completion("x", n_predict=4)
+        elapsed = time.perf_counter() - t0
+        print("   content:", content.strip(), "elapsed_s:", round(elapsed, 3))
+        assert content and elapsed < 2.0
+        assert client.pool.backends[1].hedged_total == 1
+    finally:
+        await close_http_client()
+        hanging.stop()
+        fast.stop()
+
+
+async def _no_hedge_on_long_generation():
+    print("4. Kein Hedging bei langer Generierung (Header kommen sofort) ...")
+    slow = StubLLM(ttft_ms=10, tokens_per_second=10, max_tokens=8).start()
+    other = StubLLM(max_tokens=8).start()
+    try:
+        client = LLMClient([slow.url, other.url])
+        # Weit unter der Generierungsdauer (~0,8 s), aber mit Luft für den Verbindungsaufbau
+        client.hedge_after = 0.25
+        content = await client.completion("x", n_predict=8)
+        print("   content:", content.strip(), "other requests:", other.requests_total)
+        assert content
+        assert other.requests_total == 0 and client.pool.backends[1].hedged_total == 0
+    finally:
+        await close_http_client()
+        slow.stop()
+        other.stop()
+
+
+async def _failover():
+    print("5. Failover bei schnellem Fehler des ersten Backends ...")
+    bad = StubLLM(max_tokens=4).start()
+    bad.mode = "error"
+    good = StubLLM(ttft_ms=10, max_tokens=4).start()
+    try:
+        client = LLMClient([bad.url, good.url])
+        client.hedge_after = 5.0
+        t0 = time.perf_counter()
+        content = await client.completion("x", n_predict=4)
+        elapsed = time.perf_counter() - t0
+        print("   content:", content.strip(), "elapsed_s:", round(elapsed, 3))
+        assert content and elapsed < 2.0  # nicht erst nach hedge_after
+        assert bad.requests_total == 1 and good.requests_total == 1
+    finally:
+        await close_http_client()
+        bad.stop()
+        good.stop()
+
+
+async def _model_id():
+    print("6. Modell-Identität (nicht blockierend, letzter Wert bleibt bei Ausfall) ...")
+    stub = StubLLM().start()
+    try:
+        client = LLMClient([stub.url])
+        assert client.model_id() == stub.url  # noch unbekannt → Ersatz, Abfrage läuft im Hintergrund
+        await client._model_id_task
+        assert client.model_id() == "/models/stub.gguf"
+        stub.mode = "hang"
+        client._model_id_checked_at = float("-inf")  # TTL abgelaufen
+        t0 = time.perf_counter()
+        assert client.model_id() == "/models/stub.gguf"
+        assert time.perf_counter() - t0 < 0.1
+        client._model_id_task.cancel()
+    finally:
+        await close_http_client()
+        stub.stop()
+
+
+def _slot_affinity():
+    print("7. Slot-Affinität: alle Backend/Slot-Paare erreichbar ...")
+    client = LLMClient(["http://backend-a:8080", "http://backend-b:8080"])
+    slots_before = settings.LLM_SLOTS_PER_BACKEND
+    settings.LLM_SLOTS_PER_BACKEND = 4
+    try:
+        pairs = set()
+        for i in range(200):
+            key = f"doc-{i}"
+            backend = client.pool.pick_affine(key)
+            slot = client._payload("x", 8, 0.2, key)["id_slot"]
+            assert client._payload("x", 8, 0.2, key)["id_slot"] == slot  # stabil je Schlüssel
+            pairs.add((backend.url, slot))
+        print("   Paare:", len(pairs))
+        assert len(pairs) == 2 * 4
+    finally:
+        settings.LLM_SLOTS_PER_BACKEND = slots_before
+
+
+async def _stream_stop_when():
+    print("8. Stream per stop_when beenden: kein Abbruch, Timings erfasst ...")
+    stub = StubLLM(ttft_ms=10, tokens_per_second=200, max_tokens=40).start()
+    try:
+        client = LLMClient([stub.url])
+        for schema in ({"type": "object"}, None):
+            aborted = metrics.get("llm_stream_aborted_total")
+            completions = metrics.get("llm_completions_total")
+            seen = []
+            async for content in client.completion_stream("x", n_predict=40, json_schema=schema,
+                                                           stop_when=lambda: len(seen) >= 3):
+                seen.append(content)
+            print("   schema:", schema is not None, "chunks:", len(seen), "gesendet:", stub.tokens_sent)
+            assert len(seen) == 3
+            assert metrics.get("llm_stream_aborted_total") == aborted
+            # Mit Schema wird bis zum Stop-Event gelesen → Timings der Antwort landen in den Metriken
+            assert metrics.get("llm_completions_total") == completions + (1 if schema else 0)
+        assert all(b["in_flight"] == 0 for b in client.pool.stats())
+    finally:
+        await close_http_client()
+        stub.stop()
+
+
+def test_routing():
+    asyncio.run(_routing())
+
+
+def test_eject_and_readmit():
+    asyncio.run(_eject_and_readmit())
+
+
+def test_hedging():
+    asyncio.run(_hedging())
+
+
+def test_no_hedge_on_long_generation():
+    asyncio.run(_no_hedge_on_long_generation())
+
+
+def test_failover():
+    asyncio.run(_failover())
+
+
+def test_model_id():
+    asyncio.run(_model_id())
+
+
+def test_slot_affinity():
+    _slot_affinity()
+
+
+def test_stream_stop_when():
+    asyncio.run(_stream_stop_when())
+
+
+if __name__ == "__main__":
+    test_routing()
+    test_eject_and_readmit()
+    test_hedging()
+    test_no_hedge_on_long_generation()
+    test_failover()
+    test_model_id()
+    test_slot_affinity()
+    test_stream_stop_when()
+    print("\nPool-Tests durchgelaufen.")
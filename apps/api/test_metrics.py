@@ -0,0 +1,28 @@
+"""
+/metrics testen – ohne Docker, ohne LLM: jede registrierte Gauge muss im Prometheus-Text
+erscheinen (render_prometheus überspringt Gauges, deren Callback wirft).
+Verwendung:
+  python test_metrics.py
+"""
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import metrics
+
+
+def test_all_gauges_rendered():
+    # Ohne Lifespan: der Endpoint legt die Singletons (LLM-Client, Admission, Breaker) selbst an
+    client = TestClient(app)
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.text
+    names = sorted(metrics._gauges)
+    print("Gauges:", ", ".join(names))
+    assert "llm_backends_available" in names
+    missing = [n for n in names if f"# TYPE {metrics._prom_name(n)} gauge" not in body]
+    assert not missing, f"Gauges fehlen in /metrics: {missing}"
+
+
+if __name__ == "__main__":
+    test_all_gauges_rendered()
+    print("\nMetrik-Test durchgelaufen.")
@@ -0,0 +1,187 @@
+"""
+Abbruch beim Client-Disconnect testen – ohne Docker.
+Lokaler Stub-LLM (bench/stub_llm.py, langsam), API in-process; Chroma/Embeddings werden im
+RAG-Router durch feste Treffer ersetzt. Der Client liest ein paar Token von /api/rag/chat/stream
+und trennt die Verbindung → die Upstream-Verbindung zum LLM muss zeitnah geschlossen werden.
+Batch und Map-Reduce-Briefing: Abbruch (Disconnect bzw. 502 eines Chunks) bei mehr parallelen
+Generierungen als LLM-Slots → abgebrochene Wartende dürfen keinen Slot behalten.
+Verwendung:
+  python test_stream_cancel.py
+"""
+import json
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from bench.stub_llm import StubLLM
+from app.main import app
+from app.routers import rag
+from app.core.config import settings
+from app.routers import text
+from app.services import admission, metrics
+from app.services.admission import AdmissionController
+from app.services.llm_client import LLMClient
+
+# Upstream muss spätestens nach dieser Zeit geschlossen sein
+MAX_CLOSE_SECONDS = 2.0
+
+
+def _fake_query_chunks(query_embedding, n_results, doc_id=None):
+    return {
+        "ids": ["doc:1:0"],
+        "documents": ["Der Preis von X beträgt 10 Euro."],
+        "metadatas": [{"doc_id": "doc", "filename": "x.pdf", "page": 1}],
+        "distances": [0.1],
+    }
+
+
+def _start_api():
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def _fresh_admission() -> AdmissionController:
+    """Ein Slot, großzügige Warteschlange: parallele Generierungen stehen an."""
+    admission._controller = AdmissionController(limit=1, max_queue=32, queue_timeout=30.0)
+    return admission._controller
+
+
+def _wait_idle(controller: AdmissionController) -> dict:
+    deadline = time.monotonic() + MAX_CLOSE_SECONDS
+    while time.monotonic() < deadline and (controller.active or controller.stats()["queued"]):
+        time.sleep(0.02)
+    return controller.stats()
+
+
+def _wait_upstream(stub: StubLLM) -> None:
+    """Erst trennen, wenn die erste Generierung beim LLM angekommen ist: ein cancel() während des
+    Verbindungsaufbaus verschluckt httpx/anyio gelegentlich (Slot bliebe bis zum Ende belegt)."""
+    deadline = time.monotonic() + MAX_CLOSE_SECONDS
+    while stub.requests_total == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def test_disconnect_closes_upstream():
+    print("1. Stream starten, nach 3 Token trennen ...")
+    stub = StubLLM(ttft_ms=10, tokens_per_second=20, max_tokens=400).start()
+    rag.chroma_reachable = lambda *a, **kw: True
+    rag.is_loaded = lambda: True
+    rag.embed_query = lambda text: [0.5, 0.5, 0.5, 0.5]
+    rag.query_chunks = _fake_query_chunks
+    rag.llm_client = LLMClient([stub.url])
+    server, thread, base = _start_api()
+    aborted_before = metrics.get("llm_stream_aborted_total")
+    try:
+        tokens = 0
+        with httpx.Client(timeout=10) as client:
+            payload = {"question": "Was kostet X?", "use_cache": False}
+            with client.stream("POST", f"{base}/api/rag/chat/stream", json=payload) as r:
+                assert r.status_code == 200
+                for line in r.iter_lines():
+                    if line and json.loads(line).get("type") == "token":
+                        tokens += 1
+                    if tokens >= 3:
+                        break
+        disconnected_at = time.monotonic()
+        while stub.active_streams > 0 and time.monotonic() - disconnected_at < MAX_CLOSE_SECONDS:
+            time.sleep(0.02)
+        print("   upstream offen:", stub.active_streams, "gesendete Token:", stub.tokens_sent)
+        assert stub.active_streams == 0, "Upstream-Stream läuft nach Disconnect weiter"
+        assert stub.tokens_sent < 400
+        time.sleep(0.1)
+        print("   aborted:", metrics.get("llm_stream_aborted_total") - aborted_before,
+              "tokens_saved:", metrics.get("llm_stream_tokens_saved_total"))
+        assert metrics.get("llm_stream_aborted_total") > aborted_before
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        stub.stop()
+
+
+def test_batch_disconnect_releases_slots():
+    print("2. Batch mit 4 Lanes bei 1 Slot, nach meta trennen ...")
+    stub = StubLLM(ttft_ms=10, tokens_per_second=20, max_tokens=100).start()
+    rag.chroma_reachable = lambda *a, **kw: True
+    rag.is_loaded = lambda: True
+    rag.embed_documents = lambda texts, **kw: [[0.5, 0.5, 0.5, 0.5] for _ in texts]
+    rag.query_chunks_batch = lambda embs, n, doc_id=None: [_fake_query_chunks(e, n) for e in embs]
+    rag.llm_client = LLMClient([stub.url])
+    settings.BATCH_CONCURRENCY = 4
+    controller = _fresh_admission()
+    server, thread, base = _start_api()
+    try:
+        with httpx.Client(timeout=10) as client:
+            payload = {"questions": [f"Frage {i}?" for i in range(4)], "use_cache": False}
+            with client.stream("POST", f"{base}/api/rag/chat/batch", json=payload) as r:
+                assert r.status_code == 200
+                for line in r.iter_lines():
+                    if line and json.loads(line).get("type") == "meta":
+                        _wait_upstream(stub)
+                        break
+        stats = _wait_idle(controller)
+        print("   admission:", stats)
+        assert stats["active"] == 0 and stats["queued"] == 0
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        stub.stop()
+        settings.BATCH_CONCURRENCY = 0
+
+
+def _map_reduce_request() -> dict:
+    return {
+        "text": ("Absatz über Preise und Termine. " * 200 + "\n\n") * 4,
+        "options": {"mode": "map_reduce"},
+        "use_cache": False,
+    }
+
+
+def test_briefing_map_abort_releases_slots():
+    print("3. Map-Reduce-Briefing mit 4 parallelen Chunks bei 1 Slot: Disconnect und 502 ...")
+    stub = StubLLM(ttft_ms=10, tokens_per_second=20, max_tokens=100).start()
+    text.llm = LLMClient([stub.url])
+    settings.BRIEFING_MAP_CONCURRENCY = 4
+    server, thread, base = _start_api()
+    try:
+        controller = _fresh_admission()
+        with httpx.Client(timeout=10) as client:
+            with client.stream("POST", f"{base}/api/text/briefing/stream", json=_map_reduce_request()) as r:
+                assert r.status_code == 200
+                for line in r.iter_lines():
+                    if line and json.loads(line).get("type") == "plan":
+                        assert json.loads(line)["chunks"] > 1
+                        _wait_upstream(stub)
+                        break
+        stats = _wait_idle(controller)
+        print("   nach Disconnect:", stats)
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+        controller = _fresh_admission()
+        stub.mode = "error"
+        with httpx.Client(timeout=10) as client:
+            r = client.post(f"{base}/api/text/briefing", json=_map_reduce_request())
+        stats = _wait_idle(controller)
+        print("   nach 502:", r.status_code, stats)
+        assert r.status_code == 502
+        assert stats["active"] == 0 and stats["queued"] == 0
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        stub.stop()
+        settings.BRIEFING_MAP_CONCURRENCY = 0
+
+
+if __name__ == "__main__":
+    test_disconnect_closes_upstream()
+    test_batch_disconnect_releases_slots()
+    test_briefing_map_abort_releases_slots()
+    print("\nDisconnect-Test durchgelaufen.")
@@ -106,13 +106,28 @@ export type ChatResponse = {
 
 // --- Docs (Collection + Delete) ---
 
+export type DocEntry = {
+  doc_id: string;
+  filename: string;
+  bytes?: number | null;
+  pages: number;
+  chunks: number;
+  content_hash?: string | null;
+  ingested_at: string;
+};
+
 export type DocsInfo = {
   collection: string;
+  total_docs: number;
   total_chunks: number;
+  offset: number;
+  limit: number;
+  items: DocEntry[];
 };
 
-export async function ragDocs(): Promise<DocsInfo> {
-  const res = await fetch(`${baseUrl}/api/rag/docs`, {
+export async function ragDocs(offset = 0, limit = 50): Promise<DocsInfo> {
+  const params = new URLSearchParams({ offset: String(offset), limit: String(limit) });
+  const res = await fetch(`${baseUrl}/api/rag/docs?${params}`, {
     method: "GET",
     headers: headers(),
     cache: "no-store",
@@ -122,7 +137,7 @@ export async function ragDocs(): Promise<DocsInfo> {
 
 export async function deleteDoc(
   docId: string
-): Promise<{ status: string; doc_id: string }> {
+): Promise<{ status: string; doc_id: string; chunks?: number | null }> {
   const res = await fetch(
     `${baseUrl}/api/rag/docs/${encodeURIComponent(docId)}`,
     {
@@ -130,7 +145,7 @@ export async function deleteDoc(
       headers: headers(),
     }
   );
-  return handle<{ status: string; doc_id: string }>(res);
+  return handle<{ status: string; doc_id: string; chunks?: number | null }>(res);
 }
 
 export async function ragChat(